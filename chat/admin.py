@@ -3,7 +3,7 @@ from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from .models import (
     User, AIModel, Conversation, Message,
-    PlanfixCache, PlanfixTask, AnalyticsEvent,
+    PlanfixCache, PlanfixRefreshStage, PlanfixTask, AnalyticsEvent,
     UserMetrics, AIModelMetrics
 )
 
@@ -46,6 +46,12 @@ class PlanfixCacheAdmin(admin.ModelAdmin):
     list_filter = ('is_valid', 'last_update')
     search_fields = ('cache_name',)
 
+@admin.register(PlanfixRefreshStage)
+class PlanfixRefreshStageAdmin(admin.ModelAdmin):
+    list_display = ('stage', 'refresh_kind', 'started_at', 'duration', 'items_count', 'bytes_count', 'peak_memory', 'success')
+    list_filter = ('refresh_kind', 'stage', 'success')
+    search_fields = ('refresh_id', 'stage')
+
 @admin.register(PlanfixTask)
 class PlanfixTaskAdmin(admin.ModelAdmin):
     list_display = ('task_id', 'name', 'status', 'project_name', 'start_date', 'end_date', 'is_completed', 'is_overdue')
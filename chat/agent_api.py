@@ -10,6 +10,7 @@ from .models import Conversation, Message, User, UserMetrics, AIModel
 from .agent_query_processor import agent
 from .planfix_cache_service import planfix_cache
 from .planfix_service import update_tasks_cache
+from .planfix_project_refresh import project_refresher
 from .claude_ai_service import claude_ai
 from .openai_service import openai_ai
 from .gemini_service import gemini_ai
@@ -88,6 +89,10 @@ def agent_message_api(request):
         
         user_metrics.save()
         
+        # Fresh tasks of the conversation's project before building the context
+        if conversation.planfix_project_id:
+            project_refresher.refresh(conversation.planfix_project_id)
+        
         # Get previous messages for context (limit to last 10 for simplicity)
         previous_messages = Message.objects.filter(conversation=conversation).order_by('created_at')
         
@@ -107,7 +112,9 @@ def agent_message_api(request):
         else:
             try:
                 if ai_model.model_type == 'claude':
-                    ai_response = claude_ai.process_query(message_text, conversation_history)
+                    ai_response = claude_ai.process_query(
+                        message_text, conversation_history, user=request.user, conversation=conversation
+                    )
                     response = ai_response.get('message', str(ai_response)) if isinstance(ai_response, dict) else str(ai_response)
                 elif ai_model.model_type == 'gpt':
                     ai_response = openai_ai.process_query(message_text, conversation_history, model_name=ai_model.version)
@@ -17,13 +17,15 @@ class AgentQueryProcessor:
         """Initialize the processor"""
         logger.info("Initializing Agent Query Processor")
     
-    def process_query(self, user_query: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> Dict[str, Any]:
+    def process_query(self, user_query: str, conversation_history: Optional[List[Dict[str, str]]] = None,
+                      user=None) -> Dict[str, Any]:
         """
         Process a user query about Planfix data and return the appropriate response
         
         Args:
             user_query: The user's query text
             conversation_history: Optional list of previous messages
+            user: Requesting user, for the personal task view and task visibility
         
         Returns:
             Dictionary with response data
@@ -45,7 +47,7 @@ class AgentQueryProcessor:
         
         # Process query using Claude AI
         try:
-            ai_response = claude_ai.process_query(user_query, conversation_history)
+            ai_response = claude_ai.process_query(user_query, conversation_history, user=user)
             
             # If ai_response is already a dictionary with response_type and message, return it
             if isinstance(ai_response, dict) and 'response_type' in ai_response and 'message' in ai_response:
@@ -2,9 +2,9 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.http import JsonResponse
 from .models import Conversation, Message, User, UserMetrics, AIModel
 from .planfix_cache_service import planfix_cache
+from .planfix_dashboard import dashboard_snapshot
+from .planfix_project_refresh import project_refresher
 from .agent_query_processor import agent
-import json
-import os
 import logging
 from django.utils import timezone
 
@@ -15,61 +15,14 @@ def agent_dashboard(request):
     """
     Dashboard for the Planfix-Claude intelligent agent
     """
-    # Get or create anonymous user
-    user, created = User.objects.get_or_create(username='anonymous')
-    
-    # Get list of conversations
-    conversations = Conversation.objects.filter(user=user).order_by('-updated_at')
-    
-    # Get agent statistics
-    stats = planfix_cache.get_stats()
+    # Conversations, stats, employees and users are assembled once per
+    # task snapshot generation and DB change, then served from the cache
+    snapshot = dashboard_snapshot.get_snapshot()
     
-    # Get employees data from cache file
-    employees_data = []
-    cache_file_path = os.path.join(os.path.dirname(__file__), 'cache', 'users.json')
-    try:
-        with open(cache_file_path, 'r', encoding='utf-8') as f:
-            employees = json.load(f)
-            # Filter out non-user entries and format data
-            for employee in employees:
-                if employee['id'].startswith('user:'):
-                    employees_data.append({
-                        'id': employee['id'],
-                        'name': employee['name'],
-                        'email': employee['email'],
-                        'role': 'Сотрудник',
-                        'active_tasks': employee['assigned_active'],
-                        'completed_tasks': employee['assigned_completed'],
-                        'overdue_tasks': employee['assigned_overdue'],
-                        'total_tasks': employee['assigned_tasks'],
-                        'created_tasks': employee['created_tasks'],
-                        'projects': len(employee['projects'])
-                    })
-    except Exception as e:
-        logger.error(f"Error reading employees cache file: {str(e)}")
-        employees_data = []
-    
-    # Get registered users from database
-    users = User.objects.filter(is_active=True).order_by('-date_joined')
-    users_data = []
-    for user in users:
-        users_data.append({
-            'name': user.username,
-            'email': user.email,
-            'role': user.get_role_display(),
-            'date_joined': user.date_joined,
-            'last_active': user.last_active,
-            'is_admin': user.is_admin,
-            'is_staff': user.is_staff
-        })
-    
-    return render(request, 'chat/agent_dashboard.html', {
-        'conversations': conversations,
-        'stats': stats,
-        'cache_valid': planfix_cache.is_cache_valid(max_age_minutes=60),
-        'employees': employees_data,
-        'users': users_data
-    })
+    return render(request, 'chat/agent_dashboard.html', dict(
+        snapshot,
+        cache_valid=planfix_cache.is_cache_valid(max_age_minutes=60)
+    ))
 
 def agent_conversation(request, conversation_id):
     """
@@ -84,6 +37,10 @@ def agent_conversation(request, conversation_id):
     # Get current conversation
     conversation = get_object_or_404(Conversation, id=conversation_id, user=user)
     
+    # Refresh the tasks of the conversation's project in the background
+    if conversation.planfix_project_id:
+        project_refresher.refresh(conversation.planfix_project_id, wait=0)
+    
     # Get conversation messages
     messages = Message.objects.filter(conversation=conversation).order_by('created_at')
     
@@ -148,4 +148,75 @@ def dashboard_data_api(request):
         'total_messages': Message.objects.count(),
     }
     
-    return JsonResponse(response_data)
\ No newline at end of file
+    return JsonResponse(response_data)
+
+@staff_member_required
+@require_http_methods(["GET"])
+def task_trends_api(request):
+    """API для получения динамики задач Planfix по дням"""
+    from .planfix_history import task_history, MAX_TREND_DAYS
+
+    try:
+        days = int(request.GET.get('days', 30))
+    except ValueError:
+        return JsonResponse({'error': 'days must be an integer'}, status=400)
+    days = max(1, min(days, MAX_TREND_DAYS))
+
+    group_by = request.GET.get('group_by') or None
+    if group_by not in (None, 'project', 'assignee'):
+        return JsonResponse({'error': 'group_by must be project or assignee'}, status=400)
+
+    return JsonResponse(task_history.get_trends(days, group_by=group_by, key=request.GET.get('key')))
+
+@staff_member_required
+@require_http_methods(["GET", "POST"])
+def planfix_memory_api(request):
+    """
+    API профилирования памяти кэша Planfix (tracemalloc, по запросу)
+
+    GET: состояние, ?top=<снимок> - топ мест выделения, ?old=<снимок>&new=<снимок> - разница снимков.
+    POST action=start|stop|snapshot|retained|profile. Снимки хранятся в памяти текущего процесса.
+    """
+    from .planfix_memory import memory_profiler
+
+    try:
+        limit = int(request.GET.get('limit', request.POST.get('limit', 20)))
+    except ValueError:
+        return JsonResponse({'error': 'limit must be an integer'}, status=400)
+
+    key_type = request.GET.get('group_by', 'lineno')
+    if key_type not in ('lineno', 'filename', 'traceback'):
+        return JsonResponse({'error': 'group_by must be lineno, filename or traceback'}, status=400)
+
+    try:
+        if request.method == 'GET':
+            if request.GET.get('top'):
+                return JsonResponse({'top': memory_profiler.top(request.GET['top'], limit, key_type)})
+            if request.GET.get('old') and request.GET.get('new'):
+                return JsonResponse(memory_profiler.diff(request.GET['old'], request.GET['new'], limit, key_type))
+            return JsonResponse(memory_profiler.get_status())
+
+        action = request.POST.get('action')
+        if action == 'start':
+            memory_profiler.start(int(request.POST.get('frames', 10)))
+        elif action == 'stop':
+            memory_profiler.stop()
+        elif action == 'snapshot':
+            label = memory_profiler.take_snapshot(request.POST.get('label') or None)
+            return JsonResponse({'label': label, 'status': memory_profiler.get_status()})
+        elif action == 'retained':
+            # Трассировка, включенная ради замера, выключается после него
+            with memory_profiler.tracing():
+                retained = memory_profiler.measure_cache_views()
+            return JsonResponse({'retained': retained})
+        elif action == 'profile':
+            refresh = request.POST.get('refresh', '').lower() in ('1', 'true', 'yes')
+            return JsonResponse(memory_profiler.profile_refresh(refresh=refresh, limit=limit, key_type=key_type))
+        else:
+            return JsonResponse({'error': 'action must be start, stop, snapshot, retained or profile'}, status=400)
+    except KeyError as e:
+        return JsonResponse({'error': str(e)}, status=404)
+    except (RuntimeError, ValueError) as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse(memory_profiler.get_status())
@@ -4,7 +4,10 @@ import sys
 import logging
 import json
 import time
+import hmac
 from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST, condition
 
 # Настройка путей и добавление проекта в PYTHONPATH
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -30,35 +33,331 @@ logger = logging.getLogger("planfix_sync")
 
 from chat.planfix_service import update_tasks_cache, get_all_tasks
 from chat.planfix_api import get_projects
+from chat.planfix_cache_service import planfix_cache, CACHE_DIR
+from chat.planfix_changes import task_change_log
+from chat.planfix_fields import parse_fields, project, project_tasks
+from chat.planfix_projects import project_catalogue
+from chat.planfix_visibility import task_visibility
+from chat.decorators import api_login_required
 from pathlib import Path
 from django.conf import settings
 
-# Путь к директории для кэш-файлов
-CACHE_DIR = Path(settings.BASE_DIR) / 'chat' / 'cache'
+# Пути к файлам кэша
 TASKS_CACHE_FILE = CACHE_DIR / 'tasks_cache.json'
 LAST_UPDATE_FILE = CACHE_DIR / 'last_update.txt'
 
+@api_login_required
 def tasks_api(request):
-    """API endpoint to fetch all tasks"""
+    """API endpoint to fetch all tasks (?fields=list|detail или список полей)"""
     try:
-        tasks = get_all_tasks()
-        return JsonResponse({'tasks': tasks})
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    try:
+        # Поколение читаем до задач: клиент может получить изменение повторно, но не потеряет его
+        generation = task_change_log.get_current_generation()
+        tasks = task_visibility.filter_tasks(request.user, get_all_tasks())
+        return JsonResponse({'tasks': project_tasks(tasks, fields), 'generation': generation})
     except Exception as e:
         logger.error(f"Ошибка при загрузке задач: {e}", exc_info=True)
         return JsonResponse({'error': 'Не удалось загрузить задачи', 'message': str(e)}, status=500)
 
+@api_login_required
+def tasks_changes_api(request):
+    """
+    API endpoint для дельта-синхронизации: изменения задач начиная с поколения ?since=N.
+    Если история не покрывает запрошенное поколение, возвращает resync_required=True (?fields= как в /api/tasks/)
+    """
+    try:
+        since = int(request.GET.get('since', ''))
+    except ValueError:
+        return JsonResponse({'error': 'Параметр since должен быть целым числом'}, status=400)
+    
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    changes = task_change_log.get_changes_since(since)
+    if changes['resync_required']:
+        return JsonResponse(changes)
+    
+    index = planfix_cache.get_task_index()
+    changes['added'] = project_tasks(task_visibility.filter_tasks(request.user, index.get_many(changes['added'])), fields)
+    changes['changed'] = project_tasks(task_visibility.filter_tasks(request.user, index.get_many(changes['changed'])), fields)
+    # Удаленные задачи - только из видимых пользователю
+    visible_ids = task_visibility.get_visible_ids(request.user)
+    if visible_ids is not None:
+        changes['removed'] = [task_id for task_id in changes['removed'] if str(task_id) in visible_ids]
+    return JsonResponse(changes)
+
+# Максимальное число задач в одном пакетном запросе
+TASKS_BATCH_LIMIT = 200
+
+@api_login_required
+def tasks_batch_api(request):
+    """
+    API endpoint для получения нескольких задач одним запросом по индексу снимка (?ids=1,2,3, ?fields=).
+    Возвращает найденные задачи в порядке запроса и список ненайденных ID
+    """
+    task_ids = [task_id.strip() for task_id in request.GET.get('ids', '').split(',') if task_id.strip()]
+    if not task_ids:
+        return JsonResponse({'error': 'Параметр ids обязателен'}, status=400)
+    if len(task_ids) > TASKS_BATCH_LIMIT:
+        return JsonResponse({'error': f'Не более {TASKS_BATCH_LIMIT} задач за запрос'}, status=400)
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
+    index = planfix_cache.get_task_index()
+    tasks = task_visibility.filter_tasks(request.user, index.get_many(task_ids))
+    found = {str(task['id']) for task in tasks}
+    return JsonResponse({'tasks': project_tasks(tasks, fields),
+                         'missing': [task_id for task_id in task_ids if task_id not in found]})
+
+@api_login_required
+def tasks_query_api(request):
+    """
+    API endpoint для структурированного поиска задач:
+    ?ids=, ?status= (имена или ID через запятую), ?project=, ?assignee=, ?assigner=,
+    ?due_from=, ?due_to= (YYYY-MM-DD), ?q=, ?fuzzy=1 (нечеткий поиск q по названиям), ?completed=true|false,
+    ?sort=id|due|name (с '-' по убыванию), ?limit=, ?cursor=, ?explain=1, ?fields=
+    """
+    def split(name):
+        value = request.GET.get(name)
+        return [item.strip() for item in value.split(',') if item.strip()] if value else None
+
+    completed = request.GET.get('completed')
+    if completed is not None and completed.lower() not in ('true', 'false'):
+        return JsonResponse({'error': 'completed должен быть true или false'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', 50))
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть целым числом'}, status=400)
+
+    # Пользователю со своим токеном доступны только видимые ему задачи
+    ids = split('ids')
+    visible_ids = task_visibility.get_visible_ids(request.user)
+    if visible_ids is not None:
+        ids = visible_ids if ids is None else [task_id for task_id in ids if task_id in visible_ids]
+
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+        result = planfix_cache.query_tasks(
+            ids=ids,
+            statuses=split('status'),
+            project_id=request.GET.get('project') or None,
+            assignee_id=request.GET.get('assignee') or None,
+            assigner_id=request.GET.get('assigner') or None,
+            due_from=request.GET.get('due_from') or None,
+            due_to=request.GET.get('due_to') or None,
+            text=request.GET.get('q') or None,
+            completed=None if completed is None else completed.lower() == 'true',
+            fuzzy=request.GET.get('fuzzy') in ('1', 'true'),
+            sort=request.GET.get('sort') or None,
+            limit=limit,
+            cursor=request.GET.get('cursor') or None,
+            explain=request.GET.get('explain') in ('1', 'true')
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    result['tasks'] = project_tasks(result['tasks'], fields)
+    return JsonResponse(result)
+
+@api_login_required
+def search_api(request):
+    """
+    API endpoint для нечеткого поиска задач, проектов и сотрудников по названию
+    с учетом опечаток и раскладки (?q=, ?kind=tasks,projects,users, ?limit=)
+    """
+    from chat.planfix_fuzzy import fuzzy_search
+
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Параметр q обязателен'}, status=400)
+
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), 50))
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть целым числом'}, status=400)
+
+    kinds = [kind.strip() for kind in request.GET.get('kind', '').split(',') if kind.strip()] or None
+    try:
+        results = fuzzy_search.search(query, kinds, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    results = [result for result in results
+               if result['kind'] != 'tasks' or task_visibility.is_visible(request.user, result['id'])]
+
+    return JsonResponse({'query': query, 'results': results})
+
+@api_login_required
+def autocomplete_api(request):
+    """
+    API endpoint для подсказок по мере ввода: названия и ID задач, проекты и сотрудники
+    (?q=, ?kind=projects,users,tasks, ?limit=)
+    """
+    from chat.planfix_autocomplete import autocomplete, MAX_LIMIT
+
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', 10)), MAX_LIMIT))
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть целым числом'}, status=400)
+
+    kinds = [kind.strip() for kind in request.GET.get('kind', '').split(',') if kind.strip()] or None
+    try:
+        suggestions = autocomplete.suggest(query, kinds, limit)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    suggestions = [suggestion for suggestion in suggestions
+                   if suggestion['kind'] != 'tasks' or task_visibility.is_visible(request.user, suggestion['id'])]
+
+    response = JsonResponse({'query': query, 'suggestions': suggestions})
+    # Подсказки меняются только с обновлением кэша, повторный ввод того же префикса берется из кэша браузера
+    response['Cache-Control'] = 'private, max-age=60'
+    return response
+
+@api_login_required
 def update_tasks_cache_api(request):
     """API endpoint to update tasks cache"""
     force = request.GET.get('force', 'false').lower() == 'true'
     tasks = update_tasks_cache(force=force)
     return JsonResponse({'message': 'Tasks cache updated', 'tasks_count': len(tasks)})
 
+@condition(etag_func=lambda request: project_catalogue.get_etag(),
+           last_modified_func=lambda request: project_catalogue.get_last_modified())
 def projects_api(request):
-    """API endpoint to fetch all projects"""
-    from .planfix_api import get_projects
+    """
+    API endpoint со списком проектов из каталога, обновляемого полной синхронизацией.
+    Поддерживает условные запросы (If-None-Match, If-Modified-Since).
+    До первой синхронизации каталога отдает проекты, найденные в задачах
+    """
+    catalogue = project_catalogue.get()
+    if catalogue is None:
+        return JsonResponse({'projects': planfix_cache.get_projects(), 'updated_at': None})
+    return JsonResponse({'projects': catalogue['projects'], 'updated_at': catalogue['updated_at']})
 
-    projects = get_projects()
-    return JsonResponse({'projects': projects})
+@api_login_required
+@require_POST
+def project_refresh_api(request, project_id):
+    """
+    API endpoint для обновления задач одного проекта из Planfix (?wait=секунды ожидания результата).
+    Обновления одного проекта ограничены по частоте и объединяются между одновременными запросами.
+    Только для авторизованных пользователей (с CSRF-токеном) и известных проектов: каждый вызов расходует квоту Planfix
+    """
+    from chat.planfix_project_refresh import project_refresher
+
+    projects = project_catalogue.get_projects() or planfix_cache.get_projects()
+    if str(project_id) not in {str(project.get('id')) for project in projects}:
+        return JsonResponse({'error': 'Проект не найден'}, status=404)
+
+    try:
+        wait = float(request.GET.get('wait', project_refresher.wait_timeout))
+    except ValueError:
+        return JsonResponse({'error': 'Параметр wait должен быть числом'}, status=400)
+
+    result = project_refresher.refresh(project_id, wait=max(0.0, min(wait, 60.0)))
+    status = {'started': 202, 'failed': 502}.get(result['status'], 200)
+    return JsonResponse(result, status=status)
+
+@api_login_required
+def employees_api(request):
+    """
+    API endpoint со страницей сотрудников и их загрузкой
+    (?page=, ?page_size=, ?sort=name|active|overdue|total, ?q=)
+    """
+    from chat.planfix_workload import employee_workload
+
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 50))
+    except ValueError:
+        return JsonResponse({'error': 'page и page_size должны быть целыми числами'}, status=400)
+
+    sort = request.GET.get('sort', 'name')
+    if sort not in ('name', 'active', 'overdue', 'total'):
+        return JsonResponse({'error': 'sort должен быть name, active, overdue или total'}, status=400)
+
+    # Загрузка считается только по задачам, видимым пользователю
+    return JsonResponse(employee_workload.get_employees_page(
+        page, page_size, sort, request.GET.get('q'), task_visibility.get_visible_ids(request.user)
+    ))
+
+@api_login_required
+def employee_workload_api(request, employee_id):
+    """
+    API endpoint с загрузкой сотрудника и страницей его задач
+    (?state=active|completed|overdue, ?page=, ?page_size=)
+    """
+    from chat.planfix_workload import employee_workload, TASK_STATES
+
+    state = request.GET.get('state', 'active')
+    if state not in TASK_STATES:
+        return JsonResponse({'error': 'state должен быть active, completed или overdue'}, status=400)
+
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 100))
+    except ValueError:
+        return JsonResponse({'error': 'page и page_size должны быть целыми числами'}, status=400)
+
+    record = employee_workload.get(employee_id)
+    if record is None:
+        return JsonResponse({'error': 'Сотрудник не найден'}, status=404)
+
+    # Видимость применяется до разбиения на страницы, сводка считается по видимым задачам
+    visible_ids = task_visibility.get_visible_ids(request.user)
+    result = employee_workload.get_tasks_page(employee_id, state, page, page_size, visible_ids)
+    result['employee'] = employee_workload.get_summary(record, visible_ids)
+    result['state'] = state
+    return JsonResponse(result)
+
+@api_login_required
+def my_tasks_api(request):
+    """
+    API endpoint с задачами текущего пользователя по его planfix_user_id
+    (?role=assigned|created, ?state=active|completed|overdue, ?page=, ?page_size=, ?fields= как в /api/tasks/)
+    """
+    from chat.planfix_workload import employee_workload, paginate, TASK_STATES
+
+    role = request.GET.get('role', 'assigned')
+    state = request.GET.get('state', 'active')
+    if role not in ('assigned', 'created'):
+        return JsonResponse({'error': 'role должен быть assigned или created'}, status=400)
+    if state not in TASK_STATES:
+        return JsonResponse({'error': 'state должен быть active, completed или overdue'}, status=400)
+
+    try:
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 100))
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if not getattr(request.user, 'planfix_user_id', None):
+        return JsonResponse({'error': 'Профиль не связан с пользователем Planfix'}, status=404)
+
+    # Готовая запись загрузки вместо перебора всех задач
+    employee_id = employee_workload.get_employee_id(request.user.planfix_user_id)
+    visible_ids = task_visibility.get_visible_ids(request.user)
+    if employee_id is None:
+        result = dict(paginate([], page, page_size)[1], tasks=[], employee=None)
+    else:
+        result = employee_workload.get_tasks_page(
+            employee_id, state if role == 'assigned' else f'created_{state}', page, page_size, visible_ids
+        )
+        result['employee'] = employee_workload.get_summary(employee_workload.get(employee_id), visible_ids)
+    result['tasks'] = project_tasks(result['tasks'], fields)
+    result['role'] = role
+    result['state'] = state
+    return JsonResponse(result)
 
 def clear_cache():
     """Очистка файлов кэша"""
@@ -178,17 +477,53 @@ if __name__ == "__main__":
     logger.info(f"Всего загружено задач: {len(tasks)}")
     logger.info(f"Проверка проектов: {projects_info}")
 
+@api_login_required
 def task_api(request, task_id):
-    """API endpoint для получения данных задачи"""
+    """API endpoint для получения данных задачи (?fields= как в /api/tasks/)"""
+    try:
+        fields = parse_fields(request.GET.get('fields'))
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    
     try:
         # Получаем задачу из Planfix
         from .planfix_service import get_task_by_id
-        task = get_task_by_id(task_id)
+        task = get_task_by_id(task_id) if task_visibility.is_visible(request.user, task_id) else None
         
         if not task:
             return JsonResponse({'error': 'Задача не найдена'}, status=404)
         
-        return JsonResponse(task)
+        return JsonResponse(project(task, fields))
     except Exception as e:
         logger.error(f"Ошибка при получении задачи {task_id}: {e}", exc_info=True)
         return JsonResponse({'error': 'Не удалось загрузить задачу', 'message': str(e)}, status=500)
+
+@csrf_exempt
+@require_POST
+def planfix_webhook_api(request):
+    """
+    Приемник вебхуков Planfix: создание, изменение и удаление задач.
+    События ставятся в очередь и применяются к кэшу пакетами (chat.tasks.apply_planfix_webhook_events)
+    """
+    from .planfix_webhooks import parse_webhook_payload, webhook_queue
+    
+    secret = getattr(settings, 'PLANFIX_WEBHOOK_SECRET', '')
+    if not secret:
+        logger.error("Вебхук Planfix отклонен: PLANFIX_WEBHOOK_SECRET не настроен")
+        return JsonResponse({'error': 'Вебхуки не настроены'}, status=503)
+    
+    # Только заголовок: параметр запроса попадал бы в журналы nginx и access log
+    token = request.headers.get('X-Planfix-Webhook-Token', '')
+    if not hmac.compare_digest(token.encode(), secret.encode()):
+        logger.warning("Вебхук Planfix отклонен: неверный токен")
+        return JsonResponse({'error': 'Неверный токен'}, status=403)
+    
+    try:
+        events = parse_webhook_payload(json.loads(request.body))
+    except (json.JSONDecodeError, ValueError) as e:
+        logger.warning(f"Некорректный вебхук Planfix: {e}")
+        return JsonResponse({'error': 'Некорректные данные', 'message': str(e)}, status=400)
+    
+    webhook_queue.enqueue(events)
+    logger.info(f"Принято событий вебхука Planfix: {len(events)}")
+    return JsonResponse({'accepted': len(events)}, status=202)
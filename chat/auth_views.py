@@ -67,9 +67,14 @@ def profile_view(request):
     else:
         form = UserSettingsForm(instance=user)
     
+    # Число активных задач из предрассчитанной загрузки по planfix_user_id
+    from .planfix_workload import employee_workload
+    record = employee_workload.get_for_user(user)
+
     return render(request, 'chat/profile.html', {
         'user': user,
-        'form': form
+        'form': form,
+        'active_tasks': record['active_count'] if record else 0
     })
 
 def access_denied(request):
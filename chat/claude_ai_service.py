@@ -1,10 +1,13 @@
 import json
 import logging
+import re
 import time
 from typing import Dict, List, Any, Optional, Union
 from django.conf import settings
 import requests
 from .planfix_cache_service import planfix_cache
+from .planfix_fuzzy import fuzzy_search
+from .planfix_visibility import task_visibility
 from .analytics_service import AnalyticsService
 
 # Configure logging
@@ -77,12 +80,16 @@ class ClaudeAIService:
         Args:
             user_query: The user's question or request
             conversation_history: Optional list of previous messages in the conversation
-            user: Optional user object for analytics
+            user: Requesting user: personal task view, task visibility and analytics
             conversation: Optional conversation object for analytics
             
         Returns:
             Dictionary with response data including response_type and message
         """
+        # Anonymous requests get no personal or per-user task context and are not tracked per user
+        if user is not None and not user.is_authenticated:
+            user = None
+        
         try:
             print("\n=== Starting query processing ===")
             print(f"User query: {user_query}")
@@ -95,7 +102,7 @@ class ClaudeAIService:
             
             # Add context from Planfix data based on the query
             print("\n=== Enriching query with context ===")
-            query_with_context = self._enrich_query_with_context(user_query)
+            query_with_context = self._enrich_query_with_context(user_query, user=user)
             print(f"Context length: {len(query_with_context)} chars")
             
             # Prepare messages for Claude API
@@ -140,34 +147,7 @@ class ClaudeAIService:
             # Log the response time
             logger.info(f"Claude AI response time: {response_time:.2f} seconds")
             
-            # Record analytics if user and conversation are provided
-            if user and conversation:
-                self.analytics.track_ai_response(
-                    user=user,
-                    message=None,
-                    ai_model=None,
-                    response_time=response_time
-                )
-                
-                # Update user metrics for new conversation
-                from .models import UserMetrics
-                from django.utils import timezone
-                
-                today = timezone.now().date()
-                if conversation.created_at.date() == today:
-                    user_metrics, _ = UserMetrics.objects.get_or_create(
-                        user=user,
-                        day=today,
-                        defaults={
-                            'messages_sent': 0,
-                            'conversations_count': 0,
-                            'tokens_used': 0,
-                            'tasks_integrated': 0,
-                            'average_response_time': 0
-                        }
-                    )
-                    user_metrics.conversations_count += 1
-                    user_metrics.save()
+            # Messages, tokens and new conversations of the user are counted in send_message
             
             # Log successful query
             self.analytics.log_ai_query(
@@ -192,14 +172,6 @@ class ClaudeAIService:
             
             logger.error(f"Ошибка при обработке запроса: {error_msg}", exc_info=True)
             
-            # Record error in analytics
-            if user:
-                self.analytics.track_error(
-                    user=user,
-                    error_message=error_msg,
-                    conversation=conversation
-                )
-            
             # Log failed query
             self.analytics.log_ai_query(
                 query=user_query,
@@ -213,12 +185,59 @@ class ClaudeAIService:
                 'message': f"Sorry, there was an error processing your request. Please try again later or contact the administrator if the problem persists."
             }
     
-    def _enrich_query_with_context(self, query: str) -> str:
+    def _format_my_tasks(self, record: Dict[str, Any], user) -> str:
+        """
+        Format a user's own workload record (see planfix_workload) for the query context
+        
+        Args:
+            record: Workload record of the user's planfix_user_id
+            user: User object, for task visibility
+        
+        Returns:
+            Context section with the user's counts, overdue tasks, deadlines and projects
+        """
+        from .planfix_workload import employee_workload
+        
+        # Counts, projects and deadlines of the tasks the user can see
+        record = employee_workload.scope(record, task_visibility.get_visible_ids(user))
+        context = f"\nYour tasks (Planfix user {record['name']}):\n"
+        context += (f"- Assigned to you: {record['active_count']} active, {record['overdue_count']} overdue, "
+                    f"{record['completed_count']} completed\n")
+        context += (f"- Created by you: {record['created_active_count']} active, {record['created_overdue_count']} overdue, "
+                    f"{record['created_completed_count']} completed\n")
+        
+        overdue_tasks = planfix_cache.get_task_index().get_many(record['overdue_task_ids'][:10])
+        if overdue_tasks:
+            context += "\nYour overdue tasks:\n"
+            for task in overdue_tasks:
+                context += f"- {task.get('name', 'Unnamed Task')} (ID: {task.get('id', 'N/A')})"
+                end_date = planfix_cache._get_task_end_date(task)
+                if end_date:
+                    context += f", due: {end_date}"
+                context += "\n"
+            if record['overdue_count'] > 10:
+                context += f"...and {record['overdue_count'] - 10} more overdue tasks\n"
+        
+        if record['nearest_deadlines']:
+            context += "\nYour upcoming deadlines:\n"
+            for task in record['nearest_deadlines']:
+                context += f"- {task['name'] or 'Unnamed Task'} (ID: {task['id']}), due: {task['date']}\n"
+        
+        if record['project_breakdown']:
+            context += "\nYour tasks by project:\n"
+            for project in record['project_breakdown'][:10]:
+                context += (f"- {project['name'] or 'Unnamed Project'} (ID: {project['id']}): {project['active']} active, "
+                            f"{project['overdue']} overdue, {project['completed']} completed\n")
+        
+        return context
+    
+    def _enrich_query_with_context(self, query: str, user=None) -> str:
         """
         Enrich the user query with relevant Planfix data based on the query content
         
         Args:
             query: The user's original query
+            user: Optional user object; tasks are limited to the ones visible to the user
         
         Returns:
             Enriched query with Planfix context
@@ -236,9 +255,25 @@ class ClaudeAIService:
         # Add more specific data based on the query
         query_lower = query.lower()
         
+        # Personal questions read the user's precomputed workload record instead of scanning all tasks.
+        # "me"/"мне" are left out: "tell me about overdue tasks" is not a question about the user's own tasks
+        my_record = None
+        if user is not None and re.search(r'\b(my|mine|мо[йяеёи]|меня|мной)\b', query_lower):
+            from .planfix_workload import employee_workload
+            my_record = employee_workload.get_for_user(user)
+        if my_record is not None:
+            context += self._format_my_tasks(my_record, user)
+        
+        # The personal record replaces the account-wide overdue and this-week lists only when
+        # the question is not also about a project, person or team
+        scoped = any(keyword in query_lower for keyword in [
+            'project', 'проект', 'user', 'team', 'member', 'пользовател', 'команд', 'сотрудник'
+        ])
+        personal_only = my_record is not None and not scoped
+        
         # Check if query is about overdue tasks
-        if any(keyword in query_lower for keyword in ['overdue', 'late', 'просроч', 'опоздав']):
-            overdue_tasks = planfix_cache.get_overdue_tasks()
+        if not personal_only and any(keyword in query_lower for keyword in ['overdue', 'late', 'просроч', 'опоздав']):
+            overdue_tasks = task_visibility.filter_tasks(user, planfix_cache.get_overdue_tasks())
             context += "\nOverdue tasks:\n"
             for i, task in enumerate(overdue_tasks[:10]):  # Limit to 10 tasks
                 context += f"- {task.get('name', 'Unnamed Task')} (ID: {task.get('id', 'N/A')})"
@@ -264,9 +299,9 @@ class ClaudeAIService:
                 context += f"...and {len(overdue_tasks) - 10} more overdue tasks\n"
         
         # Check if query is about upcoming tasks or this week's tasks
-        if any(keyword in query_lower for keyword in ['this week', 'upcoming', 'next week', 'следующ', 'ближайш', 'на неделе']):
+        if not personal_only and any(keyword in query_lower for keyword in ['this week', 'upcoming', 'next week', 'следующ', 'ближайш', 'на неделе']):
             # Get tasks due this week
-            active_tasks = planfix_cache.get_active_tasks()
+            active_tasks = task_visibility.filter_tasks(user, planfix_cache.get_active_tasks())
             import datetime
             today = datetime.datetime.now().date()
             week_end = (today + datetime.timedelta(days=7)).isoformat()
@@ -311,6 +346,17 @@ class ClaudeAIService:
                 if project_name and project_name in query_lower:
                     projects_info.append(project)
             
+            # Tolerate typos and the other script ("Девент" for "Devent")
+            if not projects_info:
+                mentions = fuzzy_search.find_mentions(query, 'projects', skip_prefixes=['project', 'проект'])
+                projects_info = planfix_cache._order_by_ids(projects, [str(mention['id']) for mention in mentions])
+            
+            # Refresh the mentioned projects in the background for follow-up questions
+            if projects_info:
+                from .planfix_project_refresh import project_refresher
+                for project in projects_info:
+                    project_refresher.refresh(project['id'], wait=0)
+            
             # If no specific project was found but they asked about projects, add top projects
             if not projects_info and any(keyword in query_lower for keyword in ['projects', 'проекты']):
                 # Sort projects by task count and get top 5
@@ -330,10 +376,17 @@ class ClaudeAIService:
             users = planfix_cache.get_users()
             users_info = []
             
-            for user in users:
-                user_name = user.get('name', '').lower()
-                if user_name and user_name in query_lower:
-                    users_info.append(user)
+            for person in users:
+                person_name = person.get('name', '').lower()
+                if person_name and person_name in query_lower:
+                    users_info.append(person)
+            
+            # Tolerate typos and the other script
+            if not users_info:
+                mentions = fuzzy_search.find_mentions(
+                    query, 'users', skip_prefixes=['user', 'team', 'member', 'пользовател', 'команд', 'сотрудник']
+                )
+                users_info = planfix_cache._order_by_ids(users, [str(mention['id']) for mention in mentions])
             
             # If no specific user was found but they asked about users/team, add top users
             if not users_info and any(keyword in query_lower for keyword in ['users', 'team', 'members', 'команда', 'сотрудники']):
@@ -342,20 +395,19 @@ class ClaudeAIService:
             
             if users_info:
                 context += "\nTeam information:\n"
-                for user in users_info:
-                    context += f"- {user.get('name', 'Unnamed User')} (ID: {user.get('id', 'N/A')})\n"
-                    context += f"  Assigned tasks: {user.get('assigned_tasks', 0)}\n"
-                    context += f"  Active tasks: {user.get('assigned_active', 0)}\n"
-                    context += f"  Completed tasks: {user.get('assigned_completed', 0)}\n"
-                    context += f"  Overdue tasks: {user.get('assigned_overdue', 0)}\n"
-                    context += f"  Created tasks: {user.get('created_tasks', 0)}\n"
+                for person in users_info:
+                    context += f"- {person.get('name', 'Unnamed User')} (ID: {person.get('id', 'N/A')})\n"
+                    context += f"  Assigned tasks: {person.get('assigned_tasks', 0)}\n"
+                    context += f"  Active tasks: {person.get('assigned_active', 0)}\n"
+                    context += f"  Completed tasks: {person.get('assigned_completed', 0)}\n"
+                    context += f"  Overdue tasks: {person.get('assigned_overdue', 0)}\n"
+                    context += f"  Created tasks: {person.get('created_tasks', 0)}\n"
         
         # Check if query is about a specific task ID
-        import re
         task_id_match = re.search(r'(?:task|задача|#)\s*(\d+)', query_lower)
         if task_id_match:
             task_id = task_id_match.group(1)
-            task = planfix_cache.get_task_by_id(task_id)
+            task = planfix_cache.get_task_by_id(task_id) if task_visibility.is_visible(user, task_id) else None
             
             if task:
                 context += f"\nTask #{task_id} details:\n"
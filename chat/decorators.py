@@ -1,5 +1,5 @@
 from django.contrib.auth.decorators import user_passes_test
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.urls import reverse
 from functools import wraps
 
@@ -21,4 +21,13 @@ def login_required_with_redirect(view_func):
             return view_func(request, *args, **kwargs)
         else:
             return HttpResponseRedirect(reverse('chat:login') + f'?next={request.path}')
-    return wrapper
\ No newline at end of file
+    return wrapper
+
+def api_login_required(view_func):
+    """Декоратор для API: неавторизованный запрос получает 401 в JSON вместо перенаправления"""
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return view_func(request, *args, **kwargs)
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+    return wrapper
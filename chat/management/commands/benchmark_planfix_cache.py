@@ -0,0 +1,193 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from datetime import datetime
+from pathlib import Path
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Результаты всех запусков, по одной строке JSON на размер набора
+DEFAULT_OUTPUT = Path(settings.BASE_DIR) / 'benchmarks' / 'planfix_cache.jsonl'
+
+SEARCH_QUERIES = ['отчет', 'checkout', 'Маркетинг', 'нет такого текста']
+ENRICH_QUERIES = [
+    'Какие задачи просрочены?',
+    'Что у нас на этой неделе, upcoming tasks?',
+    'Покажи проекты',
+    'Как загружена команда?',
+    'Расскажи про задачу #{task_id}'
+]
+
+class Command(BaseCommand):
+    help = ('Замеряет производительность кэша Planfix на синтетических данных '
+            '(обновление, производные кэши, get_stats, search_tasks, get_task_by_id, контекст для ИИ)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000],
+                            help='Размеры наборов задач')
+        parser.add_argument('--repeat', type=int, default=5, help='Повторы для операций чтения (берется медиана)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора данных')
+        parser.add_argument('--output', default=str(DEFAULT_OUTPUT), help='Файл с историей результатов (JSONL)')
+        parser.add_argument('--keep-data', action='store_true', help='Не удалять сгенерированный кэш')
+        # Внутренний режим: один размер в отдельном процессе с собственной директорией кэша
+        parser.add_argument('--worker', action='store_true', help='(внутреннее) выполнить замер в текущем процессе')
+        parser.add_argument('--result-file', help='(внутреннее) файл для результата замера')
+
+    def handle(self, *args, **options):
+        if options['worker']:
+            self._run_worker(options)
+            return
+
+        output = Path(options['output'])
+        output.parent.mkdir(parents=True, exist_ok=True)
+        previous = self._load_previous(output)
+
+        for size in options['sizes']:
+            self.stdout.write(f'Набор из {size} задач...')
+            cache_dir = tempfile.mkdtemp(prefix=f'planfix_bench_{size}_')
+            result_file = os.path.join(cache_dir, 'result.json')
+
+            # Модули кэша читают путь при импорте, поэтому каждый размер - отдельный процесс
+            env = dict(os.environ, PLANFIX_CACHE_DIR=cache_dir)
+            command = [
+                sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'benchmark_planfix_cache',
+                '--worker', '--sizes', str(size), '--repeat', str(options['repeat']),
+                '--seed', str(options['seed']), '--result-file', result_file
+            ]
+            completed = subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+
+            if completed.returncode != 0 or not os.path.exists(result_file):
+                shutil.rmtree(cache_dir, ignore_errors=True)
+                raise CommandError(f'Замер для {size} задач завершился с ошибкой:\n{completed.stderr[-2000:]}')
+
+            with open(result_file, 'r', encoding='utf-8') as f:
+                result = json.load(f)
+            result.update({'timestamp': datetime.now().isoformat(timespec='seconds'), 'commit': self._git_commit()})
+
+            with open(output, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(result, ensure_ascii=False) + '\n')
+
+            self._print_result(result, previous.get(size))
+
+            if options['keep_data']:
+                self.stdout.write(f'  Данные сохранены в {cache_dir}')
+            else:
+                shutil.rmtree(cache_dir, ignore_errors=True)
+
+        self.stdout.write(self.style.SUCCESS(f'Результаты добавлены в {output}'))
+
+    def _run_worker(self, options):
+        """Замер одного размера; PLANFIX_CACHE_DIR уже указывает на пустую директорию"""
+        from chat.planfix_synthetic import generate_dataset
+        from chat.planfix_cache_service import planfix_cache, snapshot_write_lock
+        from chat.planfix_service import save_tasks_cache
+        from chat.planfix_sync_staging import sync_staging
+        from chat.planfix_config import TASKS_REQUEST
+        from chat.claude_ai_service import ClaudeAIService
+
+        size = options['sizes'][0]
+        repeat = options['repeat']
+        timings = {}
+
+        started = time.perf_counter()
+        tasks = generate_dataset(size, seed=options['seed'])
+        timings['generate'] = time.perf_counter() - started
+
+        # Обновление без сети: постраничная запись в промежуточную область и публикация снимка
+        page_size = TASKS_REQUEST['pageSize']
+        started = time.perf_counter()
+        sync_staging.begin(page_size, resume_window=0)
+        for page, offset in enumerate(range(0, len(tasks), page_size)):
+            sync_staging.save_page(page, tasks[offset:offset + page_size])
+        staged_tasks = sync_staging.load_tasks()
+        with snapshot_write_lock():
+            save_tasks_cache(staged_tasks)
+        sync_staging.clear()
+        timings['refresh'] = time.perf_counter() - started
+        del tasks, staged_tasks
+
+        started = time.perf_counter()
+        planfix_cache.get_task_index()
+        timings['index_build'] = time.perf_counter() - started
+
+        derived_started = time.perf_counter()
+        for name in ('active_tasks', 'completed_tasks', 'overdue_tasks', 'projects', 'users', 'stats'):
+            started = time.perf_counter()
+            getattr(planfix_cache, f'_generate_{name}_cache')()
+            timings[f'derived:{name}'] = time.perf_counter() - started
+        timings['derived_build'] = time.perf_counter() - derived_started
+
+        timings['get_stats'] = self._median(planfix_cache.get_stats, repeat)
+
+        for query in SEARCH_QUERIES:
+            timings[f'search_tasks:{query}'] = self._median(lambda: planfix_cache.search_tasks(query), repeat)
+
+        rng = random.Random(options['seed'])
+        task_ids = [str(rng.randint(1, size)) for _ in range(1000)]
+        started = time.perf_counter()
+        for task_id in task_ids:
+            planfix_cache.get_task_by_id(task_id)
+        timings['get_task_by_id'] = (time.perf_counter() - started) / len(task_ids)
+
+        ai_service = ClaudeAIService()
+        for query in ENRICH_QUERIES:
+            query = query.format(task_id=task_ids[0])
+            timings[f'enrich:{query}'] = self._median(lambda: ai_service._enrich_query_with_context(query), repeat)
+
+        result = {
+            'size': size,
+            'seed': options['seed'],
+            'repeat': repeat,
+            'timings': {name: round(value, 6) for name, value in timings.items()},
+            # ru_maxrss в килобайтах на Linux
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+        with open(options['result_file'], 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False)
+
+    def _median(self, func, repeat):
+        """Медиана времени выполнения функции"""
+        durations = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            func()
+            durations.append(time.perf_counter() - started)
+        return statistics.median(durations)
+
+    def _load_previous(self, output):
+        """Последний результат для каждого размера"""
+        previous = {}
+        if output.exists():
+            with open(output, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        result = json.loads(line)
+                        previous[result['size']] = result
+        return previous
+
+    def _git_commit(self):
+        """Текущий коммит, если проект в git"""
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], cwd=settings.BASE_DIR,
+                capture_output=True, text=True, timeout=5
+            ).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
+
+    def _print_result(self, result, previous):
+        """Вывод результата и сравнения с предыдущим запуском"""
+        self.stdout.write(f"  Пиковая память: {result['peak_rss_mb']} МБ")
+        for name, value in result['timings'].items():
+            line = f"  {name:<60} {value * 1000:>12.3f} мс"
+            if previous and name in previous['timings'] and previous['timings'][name]:
+                change = (value - previous['timings'][name]) / previous['timings'][name] * 100
+                line += f"  ({change:+.1f}% к {previous.get('commit') or previous['timestamp']})"
+            self.stdout.write(line)
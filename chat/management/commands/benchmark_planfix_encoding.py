@@ -0,0 +1,102 @@
+from django.core.management.base import BaseCommand
+import gc
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+class Command(BaseCommand):
+    help = ('Сравнивает хранение снимка задач Planfix в виде обычного списка и со словарным '
+            'кодированием (статусы, проекты, люди): размер файла, время загрузки и удерживаемую память')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000],
+                            help='Размеры наборов задач')
+        parser.add_argument('--repeat', type=int, default=3, help='Повторы загрузки (берется медиана)')
+        parser.add_argument('--seed', type=int, default=42, help='Seed генератора данных')
+
+    def handle(self, *args, **options):
+        from chat.planfix_synthetic import generate_dataset
+        from chat.planfix_codec import load_tasks_file, dump_tasks_file
+
+        formats = {
+            'list': (
+                lambda tasks, f: json.dump(tasks, f, ensure_ascii=False, indent=2),
+                self._load_list
+            ),
+            'encoded': (
+                lambda tasks, f: dump_tasks_file(tasks, f, indent=2),
+                load_tasks_file
+            )
+        }
+
+        work_dir = tempfile.mkdtemp(prefix='planfix_encoding_')
+        try:
+            for size in options['sizes']:
+                self.stdout.write(f'Набор из {size} задач...')
+                tasks = generate_dataset(size, seed=options['seed'])
+
+                results = {}
+                for name, (dump, load) in formats.items():
+                    path = os.path.join(work_dir, f'{name}_{size}.json')
+                    with open(path, 'w', encoding='utf-8') as f:
+                        dump(tasks, f)
+
+                    durations = []
+                    for _ in range(options['repeat']):
+                        started = time.perf_counter()
+                        load(path)
+                        durations.append(time.perf_counter() - started)
+
+                    results[name] = {
+                        'file_bytes': os.path.getsize(path),
+                        'load_seconds': statistics.median(durations),
+                        'retained_bytes': self._retained(lambda: load(path))
+                    }
+                del tasks
+
+                self._print_results(results)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _load_list(self, path):
+        """Загрузка снимка в виде обычного списка"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _retained(self, loader):
+        """Память, удерживаемая загруженным списком задач"""
+        gc.collect()
+        tracemalloc.start()
+        try:
+            before = tracemalloc.get_traced_memory()[0]
+            result = loader()
+            gc.collect()
+            retained = tracemalloc.get_traced_memory()[0] - before
+            del result
+        finally:
+            tracemalloc.stop()
+        return retained
+
+    def _print_results(self, results):
+        """Вывод сравнения форматов"""
+        base = results['list']
+        for name, result in results.items():
+            self.stdout.write(
+                f"  {name:<8} файл {result['file_bytes'] / 1048576:>9.1f} МБ"
+                f"  загрузка {result['load_seconds'] * 1000:>10.1f} мс"
+                f"  память {result['retained_bytes'] / 1048576:>9.1f} МБ"
+            )
+        encoded = results['encoded']
+        self.stdout.write(self.style.SUCCESS(
+            f"  Экономия: файл {self._saving(base['file_bytes'], encoded['file_bytes'])}, "
+            f"загрузка {self._saving(base['load_seconds'], encoded['load_seconds'])}, "
+            f"память {self._saving(base['retained_bytes'], encoded['retained_bytes'])}"
+        ))
+
+    def _saving(self, before, after):
+        """Процент экономии"""
+        return f"{(before - after) / before * 100:+.1f}%" if before else '-'
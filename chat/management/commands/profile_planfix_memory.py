@@ -0,0 +1,82 @@
+from django.core.management.base import BaseCommand, CommandError
+from pathlib import Path
+
+class Command(BaseCommand):
+    help = ('Профилирует память кэша Planfix через tracemalloc: снимки до и после обновления '
+            'и загрузки кэшей, топ мест выделения, удерживаемый размер каждого представления и индекса')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--refresh', action='store_true',
+                            help='Выполнить refresh_all_caches между снимками (обращается к Planfix)')
+        parser.add_argument('--top', type=int, default=15, help='Количество мест выделения в отчетах')
+        parser.add_argument('--frames', type=int, default=10, help='Глубина стека, сохраняемая tracemalloc')
+        parser.add_argument('--group-by', default='lineno', choices=['lineno', 'filename', 'traceback'],
+                            help='Группировка мест выделения')
+        parser.add_argument('--dump-dir', help='Сохранить снимки в директорию для последующего сравнения')
+        parser.add_argument('--diff', nargs=2, metavar=('OLD', 'NEW'),
+                            help='Только сравнить два ранее сохраненных снимка (поиск утечек между запусками)')
+
+    def handle(self, *args, **options):
+        from chat.planfix_memory import memory_profiler
+
+        limit = options['top']
+        key_type = options['group_by']
+
+        if options['diff']:
+            old_file, new_file = options['diff']
+            try:
+                old_label = memory_profiler.load_snapshot(old_file, 'old')
+                new_label = memory_profiler.load_snapshot(new_file, 'new')
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Не удалось загрузить снимок: {e}')
+            self._print_diff(memory_profiler.diff(old_label, new_label, limit, key_type))
+            return
+
+        memory_profiler.start(options['frames'])
+        try:
+            if options['refresh']:
+                self.stdout.write('Обновление кэшей...')
+            report = memory_profiler.profile_refresh(refresh=options['refresh'], limit=limit, key_type=key_type)
+
+            if 'refresh_diff' in report:
+                self.stdout.write(self.style.SUCCESS('Изменения памяти при обновлении:'))
+                self._print_diff(report['refresh_diff'])
+
+            self.stdout.write(self.style.SUCCESS('Удерживаемая память представлений и индекса:'))
+            for name, sizes in report['retained'].items():
+                self.stdout.write(
+                    f"  {name:<20} {self._format_size(sizes['retained_bytes']):>12}"
+                    f"  (пик при загрузке {self._format_size(sizes['peak_bytes'])})"
+                )
+
+            self.stdout.write(self.style.SUCCESS('Изменения памяти после загрузки кэшей:'))
+            self._print_diff(report['loads_diff'])
+
+            self.stdout.write(self.style.SUCCESS('Топ мест выделения памяти:'))
+            for site in report['top']:
+                self.stdout.write(f"  {self._format_size(site['size']):>12} {site['count']:>9} блоков  {site['location']}")
+
+            if options['dump_dir']:
+                dump_dir = Path(options['dump_dir'])
+                dump_dir.mkdir(parents=True, exist_ok=True)
+                for snapshot in report['status']['snapshots']:
+                    memory_profiler.dump_snapshot(snapshot['label'], dump_dir / f"{snapshot['label']}.tracemalloc")
+                self.stdout.write(f'Снимки сохранены в {dump_dir}')
+        finally:
+            memory_profiler.stop()
+
+    def _print_diff(self, diff):
+        """Вывод разницы двух снимков"""
+        self.stdout.write(f"  Всего: {self._format_size(diff['size_diff'], signed=True)}")
+        for site in diff['sites']:
+            self.stdout.write(
+                f"  {self._format_size(site['size_diff'], signed=True):>12} {site['count_diff']:>+9} блоков  {site['location']}"
+            )
+
+    def _format_size(self, size, signed=False):
+        """Размер в читаемом виде"""
+        sign = '+' if signed and size > 0 else ''
+        for unit in ('Б', 'КБ', 'МБ'):
+            if abs(size) < 1024 or unit == 'МБ':
+                return f'{sign}{size:.1f} {unit}' if unit != 'Б' else f'{sign}{size} {unit}'
+            size /= 1024
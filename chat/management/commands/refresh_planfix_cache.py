@@ -6,6 +6,13 @@ import time
 class Command(BaseCommand):
     help = 'Обновляет кэш данных Planfix'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--allow-shrink', action='store_true',
+                            help='Опубликовать снимок, даже если задач стало заметно меньше, чем в предыдущем')
+        parser.add_argument('--tier', choices=['hot', 'cold'],
+                            help='Уровень синхронизации: hot - только незавершенные задачи, cold - все задачи '
+                                 '(по умолчанию уровень, срок которого подошел)')
+
     def handle(self, *args, **options):
         start_time = time.time()
         self.stdout.write(self.style.SUCCESS(f'Начало обновления кэша Planfix: {timezone.now()}'))
@@ -15,11 +22,11 @@ class Command(BaseCommand):
             from chat.planfix_cache_service import planfix_cache
             
             # Обновление основного кэша задач
-            tasks = update_tasks_cache(force=True)
+            tasks = update_tasks_cache(force=True, allow_shrink=options['allow_shrink'], tier=options['tier'])
             self.stdout.write(self.style.SUCCESS(f'Основной кэш задач обновлен, загружено {len(tasks)} задач'))
             
             # Обновление производных кэшей
-            planfix_cache.refresh_all_caches()
+            planfix_cache.refresh_all_caches(tier=options['tier'])
             self.stdout.write(self.style.SUCCESS('Все производные кэши обновлены'))
             
             # Получение обновленной статистики
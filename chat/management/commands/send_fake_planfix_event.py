@@ -0,0 +1,72 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+import copy
+import json
+import random
+import requests
+
+class Command(BaseCommand):
+    help = 'Отправляет тестовые события вебхука Planfix (создание, изменение, удаление задач)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event', choices=['create', 'update', 'delete'], help='Тип события')
+        parser.add_argument('--task-id', help='ID задачи (по умолчанию - случайная задача из кэша)')
+        parser.add_argument('--count', type=int, default=1, help='Количество событий в пакете')
+        parser.add_argument('--id-only', action='store_true',
+                            help='Отправлять только ID задачи (данные будут запрошены из API Planfix)')
+        parser.add_argument('--url', default='http://127.0.0.1:8000/api/planfix/webhook/', help='Адрес приемника')
+        parser.add_argument('--token', default=None, help='Токен вебхука (по умолчанию PLANFIX_WEBHOOK_SECRET)')
+        parser.add_argument('--local', action='store_true',
+                            help='Не отправлять HTTP-запрос: поставить события в очередь и сразу применить их')
+
+    def handle(self, *args, **options):
+        from chat.planfix_cache_service import planfix_cache
+
+        tasks = planfix_cache.get_all_tasks()
+        events = []
+
+        for i in range(options['count']):
+            if options['event'] == 'create':
+                template = copy.deepcopy(random.choice(tasks)) if tasks else {'status': {'id': 2, 'name': 'В работе'}}
+                max_id = max([int(task['id']) for task in tasks if str(task.get('id', '')).isdigit()] or [0])
+                task = template
+                task['id'] = int(options['task_id']) + i if options['task_id'] else max_id + 1 + i
+                task['name'] = f"Тестовая задача {task['id']}"
+            else:
+                if options['task_id']:
+                    task = copy.deepcopy(planfix_cache.get_task_by_id(options['task_id']) or {'id': options['task_id']})
+                elif tasks:
+                    task = copy.deepcopy(random.choice(tasks))
+                else:
+                    raise CommandError('Кэш задач пуст, укажите --task-id')
+
+                if options['event'] == 'update' and task.get('name'):
+                    task['name'] = f"{task['name']} (изменено)"
+
+            if options['event'] == 'delete' or options['id_only']:
+                events.append({'event': f"task.{options['event']}", 'task_id': task['id']})
+            else:
+                events.append({'event': f"task.{options['event']}", 'task': task})
+
+        payload = {'events': events} if len(events) > 1 else events[0]
+
+        if options['local']:
+            from chat.planfix_webhooks import parse_webhook_payload, webhook_queue, apply_pending_events
+
+            webhook_queue.enqueue(parse_webhook_payload(payload))
+            summary = apply_pending_events()
+            self.stdout.write(self.style.SUCCESS(f'События применены локально: {summary}'))
+            return
+
+        token = options['token'] if options['token'] is not None else settings.PLANFIX_WEBHOOK_SECRET
+        response = requests.post(
+            options['url'],
+            data=json.dumps(payload, ensure_ascii=False).encode('utf-8'),
+            headers={'Content-Type': 'application/json', 'X-Planfix-Webhook-Token': token},
+            timeout=10
+        )
+
+        if response.status_code >= 400:
+            raise CommandError(f'Приемник ответил {response.status_code}: {response.text}')
+
+        self.stdout.write(self.style.SUCCESS(f'Отправлено событий: {len(events)}, ответ: {response.text}'))
@@ -0,0 +1,34 @@
+# Generated by Django 5.0 on 2026-10-19 06:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_merge_0002_add_ai_models_0002_auto_20250509_2105'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlanfixRefreshStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refresh_id', models.CharField(db_index=True, max_length=36)),
+                ('refresh_kind', models.CharField(max_length=50)),
+                ('stage', models.CharField(max_length=100)),
+                ('started_at', models.DateTimeField()),
+                ('duration', models.FloatField(default=0.0)),
+                ('items_count', models.IntegerField(default=0)),
+                ('bytes_count', models.BigIntegerField(default=0)),
+                ('peak_memory', models.BigIntegerField(default=0)),
+                ('success', models.BooleanField(default=True)),
+            ],
+            options={
+                'verbose_name': 'Этап обновления Planfix',
+                'verbose_name_plural': 'Этапы обновления Planfix',
+                'ordering': ['-started_at'],
+                'indexes': [models.Index(fields=['stage', 'started_at'], name='chat_planfi_stage_f60d65_idx')],
+            },
+        ),
+    ]
@@ -3,7 +3,7 @@ from .user_settings import UserSettings
 from .ai_model import AIModel
 from .conversation import Conversation
 from .message import Message
-from .planfix import PlanfixCache, PlanfixTask
+from .planfix import PlanfixCache, PlanfixRefreshStage, PlanfixTask
 from .analytics import AnalyticsEvent, UserMetrics, AIModelMetrics
 
 __all__ = [
@@ -13,6 +13,7 @@ __all__ = [
     'Conversation',
     'Message',
     'PlanfixCache',
+    'PlanfixRefreshStage',
     'PlanfixTask',
     'AnalyticsEvent',
     'UserMetrics',
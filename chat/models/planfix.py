@@ -18,6 +18,32 @@ class PlanfixCache(models.Model):
     def __str__(self):
         return f"{self.cache_name} ({self.entries_count} entries)"
 
+class PlanfixRefreshStage(models.Model):
+    """
+    Телеметрия одного этапа обновления кэша Planfix (загрузка страниц,
+    нормализация, построение производных кэшей, индекса, публикация)
+    """
+    refresh_id = models.CharField(max_length=36, db_index=True)
+    refresh_kind = models.CharField(max_length=50)
+    stage = models.CharField(max_length=100)
+    started_at = models.DateTimeField()
+    duration = models.FloatField(default=0.0)  # Время выполнения в секундах
+    items_count = models.IntegerField(default=0)
+    bytes_count = models.BigIntegerField(default=0)
+    peak_memory = models.BigIntegerField(default=0)  # Пиковая память этапа в байтах
+    success = models.BooleanField(default=True)
+    
+    class Meta:
+        verbose_name = _('Этап обновления Planfix')
+        verbose_name_plural = _('Этапы обновления Planfix')
+        ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['stage', 'started_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.stage} ({self.duration:.2f}s, {self.items_count} items)"
+
 class PlanfixTask(models.Model):
     """
     Модель для хранения ключевой информации о задачах Planfix для аналитики
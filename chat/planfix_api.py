@@ -1,56 +1,164 @@
 import requests
 import json
 import logging
+import threading
 from .planfix_config import (
     API_BASE_URL,
     API_TOKEN,
     PLANFIX_ACCOUNT,
     PROJECT_REQUEST,
-    TASKS_REQUEST
+    TASKS_REQUEST,
+    TASK_DETAIL_REQUEST,
+    RATE_LIMIT_MAX_RETRIES,
+    INTERACTIVE_ACQUIRE_TIMEOUT,
+    REQUEST_TIMEOUT
+)
+from .planfix_circuit import planfix_circuit
+from .planfix_ratelimit import (
+    planfix_rate_limiter,
+    parse_retry_after,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_BACKGROUND
 )
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-def fetch_from_planfix(endpoint, method='POST', body=None):
+# Счетчики трафика к Planfix (для телеметрии обновления кэша)
+transfer_stats = {'requests': 0, 'bytes': 0}
+_transfer_lock = threading.Lock()
+
+class PlanfixAPIError(Exception):
+    """Ошибка API Planfix, которую нельзя выдавать за пустой ответ"""
+
+class PlanfixRateLimitError(PlanfixAPIError):
+    """Planfix отклоняет запросы с кодом 429, повторы исчерпаны"""
+
+class PlanfixUnavailableError(PlanfixAPIError):
+    """Planfix не отвечает или предохранитель разомкнут"""
+
+class PlanfixRequestError(PlanfixAPIError):
+    """Planfix отклонил запрос с кодом 4xx, кроме 404 (например, токен отозван или истек)"""
+
+def fetch_from_planfix(endpoint, method='POST', body=None, priority=PRIORITY_BACKGROUND, token=None):
     """
     Базовая функция для запросов к API Planfix
+    
+    Все запросы проходят через общий ограничитель частоты. Ответ 429 повторяется
+    после паузы Retry-After, а если повторы исчерпаны - выбрасывается
+    PlanfixRateLimitError, чтобы синхронизация не приняла его за пустую страницу.
+    Таймауты, ошибки соединения и ответы 5xx выбрасывают PlanfixUnavailableError
+    и учитываются предохранителем; пока он разомкнут, запросы отклоняются сразу.
+    Ответ 404 возвращается как пустой словарь, остальные 4xx (401, 403, 400...)
+    выбрасывают PlanfixRequestError: их нельзя принимать за удаленную задачу.
+    
+    :param priority: PRIORITY_INTERACTIVE для запросов пользователя,
+                     PRIORITY_BACKGROUND для синхронизации
+    :param token: API-токен пользователя; по умолчанию общий токен аккаунта
     """
     url = f"{API_BASE_URL}/{endpoint}"
     headers = {
         'Content-Type': 'application/json',
         'Accept': 'application/json',
-        'Authorization': f'Bearer {API_TOKEN}'
+        'Authorization': f'Bearer {token or API_TOKEN}'
     }
 
     logger.debug(f"Planfix API запрос: {url}")
     if body:
         logger.debug(f"Тело запроса: {json.dumps(body, ensure_ascii=False)}")
 
-    try:
-        response = requests.request(method, url, headers=headers, json=body)
-        response.raise_for_status()
-        data = response.json()
+    acquire_timeout = INTERACTIVE_ACQUIRE_TIMEOUT if priority == PRIORITY_INTERACTIVE else None
+    
+    for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+        # Пока предохранитель разомкнут, не ждем таймаутов от недоступного Planfix
+        if not planfix_circuit.allow_request():
+            raise PlanfixUnavailableError(f"Planfix временно недоступен, запрос {endpoint} отклонен")
+        
+        if not planfix_rate_limiter.acquire(priority, timeout=acquire_timeout):
+            planfix_circuit.release_probe()
+            raise PlanfixRateLimitError(f"Превышено время ожидания очереди запросов к Planfix: {endpoint}")
+        
+        try:
+            response = requests.request(method, url, headers=headers, json=body, timeout=REQUEST_TIMEOUT)
+        except requests.RequestException as e:
+            # Таймауты и ошибки соединения
+            planfix_circuit.record_failure()
+            logger.error(f"Ошибка соединения с Planfix API: {e}")
+            raise PlanfixUnavailableError(f"Planfix не отвечает: {e}") from e
+        
+        with _transfer_lock:
+            transfer_stats['requests'] += 1
+            transfer_stats['bytes'] += len(response.content or b'')
+        
+        if response.status_code == 429:
+            # Planfix доступен, просто просит снизить частоту
+            planfix_circuit.record_success()
+            planfix_rate_limiter.on_rate_limited(parse_retry_after(response.headers.get('Retry-After')))
+            logger.warning(f"Planfix API вернул 429 для {endpoint} (попытка {attempt + 1})")
+            continue
+        
+        if response.status_code >= 500:
+            planfix_circuit.record_failure()
+            logger.error(f"Ошибка сервера Planfix API: {response.status_code} для {endpoint}")
+            raise PlanfixUnavailableError(f"Planfix вернул {response.status_code}: {endpoint}")
+        
+        planfix_circuit.record_success()
+        planfix_rate_limiter.on_success()
+        
+        if response.status_code == 404:
+            # Объект не найден - не признак недоступности
+            logger.warning(f"Planfix API вернул 404 для {endpoint}")
+            return {}
+        
+        if response.status_code >= 400:
+            # Ошибка запроса или авторизации - не признак недоступности, но и не пустой ответ
+            logger.error(f"Ошибка Planfix API: {response.status_code} для {endpoint}")
+            raise PlanfixRequestError(f"Planfix вернул {response.status_code}: {endpoint}")
+        
+        try:
+            data = response.json()
+        except ValueError as e:
+            logger.error(f"Некорректный ответ Planfix API для {endpoint}: {e}")
+            raise PlanfixAPIError(f"Некорректный ответ Planfix: {endpoint}") from e
+        
         logger.debug(f"Ответ Planfix API: {data}")
         return data
-    except Exception as e:
-        logger.error(f"Ошибка Planfix API: {e}")
-        return {}
+    
+    raise PlanfixRateLimitError(f"Planfix ограничивает частоту запросов, повторы исчерпаны: {endpoint}")
 
 def get_projects():
     """
-    Получение списка всех проектов
+    Получение списка всех проектов (все страницы)
     """
     logger.info("Запрашиваем проекты из Planfix...")
     try:
-        response = fetch_from_planfix(
-            PROJECT_REQUEST['endpoint'],
-            PROJECT_REQUEST['method'],
-            PROJECT_REQUEST['body']
-        )
+        page_size = PROJECT_REQUEST['body']['pageSize']
+        projects = []
+        seen_ids = set()
+        offset = 0
         
-        # Получаем проекты из ответа
-        projects = response.get('projects', []) or response.get('data', []) or []
+        while True:
+            # Создаем копию базового запроса со смещением следующей страницы
+            body = PROJECT_REQUEST['body'].copy()
+            body['offset'] = offset
+            response = fetch_from_planfix(
+                PROJECT_REQUEST['endpoint'],
+                PROJECT_REQUEST['method'],
+                body
+            )
+            
+            # Получаем проекты из ответа
+            page = response.get('projects', []) or response.get('data', []) or []
+            
+            offset += len(page)
+            
+            # Повтор уже полученных проектов означает, что смещение не поддерживается
+            new_projects = [project for project in page if project.get('id') not in seen_ids]
+            seen_ids.update(project.get('id') for project in new_projects)
+            projects.extend(new_projects)
+            
+            if len(page) < page_size or not new_projects:
+                break
         
         # Логируем для отладки
         logger.info(f"Получено проектов: {len(projects)}")
@@ -58,15 +166,18 @@ def get_projects():
             logger.info(f"Проект: {project}")
         
         return projects
+    except PlanfixAPIError:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при получении проектов: {e}")
         return []
 
-def get_tasks_page(page=0):
+def get_tasks_page(page=0, filters=None):
     """
     Получение страницы задач
     
     :param page: Номер страницы (начиная с 0)
+    :param filters: Фильтры Planfix для task/list (например, только незавершенные задачи)
     :return: Список задач и общее количество
     """
     logger.info(f"Запрашиваем задачи из Planfix: страница {page}")
@@ -78,6 +189,8 @@ def get_tasks_page(page=0):
         body = TASKS_REQUEST['baseBody'].copy()
         body['offset'] = offset
         body['pageSize'] = page_size
+        if filters:
+            body['filters'] = filters
         
         response = fetch_from_planfix(
             TASKS_REQUEST['endpoint'],
@@ -95,6 +208,8 @@ def get_tasks_page(page=0):
             'tasks': tasks,
             'total_count': total_count
         }
+    except PlanfixAPIError:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при получении задач: {e}")
         return {
@@ -102,18 +217,59 @@ def get_tasks_page(page=0):
             'total_count': 0
         }
 
-def get_task_detail(task_id):
+def get_task_ids(token, priority=PRIORITY_BACKGROUND):
+    """
+    Получение ID всех задач, видимых с токеном пользователя (запрашивается только поле id)
+    
+    :param token: API-токен пользователя Planfix
+    :param priority: Приоритет запроса
+    :return: Список ID задач
+    """
+    page_size = TASKS_REQUEST['pageSize']
+    task_ids = []
+    seen_ids = set()
+    offset = 0
+    
+    while True:
+        body = {'offset': offset, 'pageSize': page_size, 'fields': 'id'}
+        response = fetch_from_planfix(TASKS_REQUEST['endpoint'], TASKS_REQUEST['method'], body, priority, token=token)
+        
+        tasks = response.get('tasks', []) or response.get('data', []) or []
+        offset += len(tasks)
+        
+        # Повтор уже полученных задач означает, что смещение не поддерживается
+        new_ids = [str(task['id']) for task in tasks if task.get('id') is not None and str(task['id']) not in seen_ids]
+        seen_ids.update(new_ids)
+        task_ids.extend(new_ids)
+        
+        if len(tasks) < page_size or not new_ids:
+            logger.info(f"Получено ID видимых задач: {len(task_ids)}")
+            return task_ids
+
+def get_task_detail(task_id, priority=PRIORITY_INTERACTIVE):
     """
     Получение детальной информации о задаче
     
     :param task_id: ID задачи
-    :return: Подробная информация о задаче
+    :param priority: Приоритет запроса (фоновая синхронизация использует PRIORITY_BACKGROUND)
+    :return: Подробная информация о задаче; пустой словарь только если Planfix ответил 404
+    :raises PlanfixAPIError: При любой другой ошибке, в том числе некорректном ответе
     """
     logger.info(f"Запрашиваем детали задачи из Planfix: ID {task_id}")
     try:
-        endpoint = f"task/{task_id}"
-        response = fetch_from_planfix(endpoint, "GET")
-        return response
+        endpoint = TASK_DETAIL_REQUEST['endpoint'].format(task_id=task_id)
+        endpoint = f"{endpoint}?fields={TASK_DETAIL_REQUEST['fields']}"
+        response = fetch_from_planfix(endpoint, TASK_DETAIL_REQUEST['method'], priority=priority)
+        if response == {}:
+            return {}
+        
+        # Planfix возвращает задачу в обертке {"result": ..., "task": {...}}
+        task = response.get('task', response) if isinstance(response, dict) else {}
+        if not task or task.get('id') is None:
+            raise PlanfixAPIError(f"Planfix вернул задачу {task_id} без ID")
+        return task
+    except PlanfixAPIError:
+        raise
     except Exception as e:
         logger.error(f"Ошибка при получении деталей задачи: {e}")
-        return {}
\ No newline at end of file
+        raise PlanfixAPIError(f"Не удалось получить задачу {task_id}: {e}") from e
\ No newline at end of file
@@ -0,0 +1,236 @@
+import bisect
+import heapq
+import logging
+import re
+import threading
+from array import array
+from typing import Dict, List, Any, Optional, Iterable
+
+from .planfix_cache_service import planfix_cache
+
+try:
+    import numpy as np
+except ImportError:  # Multi-word queries intersect entry numbers as Python sets
+    np = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Suggestion kinds, in the order they are listed on equal match quality
+KINDS = ('projects', 'users', 'tasks')
+
+MAX_LIMIT = 20
+
+# Prefixes up to this length have their suggestions precomputed
+SHORT_PREFIX = 3
+
+# Longer prefixes read the postings of at most this many vocabulary words
+MAX_WORDS = 300
+
+_WORD_PATTERN = re.compile(r'\w+')
+
+def normalize(text: str) -> str:
+    """Lowercase and fold ё into е"""
+    return text.lower().replace('ё', 'е')
+
+def words(text: str) -> List[str]:
+    """Get the normalized words of a text"""
+    return _WORD_PATTERN.findall(normalize(text))
+
+class PrefixIndex:
+    """
+    Sorted-array prefix index over the words of a list of names.
+
+    Entries are numbered in rank order (best first), so every word's
+    posting list is already ordered by rank and the best suggestions for a
+    prefix are the smallest entry numbers over the postings of the
+    vocabulary words in its range. Results for short prefixes, whose range
+    covers much of the vocabulary, are precomputed when the index is built.
+    """
+
+    def __init__(self, entries: List[Dict[str, Any]]):
+        """
+        Build the index
+
+        Args:
+            entries: {'id', 'name', ...} dicts already sorted by rank
+        """
+        self.entries = entries
+        self.numbers: Dict[str, int] = {}
+        postings: Dict[str, array] = {}
+        for number, entry in enumerate(entries):
+            keys = set(words(entry.get('name') or ''))
+            if entry.get('id') is not None:
+                self.numbers[str(entry['id'])] = number
+                keys.add(normalize(str(entry['id'])))
+            for key in keys:
+                posting = postings.get(key)
+                if posting is None:
+                    posting = postings[key] = array('i')
+                posting.append(number)
+
+        self.vocabulary = sorted(postings)
+        self.postings = [postings[word] for word in self.vocabulary]
+
+        self.short_prefixes: Dict[str, List[int]] = {}
+        for length in range(1, SHORT_PREFIX + 1):
+            prefixes = sorted({word[:length] for word in self.vocabulary if len(word) >= length})
+            for prefix in prefixes:
+                self.short_prefixes[prefix] = self._merge(self._range(prefix), MAX_LIMIT * 3)
+
+    def _range(self, prefix: str, max_words: Optional[int] = None) -> List[array]:
+        """Get the postings of the vocabulary words starting with a prefix"""
+        start = bisect.bisect_left(self.vocabulary, prefix)
+        end = bisect.bisect_left(self.vocabulary, prefix + '\uffff', start)
+        if max_words is not None:
+            end = min(end, start + max_words)
+        return self.postings[start:end]
+
+    def _merge(self, postings: List[array], limit: int) -> List[int]:
+        """Get the smallest distinct entry numbers of several postings"""
+        best = []
+        for number in heapq.merge(*(posting[:limit] for posting in postings)):
+            if not best or best[-1] != number:
+                best.append(number)
+                if len(best) >= limit:
+                    break
+        return best
+
+    def lookup(self, prefix: str, limit: int) -> List[int]:
+        """Get the best entry numbers with a word starting with a prefix"""
+        if len(prefix) <= SHORT_PREFIX:
+            return self.short_prefixes.get(prefix, [])[:limit]
+        return self._merge(self._range(prefix, MAX_WORDS), limit)
+
+    def _union(self, postings: List[array]):
+        """Get the sorted distinct entry numbers of several postings"""
+        if np is not None:
+            if len(postings) == 1:
+                return np.frombuffer(postings[0], dtype=np.intc)
+            numbers = np.sort(np.concatenate([np.frombuffer(posting, dtype=np.intc) for posting in postings]))
+            return numbers[np.concatenate(([True], numbers[1:] != numbers[:-1]))]
+        return sorted(set().union(*postings))
+
+    def match(self, prefixes: List[str], limit: int) -> List[int]:
+        """
+        Get the best entry numbers having a word starting with each of several prefixes
+
+        The entries of the prefixes are intersected smallest first.
+        """
+        if len(prefixes) == 1:
+            return self.lookup(prefixes[0], limit)
+
+        ranges = sorted((self._range(prefix, MAX_WORDS) for prefix in set(prefixes)),
+                        key=lambda postings: sum(len(posting) for posting in postings))
+        if not ranges[0]:
+            return []
+
+        numbers = self._union(ranges[0])
+        for postings in ranges[1:]:
+            if np is not None:
+                numbers = np.intersect1d(numbers, self._union(postings), assume_unique=True)
+            else:
+                other = set().union(*postings)
+                numbers = [number for number in numbers if number in other]
+            if not len(numbers):
+                return []
+        return numbers[:limit].tolist() if np is not None else numbers[:limit]
+
+class Autocomplete:
+    """
+    Ranked name and ID suggestions for tasks, projects and employees.
+
+    One prefix index per kind is built for each snapshot version. Projects
+    and employees come before tasks, active tasks before completed ones,
+    and shorter names first, after the match quality described in suggest.
+    """
+
+    def __init__(self, cache=planfix_cache):
+        """Initialize the suggester"""
+        self.cache = cache
+        self._columns = None
+        self._indexes: Dict[str, PrefixIndex] = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self, kind: str) -> PrefixIndex:
+        """Get the prefix index of a kind for the current snapshot"""
+        columns = self.cache.get_task_columns()
+        with self._lock:
+            if self._columns is not columns:
+                self._columns = columns
+                self._indexes = {}
+            if kind not in self._indexes:
+                self._indexes[kind] = PrefixIndex(self._get_entries(columns, kind))
+                logger.debug(f"Built {kind} autocomplete index with {len(self._indexes[kind].entries)} entries")
+            return self._indexes[kind]
+
+    def _get_entries(self, columns, kind: str) -> List[Dict[str, Any]]:
+        """Get the suggestion entries of a kind in rank order"""
+        if kind == 'tasks':
+            entries = [
+                {'id': task.get('id'), 'name': task.get('name') or '', 'active': not columns.completed[row]}
+                for row, task in enumerate(columns.tasks) if task.get('id') is not None
+            ]
+            entries.sort(key=lambda entry: (not entry['active'], len(entry['name'])))
+            return entries
+
+        items = columns.projects if kind == 'projects' else columns.people
+        return sorted(({'id': item['id'], 'name': item.get('name') or ''} for item in items),
+                      key=lambda entry: len(entry['name']))
+
+    def warm(self):
+        """Build the indexes of every kind for the current snapshot"""
+        for kind in KINDS:
+            self._get_index(kind)
+
+    def suggest(self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Get suggestions for a partly typed name or task ID
+
+        Every word of the query must start a word of the name or the ID.
+        A task whose ID is the query (a leading '#' is ignored) comes first,
+        then names starting with the query, then names with matching words.
+
+        Args:
+            query: Text typed so far
+            kinds: Kinds to suggest (KINDS by default)
+            limit: Number of suggestions
+
+        Returns:
+            Suggestions with kind, id, name and, for tasks, whether the task is active
+        """
+        limit = max(1, min(limit, MAX_LIMIT))
+        query_words = words(query)
+        if not query_words:
+            return []
+        full_query = normalize(query).lstrip('#').strip()
+
+        scored = []
+        for kind_order, kind in enumerate(kinds or KINDS):
+            if kind not in KINDS:
+                raise ValueError(f"Unknown autocomplete kind: {kind}")
+            index = self._get_index(kind)
+
+            # Extra candidates, since the match order below can still reorder them
+            numbers = index.match(query_words, limit * 3)
+            exact = index.numbers.get(full_query) if kind == 'tasks' else None
+            if exact is not None and exact not in numbers:
+                numbers.append(exact)
+
+            for number in numbers:
+                entry = index.entries[number]
+                if number == exact:
+                    quality = 0
+                elif normalize(entry['name']).startswith(full_query):
+                    quality = 1
+                else:
+                    quality = 2
+                scored.append((quality, kind_order, number, kind, entry))
+
+        scored.sort(key=lambda item: item[:3])
+        return [
+            dict(entry, kind=kind) for _, _, _, kind, entry in scored[:limit]
+        ]
+
+# Singleton instance
+autocomplete = Autocomplete()
@@ -4,15 +4,25 @@ import time
 from pathlib import Path
 from typing import Dict, List, Any, Optional, Union
 import os
+import threading
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 
 from django.conf import settings
 
+from .planfix_codec import load_tasks_file, dump_tasks_file
+from .planfix_index import TaskIndex
+
+try:
+    import fcntl
+except ImportError:  # Windows: only in-process locking is available
+    fcntl = None
+
 # Configure logging
 logger = logging.getLogger(__name__)
 
 # Cache directory
-CACHE_DIR = Path(settings.BASE_DIR) / 'chat' / 'cache'
+CACHE_DIR = Path(getattr(settings, 'PLANFIX_CACHE_DIR', '') or Path(settings.BASE_DIR) / 'chat' / 'cache')
 TASKS_CACHE_FILE = CACHE_DIR / 'tasks_cache.json'
 LAST_UPDATE_FILE = CACHE_DIR / 'last_update.txt'
 
@@ -24,9 +34,52 @@ PROJECTS_CACHE = CACHE_DIR / 'projects.json'
 USERS_CACHE = CACHE_DIR / 'users.json'
 STATS_CACHE = CACHE_DIR / 'stats.json'
 
+# Lock file shared by every process that writes the tasks snapshot
+SNAPSHOT_LOCK_FILE = CACHE_DIR / '.snapshot.lock'
+
 # Task status IDs
 COMPLETED_STATUS_ID = 3  # Using known completion status ID from Planfix
 
+_snapshot_thread_lock = threading.RLock()
+_snapshot_lock_state = threading.local()
+
+@contextmanager
+def snapshot_write_lock():
+    """Serialize writers of the tasks snapshot across threads and worker processes"""
+    with _snapshot_thread_lock:
+        depth = getattr(_snapshot_lock_state, 'depth', 0)
+        if depth or fcntl is None:
+            # Re-entrant use from the same thread, or no file locking on this platform
+            _snapshot_lock_state.depth = depth + 1
+            try:
+                yield
+            finally:
+                _snapshot_lock_state.depth = depth
+            return
+        
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        with open(SNAPSHOT_LOCK_FILE, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            _snapshot_lock_state.depth = 1
+            try:
+                yield
+            finally:
+                _snapshot_lock_state.depth = 0
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+@contextmanager
+def file_lock(lock_path: Path):
+    """Hold an exclusive lock on a lock file, shared by threads and worker processes (not re-entrant)"""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(lock_path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 class PlanfixCacheService:
     """Enhanced service for Planfix data caching and retrieval"""
     
@@ -36,6 +89,8 @@ class PlanfixCacheService:
         self.is_updating = False
         self.last_error = None
         self.last_error_time = None
+        self._task_index = None
+        self._index_lock = threading.Lock()
     
     def _ensure_cache_directory(self):
         """Ensure cache directory and files exist"""
@@ -91,6 +146,11 @@ class PlanfixCacheService:
     
     def get_cache_status(self) -> Dict[str, Any]:
         """Get detailed cache status"""
+        from .planfix_circuit import planfix_circuit
+        from .planfix_ratelimit import planfix_rate_limiter
+        from .planfix_sync_tiers import sync_tiers
+        from .planfix_scheduler import refresh_scheduler
+
         return {
             'is_valid': self.is_cache_valid(),
             'age_minutes': self.get_cache_age_minutes(),
@@ -105,29 +165,61 @@ class PlanfixCacheService:
                 'projects': PROJECTS_CACHE.exists(),
                 'users': USERS_CACHE.exists(),
                 'stats': STATS_CACHE.exists()
-            }
+            },
+            'planfix_circuit': planfix_circuit.get_stats(),
+            'planfix_rate_limit': planfix_rate_limiter.get_stats(),
+            'sync_tiers': sync_tiers.get_status(),
+            'refresh_schedule': refresh_scheduler.get_status()
         }
     
     def get_all_tasks(self) -> List[Dict[str, Any]]:
         """Get all tasks from cache"""
+        return list(self.get_task_index().tasks)
+    
+    def _read_tasks_file(self) -> List[Dict[str, Any]]:
+        """Read the tasks snapshot from disk"""
         if not TASKS_CACHE_FILE.exists():
             logger.warning("Tasks cache file does not exist")
             return []
         
         try:
-            with open(TASKS_CACHE_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError) as e:
+            return load_tasks_file(TASKS_CACHE_FILE)
+        except (ValueError, KeyError, IOError) as e:
             logger.error(f"Error reading tasks cache: {e}")
             return []
     
+    def _get_snapshot_version(self) -> Optional[tuple]:
+        """Get a cheap version marker of the tasks snapshot file"""
+        try:
+            stat = TASKS_CACHE_FILE.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+    
+    def get_task_index(self) -> TaskIndex:
+        """Get the in-memory task index, rebuilding it when the snapshot changes"""
+        version = self._get_snapshot_version()
+        
+        with self._index_lock:
+            if self._task_index is None or self._task_index.version != version:
+                self._task_index = TaskIndex(self._read_tasks_file(), version)
+            return self._task_index
+    
+    def get_task_columns(self) -> 'TaskColumns':
+        """Get the columnar view of the snapshot, built once per task index"""
+        from .planfix_columns import TaskColumns
+        
+        index = self.get_task_index()
+        if index.columns is None:
+            index.columns = TaskColumns(index.tasks)
+        return index.columns
+    
     def get_active_tasks(self) -> List[Dict[str, Any]]:
         """Get active tasks from cache or generate if needed"""
         if ACTIVE_TASKS_CACHE.exists():
             try:
-                with open(ACTIVE_TASKS_CACHE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
+                return load_tasks_file(ACTIVE_TASKS_CACHE)
+            except (ValueError, KeyError, IOError):
                 pass  # Fall back to regenerating
         
         # Generate active tasks cache
@@ -143,7 +235,7 @@ class PlanfixCacheService:
         
         try:
             with open(ACTIVE_TASKS_CACHE, 'w', encoding='utf-8') as f:
-                json.dump(active_tasks, f, ensure_ascii=False, indent=2)
+                dump_tasks_file(active_tasks, f, indent=2)
             logger.info(f"Generated active tasks cache with {len(active_tasks)} tasks")
         except IOError as e:
             logger.error(f"Error writing active tasks cache: {e}")
@@ -154,9 +246,8 @@ class PlanfixCacheService:
         """Get completed tasks from cache or generate if needed"""
         if COMPLETED_TASKS_CACHE.exists():
             try:
-                with open(COMPLETED_TASKS_CACHE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
+                return load_tasks_file(COMPLETED_TASKS_CACHE)
+            except (ValueError, KeyError, IOError):
                 pass  # Fall back to regenerating
         
         # Generate completed tasks cache
@@ -172,7 +263,7 @@ class PlanfixCacheService:
         
         try:
             with open(COMPLETED_TASKS_CACHE, 'w', encoding='utf-8') as f:
-                json.dump(completed_tasks, f, ensure_ascii=False, indent=2)
+                dump_tasks_file(completed_tasks, f, indent=2)
             logger.info(f"Generated completed tasks cache with {len(completed_tasks)} tasks")
         except IOError as e:
             logger.error(f"Error writing completed tasks cache: {e}")
@@ -183,9 +274,8 @@ class PlanfixCacheService:
         """Get overdue tasks from cache or generate if needed"""
         if OVERDUE_TASKS_CACHE.exists():
             try:
-                with open(OVERDUE_TASKS_CACHE, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, IOError):
+                return load_tasks_file(OVERDUE_TASKS_CACHE)
+            except (ValueError, KeyError, IOError):
                 pass  # Fall back to regenerating
         
         # Generate overdue tasks cache
@@ -216,7 +306,7 @@ class PlanfixCacheService:
         
         try:
             with open(OVERDUE_TASKS_CACHE, 'w', encoding='utf-8') as f:
-                json.dump(overdue_tasks, f, ensure_ascii=False, indent=2)
+                dump_tasks_file(overdue_tasks, f, indent=2)
             logger.info(f"Generated overdue tasks cache with {len(overdue_tasks)} tasks")
         except IOError as e:
             logger.error(f"Error writing overdue tasks cache: {e}")
@@ -236,76 +326,8 @@ class PlanfixCacheService:
         return self._generate_projects_cache()
     
     def _generate_projects_cache(self) -> List[Dict[str, Any]]:
-        """Generate projects cache from all tasks"""
-        all_tasks = self.get_all_tasks()
-        
-        # Extract unique projects
-        projects_map = {}
-        for task in all_tasks:
-            if task.get('project') and task['project'].get('id'):
-                project_id = str(task['project']['id'])
-                
-                if project_id not in projects_map:
-                    # Extract relevant project info
-                    project_info = {
-                        'id': task['project']['id'],
-                        'name': task['project'].get('name', f"Project {project_id}"),
-                        'task_count': 1,
-                        'active_tasks': 0,
-                        'completed_tasks': 0,
-                        'overdue_tasks': 0
-                    }
-                    
-                    # Count task status
-                    if self._is_task_completed(task):
-                        project_info['completed_tasks'] = 1
-                    else:
-                        project_info['active_tasks'] = 1
-                        
-                        # Check if overdue
-                        today = datetime.now().date().isoformat()
-                        end_date = None
-                        if task.get('endDateTime') and isinstance(task['endDateTime'], dict):
-                            if 'date' in task['endDateTime']:
-                                end_date = task['endDateTime']['date']
-                            elif 'dateTo' in task['endDateTime']:
-                                end_date = task['endDateTime']['dateTo']
-                        elif task.get('endDateTime') and isinstance(task['endDateTime'], str):
-                            end_date = task['endDateTime']
-                        elif task.get('dateEnd') and isinstance(task['dateEnd'], str):
-                            end_date = task['dateEnd']
-                        
-                        if end_date and end_date < today:
-                            project_info['overdue_tasks'] = 1
-                    
-                    projects_map[project_id] = project_info
-                else:
-                    # Update existing project info
-                    projects_map[project_id]['task_count'] += 1
-                    
-                    if self._is_task_completed(task):
-                        projects_map[project_id]['completed_tasks'] += 1
-                    else:
-                        projects_map[project_id]['active_tasks'] += 1
-                        
-                        # Check if overdue
-                        today = datetime.now().date().isoformat()
-                        end_date = None
-                        if task.get('endDateTime') and isinstance(task['endDateTime'], dict):
-                            if 'date' in task['endDateTime']:
-                                end_date = task['endDateTime']['date']
-                            elif 'dateTo' in task['endDateTime']:
-                                end_date = task['endDateTime']['dateTo']
-                        elif task.get('endDateTime') and isinstance(task['endDateTime'], str):
-                            end_date = task['endDateTime']
-                        elif task.get('dateEnd') and isinstance(task['dateEnd'], str):
-                            end_date = task['dateEnd']
-                        
-                        if end_date and end_date < today:
-                            projects_map[project_id]['overdue_tasks'] += 1
-        
-        # Convert map to list
-        projects = list(projects_map.values())
+        """Generate projects cache from the columnar task view"""
+        projects = self.get_task_columns().get_project_counts()
         
         try:
             with open(PROJECTS_CACHE, 'w', encoding='utf-8') as f:
@@ -329,98 +351,8 @@ class PlanfixCacheService:
         return self._generate_users_cache()
     
     def _generate_users_cache(self) -> List[Dict[str, Any]]:
-        """Generate users cache from all tasks"""
-        all_tasks = self.get_all_tasks()
-        
-        # Extract unique users
-        users_map = {}
-        
-        # Process assignees
-        for task in all_tasks:
-            # Process assignees
-            if task.get('assignees'):
-                if isinstance(task['assignees'], list):
-                    assignees = task['assignees']
-                elif isinstance(task['assignees'], dict) and task['assignees'].get('users'):
-                    assignees = task['assignees']['users']
-                else:
-                    assignees = []
-                
-                for assignee in assignees:
-                    if assignee.get('id'):
-                        user_id = str(assignee['id'])
-                        
-                        if user_id not in users_map:
-                            users_map[user_id] = {
-                                'id': assignee['id'],
-                                'name': assignee.get('name', f"User {user_id}"),
-                                'email': assignee.get('email', ''),
-                                'assigned_tasks': 1,
-                                'assigned_active': 0,
-                                'assigned_completed': 0,
-                                'assigned_overdue': 0,
-                                'created_tasks': 0,
-                                'projects': set()
-                            }
-                        else:
-                            users_map[user_id]['assigned_tasks'] += 1
-                        
-                        # Track status
-                        if self._is_task_completed(task):
-                            users_map[user_id]['assigned_completed'] += 1
-                        else:
-                            users_map[user_id]['assigned_active'] += 1
-                            
-                            # Check if overdue
-                            today = datetime.now().date().isoformat()
-                            end_date = None
-                            if task.get('endDateTime') and isinstance(task['endDateTime'], dict):
-                                if 'date' in task['endDateTime']:
-                                    end_date = task['endDateTime']['date']
-                                elif 'dateTo' in task['endDateTime']:
-                                    end_date = task['endDateTime']['dateTo']
-                            elif task.get('endDateTime') and isinstance(task['endDateTime'], str):
-                                end_date = task['endDateTime']
-                            elif task.get('dateEnd') and isinstance(task['dateEnd'], str):
-                                end_date = task['dateEnd']
-                            
-                            if end_date and end_date < today:
-                                users_map[user_id]['assigned_overdue'] += 1
-                        
-                        # Track project
-                        if task.get('project') and task['project'].get('id'):
-                            users_map[user_id]['projects'].add(str(task['project']['id']))
-            
-            # Process assigner/creator
-            if task.get('assigner') and task['assigner'].get('id'):
-                assigner = task['assigner']
-                user_id = str(assigner['id'])
-                
-                if user_id not in users_map:
-                    users_map[user_id] = {
-                        'id': assigner['id'],
-                        'name': assigner.get('name', f"User {user_id}"),
-                        'email': assigner.get('email', ''),
-                        'assigned_tasks': 0,
-                        'assigned_active': 0,
-                        'assigned_completed': 0,
-                        'assigned_overdue': 0,
-                        'created_tasks': 1,
-                        'projects': set()
-                    }
-                else:
-                    users_map[user_id]['created_tasks'] += 1
-                
-                # Track project
-                if task.get('project') and task['project'].get('id'):
-                    users_map[user_id]['projects'].add(str(task['project']['id']))
-        
-        # Convert sets to lists for JSON serialization
-        for user_id, user_data in users_map.items():
-            user_data['projects'] = list(user_data['projects'])
-        
-        # Convert map to list
-        users = list(users_map.values())
+        """Generate users cache from the columnar task view"""
+        users = self.get_task_columns().get_person_counts()
         
         try:
             with open(USERS_CACHE, 'w', encoding='utf-8') as f:
@@ -444,72 +376,31 @@ class PlanfixCacheService:
         return self._generate_stats_cache()
     
     def _generate_stats_cache(self) -> Dict[str, Any]:
-        """Generate statistics cache from all data"""
-        all_tasks = self.get_all_tasks()
-        active_tasks = self.get_active_tasks()
-        completed_tasks = self.get_completed_tasks()
-        overdue_tasks = self.get_overdue_tasks()
-        projects = self.get_projects()
-        
-        # Calculate deadlines this week
+        """Generate statistics cache from the columnar task view"""
         today = datetime.now().date()
         week_end = (today + timedelta(days=7)).isoformat()
-        
-        tasks_due_this_week = []
-        for task in active_tasks:
-            end_date = None
-            if task.get('endDateTime') and isinstance(task['endDateTime'], dict):
-                if 'date' in task['endDateTime']:
-                    end_date = task['endDateTime']['date']
-                elif 'dateTo' in task['endDateTime']:
-                    end_date = task['endDateTime']['dateTo']
-            elif task.get('endDateTime') and isinstance(task['endDateTime'], str):
-                end_date = task['endDateTime']
-            elif task.get('dateEnd') and isinstance(task['dateEnd'], str):
-                end_date = task['dateEnd']
-            
-            if end_date and end_date <= week_end:
-                tasks_due_this_week.append(task)
-        
-        # Calculate tasks by status
-        status_counts = {}
-        for task in all_tasks:
-            status = "Unknown"
-            if task.get('status'):
-                if task['status'].get('name'):
-                    status = task['status']['name']
-                elif task['status'].get('id'):
-                    status = f"Status ID {task['status']['id']}"
-            
-            if status not in status_counts:
-                status_counts[status] = 1
-            else:
-                status_counts[status] += 1
+        counts = self.get_task_columns().get_stats(today.isoformat(), week_end)
+        projects = self.get_projects()
         
         # Calculate completion rate
         completion_rate = 0
-        if all_tasks:
-            completion_rate = (len(completed_tasks) / len(all_tasks)) * 100
+        if counts['total_tasks']:
+            completion_rate = (counts['completed_tasks'] / counts['total_tasks']) * 100
         
         # Calculate average tasks per project
         avg_tasks_per_project = 0
         if projects:
-            avg_tasks_per_project = len(all_tasks) / len(projects)
+            avg_tasks_per_project = counts['total_tasks'] / len(projects)
         
         # Compile stats
-        stats = {
-            'total_tasks': len(all_tasks),
-            'active_tasks': len(active_tasks),
-            'completed_tasks': len(completed_tasks),
-            'overdue_tasks': len(overdue_tasks),
-            'tasks_due_this_week': len(tasks_due_this_week),
-            'completion_rate': round(completion_rate, 2),
-            'total_projects': len(projects),
-            'avg_tasks_per_project': round(avg_tasks_per_project, 2),
-            'status_counts': status_counts,
-            'cache_updated_at': datetime.now().isoformat(),
-            'cache_age_minutes': self.get_cache_age_minutes() or 0
-        }
+        stats = dict(
+            counts,
+            completion_rate=round(completion_rate, 2),
+            total_projects=len(projects),
+            avg_tasks_per_project=round(avg_tasks_per_project, 2),
+            cache_updated_at=datetime.now().isoformat(),
+            cache_age_minutes=self.get_cache_age_minutes() or 0
+        )
         
         try:
             with open(STATS_CACHE, 'w', encoding='utf-8') as f:
@@ -522,31 +413,58 @@ class PlanfixCacheService:
     
     def get_task_by_id(self, task_id: Union[str, int]) -> Optional[Dict[str, Any]]:
         """Get a specific task by ID"""
-        task_id_str = str(task_id)
-        
-        all_tasks = self.get_all_tasks()
-        for task in all_tasks:
-            if str(task.get('id', '')) == task_id_str:
-                return task
-        
-        return None
+        return self.get_task_index().get(task_id)
     
-    def refresh_all_caches(self):
-        """Refresh all derived caches from the main tasks cache"""
+    def refresh_all_caches(self, tier: Optional[str] = None):
+        """
+        Sync the tasks snapshot and refresh all derived caches from it
+        
+        Args:
+            tier: 'hot' or 'cold' sync; by default the tier that is due
+        """
         logger.info("Refreshing all derived caches")
         
+        from .planfix_telemetry import refresh_run, track_stage
+        from .planfix_workload import employee_workload, EMPLOYEE_WORKLOAD_CACHE
+
         try:
-            # Update main tasks cache first
-            from .planfix_service import update_tasks_cache
-            update_tasks_cache(force=True)
-            
-            # Then update all derived caches
-            self._generate_active_tasks_cache()
-            self._generate_completed_tasks_cache()
-            self._generate_overdue_tasks_cache()
-            self._generate_projects_cache()
-            self._generate_users_cache()
-            self._generate_stats_cache()
+            with refresh_run('full_refresh'):
+                # Update main tasks cache first
+                from .planfix_service import update_tasks_cache
+                update_tasks_cache(force=True, tier=tier)
+
+                with track_stage('index_build') as stage:
+                    stage['items'] = len(self.get_task_index())
+
+                # Then update all derived caches
+                derived_caches = [
+                    ('active_tasks', self._generate_active_tasks_cache, ACTIVE_TASKS_CACHE),
+                    ('completed_tasks', self._generate_completed_tasks_cache, COMPLETED_TASKS_CACHE),
+                    ('overdue_tasks', self._generate_overdue_tasks_cache, OVERDUE_TASKS_CACHE),
+                    ('projects', self._generate_projects_cache, PROJECTS_CACHE),
+                    ('users', self._generate_users_cache, USERS_CACHE),
+                    ('stats', self._generate_stats_cache, STATS_CACHE),
+                    ('employee_workload', employee_workload.generate, EMPLOYEE_WORKLOAD_CACHE)
+                ]
+                for cache_name, generate, cache_file in derived_caches:
+                    with track_stage(f'derived:{cache_name}', cache_name=cache_name) as stage:
+                        result = generate()
+                        stage['items'] = result.get('total_tasks', 0) if cache_name == 'stats' else len(result)
+                        stage['bytes'] = cache_file.stat().st_size if cache_file.exists() else 0
+
+                with track_stage('fuzzy_index') as stage:
+                    from .planfix_fuzzy import fuzzy_search
+                    fuzzy_search.warm()
+                    stage['items'] = len(self.get_task_index())
+
+                with track_stage('autocomplete_index') as stage:
+                    from .planfix_autocomplete import autocomplete
+                    autocomplete.warm()
+                    stage['items'] = len(self.get_task_index())
+
+                with track_stage('task_visibility') as stage:
+                    from .planfix_visibility import task_visibility
+                    stage['items'] = task_visibility.refresh_all()['tokens']
             
             # Update timestamp
             self.update_cache_timestamp()
@@ -561,6 +479,318 @@ class PlanfixCacheService:
             self.last_error_time = time.time()
             raise
     
+    def apply_task_changes(self, upserted_tasks: List[Dict[str, Any]],
+                           deleted_task_ids: Optional[List[Union[str, int]]] = None,
+                           source: str = 'webhook') -> Dict[str, int]:
+        """
+        Apply created, updated and deleted tasks to the snapshot and derived caches
+        without re-downloading the account from Planfix
+        
+        Args:
+            upserted_tasks: Full task payloads that were created or updated
+            deleted_task_ids: IDs of tasks that were deleted
+            source: What produced the changes, recorded in the change log
+        
+        Returns:
+            Counts of added, updated and removed tasks and the new generation
+        """
+        from .planfix_service import save_tasks_cache
+        
+        deleted_ids = {str(task_id) for task_id in (deleted_task_ids or [])}
+        summary = {'added': 0, 'updated': 0, 'removed': 0}
+        
+        with snapshot_write_lock():
+            all_tasks = self._read_tasks_file()
+            positions = {str(task.get('id')): i for i, task in enumerate(all_tasks)}
+            
+            # (old, new) pairs: old is None for creations, new is None for deletions
+            changes = []
+            added_ids, changed_ids, removed_ids = [], [], []
+            for task in upserted_tasks:
+                task_id = str(task.get('id'))
+                if task.get('id') is None or task_id in deleted_ids:
+                    continue
+                
+                position = positions.get(task_id)
+                if position is None:
+                    positions[task_id] = len(all_tasks)
+                    all_tasks.append(task)
+                    changes.append((None, task))
+                    added_ids.append(task_id)
+                    summary['added'] += 1
+                else:
+                    changes.append((all_tasks[position], task))
+                    all_tasks[position] = task
+                    if task_id not in added_ids:
+                        changed_ids.append(task_id)
+                    summary['updated'] += 1
+            
+            for task_id in deleted_ids:
+                if task_id in positions:
+                    changes.append((all_tasks[positions[task_id]], None))
+                    removed_ids.append(task_id)
+                    summary['removed'] += 1
+            
+            if not changes:
+                return summary
+            
+            if summary['removed']:
+                all_tasks = [task for task in all_tasks if str(task.get('id')) not in deleted_ids]
+            
+            summary['generation'] = save_tasks_cache(
+                all_tasks, source=source, changes=(added_ids, changed_ids, removed_ids)
+            )
+            self._apply_changes_to_derived_caches(changes)
+        
+        logger.info(f"Applied task changes: {summary}")
+        return summary
+    
+    def _apply_changes_to_derived_caches(self, changes: List[tuple]):
+        """Patch derived caches with (old, new) task pairs instead of regenerating them"""
+        today = datetime.now().date().isoformat()
+        week_end = (datetime.now().date() + timedelta(days=7)).isoformat()
+        
+        # Final state of every touched task (None if deleted)
+        final_tasks = {}
+        for old_task, new_task in changes:
+            task = new_task if new_task is not None else old_task
+            final_tasks[str(task.get('id'))] = new_task
+        current = [task for task in final_tasks.values() if task is not None]
+        
+        # Task lists
+        self._patch_task_list(ACTIVE_TASKS_CACHE, final_tasks,
+                              [task for task in current if not self._is_task_completed(task)])
+        self._patch_task_list(COMPLETED_TASKS_CACHE, final_tasks,
+                              [task for task in current if self._is_task_completed(task)])
+        self._patch_task_list(OVERDUE_TASKS_CACHE, final_tasks,
+                              [task for task in current if self._is_task_overdue(task, today)])
+        
+        # Aggregates: subtract the old contribution of a task, add the new one
+        projects = self._read_json_cache(PROJECTS_CACHE)
+        if projects is not None:
+            projects_map = {str(project['id']): project for project in projects}
+            for old_task, new_task in changes:
+                if old_task is not None:
+                    self._add_project_contribution(projects_map, old_task, -1, today)
+                if new_task is not None:
+                    self._add_project_contribution(projects_map, new_task, 1, today)
+            projects = [project for project in projects_map.values() if project['task_count'] > 0]
+            self._write_json_cache(PROJECTS_CACHE, projects)
+        
+        users = self._read_json_cache(USERS_CACHE)
+        if users is not None:
+            users_map = {str(user['id']): user for user in users}
+            for old_task, new_task in changes:
+                if old_task is not None:
+                    self._add_user_contribution(users_map, old_task, -1, today)
+                if new_task is not None:
+                    self._add_user_contribution(users_map, new_task, 1, today)
+            users = [
+                user for user in users_map.values()
+                if user['assigned_tasks'] > 0 or user['created_tasks'] > 0
+            ]
+            self._write_json_cache(USERS_CACHE, users)
+        
+        stats = self._read_json_cache(STATS_CACHE)
+        if stats is not None:
+            for old_task, new_task in changes:
+                if old_task is not None:
+                    self._add_stats_contribution(stats, old_task, -1, today, week_end)
+                if new_task is not None:
+                    self._add_stats_contribution(stats, new_task, 1, today, week_end)
+            
+            total = stats['total_tasks']
+            stats['completion_rate'] = round((stats['completed_tasks'] / total) * 100, 2) if total else 0
+            if projects is not None:
+                stats['total_projects'] = len(projects)
+            if stats['total_projects']:
+                stats['avg_tasks_per_project'] = round(total / stats['total_projects'], 2)
+            stats['cache_updated_at'] = datetime.now().isoformat()
+            stats['cache_age_minutes'] = 0
+            self._write_json_cache(STATS_CACHE, stats)
+        
+        from .planfix_workload import employee_workload
+        employee_workload.apply_changes(changes)
+    
+    def _patch_task_list(self, cache_file: Path, final_tasks: Dict[str, Any], additions: List[Dict[str, Any]]):
+        """Replace touched tasks in a derived task list cache"""
+        if not cache_file.exists():
+            return  # Will be regenerated from the snapshot on next read
+        
+        try:
+            tasks = load_tasks_file(cache_file)
+        except (ValueError, KeyError, IOError) as e:
+            logger.error(f"Error reading cache file {cache_file.name}: {e}")
+            return
+        
+        tasks = [task for task in tasks if str(task.get('id')) not in final_tasks]
+        tasks.extend(additions)
+        try:
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                dump_tasks_file(tasks, f, indent=2)
+        except IOError as e:
+            logger.error(f"Error writing cache file {cache_file.name}: {e}")
+    
+    def _add_project_contribution(self, projects_map: Dict[str, Any], task: Dict[str, Any], sign: int, today: str):
+        """Add (sign=1) or remove (sign=-1) a task's contribution to project aggregates"""
+        project = task.get('project')
+        if not project or not project.get('id'):
+            return
+        
+        project_id = str(project['id'])
+        project_info = projects_map.get(project_id)
+        if project_info is None:
+            if sign < 0:
+                return
+            project_info = projects_map[project_id] = {
+                'id': project['id'],
+                'name': project.get('name', f"Project {project_id}"),
+                'task_count': 0,
+                'active_tasks': 0,
+                'completed_tasks': 0,
+                'overdue_tasks': 0
+            }
+        elif sign > 0 and project.get('name'):
+            project_info['name'] = project['name']
+        
+        project_info['task_count'] += sign
+        if self._is_task_completed(task):
+            project_info['completed_tasks'] += sign
+        else:
+            project_info['active_tasks'] += sign
+            if self._is_task_overdue(task, today):
+                project_info['overdue_tasks'] += sign
+    
+    def _add_user_contribution(self, users_map: Dict[str, Any], task: Dict[str, Any], sign: int, today: str):
+        """
+        Add (sign=1) or remove (sign=-1) a task's contribution to user aggregates.
+        Project sets only grow here; the next full refresh prunes them.
+        """
+        project_id = None
+        if task.get('project') and task['project'].get('id'):
+            project_id = str(task['project']['id'])
+        
+        def get_user(person):
+            user_id = str(person['id'])
+            if user_id not in users_map:
+                if sign < 0:
+                    return None
+                users_map[user_id] = {
+                    'id': person['id'],
+                    'name': person.get('name', f"User {user_id}"),
+                    'email': person.get('email', ''),
+                    'assigned_tasks': 0,
+                    'assigned_active': 0,
+                    'assigned_completed': 0,
+                    'assigned_overdue': 0,
+                    'created_tasks': 0,
+                    'projects': []
+                }
+            user = users_map[user_id]
+            if sign > 0 and project_id and project_id not in user['projects']:
+                user['projects'].append(project_id)
+            return user
+        
+        for assignee in self._get_task_assignees(task):
+            if not assignee.get('id'):
+                continue
+            user = get_user(assignee)
+            if user is None:
+                continue
+            
+            user['assigned_tasks'] += sign
+            if self._is_task_completed(task):
+                user['assigned_completed'] += sign
+            else:
+                user['assigned_active'] += sign
+                if self._is_task_overdue(task, today):
+                    user['assigned_overdue'] += sign
+        
+        if task.get('assigner') and task['assigner'].get('id'):
+            user = get_user(task['assigner'])
+            if user is not None:
+                user['created_tasks'] += sign
+    
+    def _add_stats_contribution(self, stats: Dict[str, Any], task: Dict[str, Any], sign: int,
+                                today: str, week_end: str):
+        """Add (sign=1) or remove (sign=-1) a task's contribution to the stats counters"""
+        stats['total_tasks'] += sign
+        
+        if self._is_task_completed(task):
+            stats['completed_tasks'] += sign
+        else:
+            stats['active_tasks'] += sign
+            end_date = self._get_task_end_date(task)
+            if end_date and end_date < today:
+                stats['overdue_tasks'] += sign
+            if end_date and end_date <= week_end:
+                stats['tasks_due_this_week'] += sign
+        
+        status = self._get_status_label(task)
+        status_counts = stats.setdefault('status_counts', {})
+        status_counts[status] = status_counts.get(status, 0) + sign
+        if status_counts[status] <= 0:
+            del status_counts[status]
+    
+    def _read_json_cache(self, cache_file: Path) -> Optional[Any]:
+        """Read a derived cache file, returning None if it is missing or broken"""
+        if not cache_file.exists():
+            return None
+        
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading cache file {cache_file.name}: {e}")
+            return None
+    
+    def _write_json_cache(self, cache_file: Path, data: Any):
+        """Write a derived cache file"""
+        try:
+            with open(cache_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+        except IOError as e:
+            logger.error(f"Error writing cache file {cache_file.name}: {e}")
+    
+    def _get_task_end_date(self, task: Dict[str, Any]) -> Optional[str]:
+        """Extract the task due date from any of the Planfix date formats"""
+        if task.get('endDateTime') and isinstance(task['endDateTime'], dict):
+            if 'date' in task['endDateTime']:
+                return task['endDateTime']['date']
+            elif 'dateTo' in task['endDateTime']:
+                return task['endDateTime']['dateTo']
+        elif task.get('endDateTime') and isinstance(task['endDateTime'], str):
+            return task['endDateTime']
+        elif task.get('dateEnd') and isinstance(task['dateEnd'], str):
+            return task['dateEnd']
+        return None
+    
+    def _is_task_overdue(self, task: Dict[str, Any], today: Optional[str] = None) -> bool:
+        """Determine if an active task is past its due date"""
+        if self._is_task_completed(task):
+            return False
+        
+        today = today or datetime.now().date().isoformat()
+        end_date = self._get_task_end_date(task)
+        return bool(end_date and end_date < today)
+    
+    def _get_task_assignees(self, task: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Get task assignees from either the list or the {'users': [...]} format"""
+        if isinstance(task.get('assignees'), list):
+            return task['assignees']
+        elif isinstance(task.get('assignees'), dict) and task['assignees'].get('users'):
+            return task['assignees']['users']
+        return []
+    
+    def _get_status_label(self, task: Dict[str, Any]) -> str:
+        """Get the status label used in status counts"""
+        if task.get('status'):
+            if task['status'].get('name'):
+                return task['status']['name']
+            elif task['status'].get('id'):
+                return f"Status ID {task['status']['id']}"
+        return "Unknown"
+    
     def _is_task_completed(self, task: Dict[str, Any]) -> bool:
         """Determine if a task is completed based on its status"""
         # Check by status ID first
@@ -578,43 +808,42 @@ class PlanfixCacheService:
         return False
     
     def search_tasks(self, query: str, include_completed: bool = False) -> List[Dict[str, Any]]:
-        """Search tasks by name, description, status, etc."""
-        query = query.lower()
-        tasks_to_search = self.get_all_tasks() if include_completed else self.get_active_tasks()
-        
-        results = []
-        for task in tasks_to_search:
-            # Search in task name
-            if task.get('name') and query in task['name'].lower():
-                results.append(task)
-                continue
-            
-            # Search in description
-            if task.get('description') and query in task['description'].lower():
-                results.append(task)
-                continue
-            
-            # Search in status
-            if task.get('status') and task['status'].get('name') and query in task['status']['name'].lower():
-                results.append(task)
-                continue
-            
-            # Search in project name
-            if task.get('project') and task['project'].get('name') and query in task['project']['name'].lower():
-                results.append(task)
-                continue
-        
-        return results
+        """Search tasks by name, description, status or project name, falling back to fuzzy name matches"""
+        tasks = self.query_tasks(text=query, completed=None if include_completed else False, limit=None)['tasks']
+        if tasks or not query.strip():
+            return tasks
+        
+        from .planfix_fuzzy import fuzzy_search
+        tasks = self.get_task_index().get_many(fuzzy_search.find_ids(query, 'tasks'))
+        return tasks if include_completed else [task for task in tasks if not self._is_task_completed(task)]
+    
+    def query_tasks(self, **filters) -> Dict[str, Any]:
+        """
+        Find tasks with the index-aware query planner
+        
+        Args:
+            **filters: Filters, sort, limit and cursor of TaskQueryPlanner.query
+        
+        Returns:
+            {'tasks', 'total', 'next_cursor'} and 'plan' when explain is set
+        """
+        from .planfix_query import task_query
+        return task_query.query(**filters)
     
     def search_projects(self, query: str) -> List[Dict[str, Any]]:
-        """Search projects by name"""
+        """Search projects by name, falling back to fuzzy name matches"""
         query = query.lower()
         projects = self.get_projects()
         
-        return [
+        results = [
             project for project in projects
             if project.get('name') and query in project['name'].lower()
         ]
+        if results or not query.strip():
+            return results
+        
+        from .planfix_fuzzy import fuzzy_search
+        return self._order_by_ids(projects, fuzzy_search.find_ids(query, 'projects'))
     
     def search_users(self, query: str) -> List[Dict[str, Any]]:
         """Search users by name or email"""
@@ -633,7 +862,16 @@ class PlanfixCacheService:
                 results.append(user)
                 continue
         
-        return results
+        if results or not query.strip():
+            return results
+        
+        from .planfix_fuzzy import fuzzy_search
+        return self._order_by_ids(users, fuzzy_search.find_ids(query, 'users'))
+    
+    def _order_by_ids(self, items: List[Dict[str, Any]], ids: List[str]) -> List[Dict[str, Any]]:
+        """Pick items by ID in the order of the IDs"""
+        by_id = {str(item.get('id')): item for item in items}
+        return [by_id[item_id] for item_id in ids if item_id in by_id]
 
 # Singleton instance
 planfix_cache = PlanfixCacheService()
\ No newline at end of file
@@ -0,0 +1,162 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Any, Iterable
+
+from .planfix_cache_service import CACHE_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Generation counter and the bounded history of per-generation changes
+GENERATIONS_FILE = CACHE_DIR / 'generations.json'
+
+# How many generations clients can catch up on before a full resync is required
+MAX_GENERATIONS = 500
+
+class TaskChangeLog:
+    """
+    Records which task IDs were added, changed and removed in every
+    generation of the tasks snapshot.
+
+    A generation is bumped each time the snapshot is published (full sync,
+    webhook batch, partial refresh). Writers must hold snapshot_write_lock().
+    """
+
+    def __init__(self, log_file=GENERATIONS_FILE, max_generations: int = MAX_GENERATIONS):
+        """Initialize the change log"""
+        self.log_file = log_file
+        self.max_generations = max_generations
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the log from disk"""
+        if not self.log_file.exists():
+            return {'generation': 0, 'entries': []}
+
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading generations log: {e}")
+            return {'generation': 0, 'entries': []}
+
+    def _save(self, data: Dict[str, Any]):
+        """Atomically write the log to disk"""
+        tmp_file = self.log_file.with_name(f"{self.log_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.log_file)
+
+    def get_current_generation(self) -> int:
+        """Get the generation of the published snapshot"""
+        return self._load()['generation']
+
+    def get_entries(self) -> List[Dict[str, Any]]:
+        """Get the recorded generations, oldest first"""
+        return self._load()['entries']
+
+    def record(self, added: Iterable[Any], changed: Iterable[Any], removed: Iterable[Any],
+               source: str = 'full_sync') -> int:
+        """
+        Record a new generation
+
+        Args:
+            added: IDs of created tasks
+            changed: IDs of updated tasks
+            removed: IDs of deleted tasks
+            source: What produced the generation (full_sync, webhook, ...)
+
+        Returns:
+            The new generation number
+        """
+        data = self._load()
+        generation = data['generation'] + 1
+
+        data['generation'] = generation
+        data['entries'].append({
+            'generation': generation,
+            'timestamp': time.time(),
+            'source': source,
+            'added': sorted({str(task_id) for task_id in added}),
+            'changed': sorted({str(task_id) for task_id in changed}),
+            'removed': sorted({str(task_id) for task_id in removed})
+        })
+        data['entries'] = data['entries'][-self.max_generations:]
+
+        self._save(data)
+        entry = data['entries'][-1]
+        logger.info(
+            f"Recorded generation {generation} ({source}): {len(entry['added'])} added, "
+            f"{len(entry['changed'])} changed, {len(entry['removed'])} removed"
+        )
+        return generation
+
+    def record_snapshot_diff(self, old_tasks: List[Dict[str, Any]], new_tasks: List[Dict[str, Any]],
+                             source: str = 'full_sync') -> int:
+        """Record a generation by diffing two full snapshots"""
+        old_by_id = {str(task.get('id')): task for task in old_tasks}
+        new_by_id = {str(task.get('id')): task for task in new_tasks}
+
+        added = [task_id for task_id in new_by_id if task_id not in old_by_id]
+        removed = [task_id for task_id in old_by_id if task_id not in new_by_id]
+        changed = [
+            task_id for task_id, task in new_by_id.items()
+            if task_id in old_by_id and old_by_id[task_id] != task
+        ]
+
+        return self.record(added, changed, removed, source)
+
+    def get_changes_since(self, since: int) -> Dict[str, Any]:
+        """
+        Get the net changes between generation `since` and the current one
+
+        Returns:
+            Dict with the current generation, resync_required flag and
+            added/changed/removed ID lists
+        """
+        data = self._load()
+        current = data['generation']
+        entries = data['entries']
+        result = {
+            'generation': current,
+            'since': since,
+            'resync_required': False,
+            'added': [],
+            'changed': [],
+            'removed': []
+        }
+
+        if since == current:
+            return result
+
+        oldest = entries[0]['generation'] if entries else current + 1
+        if since > current or since < oldest - 1:
+            # The client is ahead of us (cache reset) or behind the history window
+            result['resync_required'] = True
+            return result
+
+        # Net effect per task across the window
+        states = {}
+        for entry in entries:
+            if entry['generation'] <= since:
+                continue
+
+            for task_id in entry['added']:
+                states[task_id] = 'changed' if states.get(task_id) == 'removed' else 'added'
+            for task_id in entry['changed']:
+                if states.get(task_id) != 'added':
+                    states[task_id] = 'changed'
+            for task_id in entry['removed']:
+                if states.get(task_id) == 'added':
+                    del states[task_id]  # Created and deleted within the window
+                else:
+                    states[task_id] = 'removed'
+
+        for task_id, state in states.items():
+            result[state].append(task_id)
+
+        return result
+
+# Singleton instance
+task_change_log = TaskChangeLog()
@@ -0,0 +1,133 @@
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Any
+
+from .planfix_config import CIRCUIT_BREAKER
+from .planfix_cache_service import CACHE_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Open state shared between web and Celery processes
+CIRCUIT_STATE_FILE = CACHE_DIR / 'planfix_circuit.json'
+
+# Circuit states
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+class CircuitBreaker:
+    """
+    Circuit breaker around the Planfix client.
+
+    After failure_threshold consecutive failures (timeouts, connection
+    errors, 5xx) the circuit opens and requests fail immediately for
+    reset_timeout seconds. Then a single probe request is let through:
+    success closes the circuit, failure opens it again. The open-until
+    time is also written to a state file so other processes stop calling
+    a dead upstream without paying for their own failures first.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60, state_file=CIRCUIT_STATE_FILE):
+        """Initialize the breaker"""
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state_file = state_file
+        self._failures = 0
+        self._open_until = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _read_shared_open_until(self) -> float:
+        """Get the open-until time published by any process"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return float(json.load(f).get('open_until', 0))
+        except (IOError, ValueError, json.JSONDecodeError):
+            return 0.0
+
+    def _write_shared_open_until(self, open_until: float):
+        """Publish the open-until time to other processes"""
+        try:
+            tmp_file = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'open_until': open_until}, f)
+            os.replace(tmp_file, self.state_file)
+        except IOError as e:
+            logger.error(f"Error writing circuit breaker state: {e}")
+
+    def get_state(self) -> str:
+        """Get the current state"""
+        with self._lock:
+            return self._get_state(time.time())
+
+    def _get_state(self, now: float) -> str:
+        """Get the current state (lock must be held)"""
+        open_until = max(self._open_until, self._read_shared_open_until())
+        if open_until == 0:
+            return STATE_CLOSED
+        if now < open_until:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    def allow_request(self) -> bool:
+        """Check whether a request may be sent; in half-open state only one probe is allowed"""
+        with self._lock:
+            state = self._get_state(time.time())
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                logger.info("Planfix circuit half-open, sending a probe request")
+                return True
+            self.rejected += 1
+            return False
+
+    def release_probe(self):
+        """Give up a probe slot that was granted but not used"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        """Close the circuit after a successful request"""
+        with self._lock:
+            was_open = self._open_until or self._probe_in_flight
+            self._failures = 0
+            self._probe_in_flight = False
+            if self._open_until or self._read_shared_open_until():
+                self._open_until = 0.0
+                self._write_shared_open_until(0.0)
+            if was_open:
+                logger.info("Planfix circuit closed, upstream recovered")
+
+    def record_failure(self):
+        """Count a failure and open the circuit when the threshold is reached"""
+        with self._lock:
+            self._failures += 1
+            if self._probe_in_flight or self._failures >= self.failure_threshold:
+                self._probe_in_flight = False
+                self._open_until = time.time() + self.reset_timeout
+                self._write_shared_open_until(self._open_until)
+                logger.error(
+                    f"Planfix circuit opened after {self._failures} failures, "
+                    f"failing fast for {self.reset_timeout}s"
+                )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker statistics"""
+        with self._lock:
+            now = time.time()
+            open_until = max(self._open_until, self._read_shared_open_until())
+            return {
+                'state': self._get_state(now),
+                'consecutive_failures': self._failures,
+                'retry_in': round(max(0.0, open_until - now), 1),
+                'rejected': self.rejected
+            }
+
+# Singleton instance
+planfix_circuit = CircuitBreaker(**CIRCUIT_BREAKER)
@@ -0,0 +1,116 @@
+import json
+import logging
+from typing import Dict, List, Any, Union
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Marker of the dictionary-encoded task list format
+ENCODED_FORMAT = 'planfix-tasks/dict-v1'
+
+class _Table:
+    """Dictionary of distinct values referenced by position"""
+
+    def __init__(self):
+        """Initialize an empty table"""
+        self.values: List[Dict[str, Any]] = []
+        self._positions: Dict[str, int] = {}
+
+    def ref(self, value: Dict[str, Any]) -> int:
+        """Get the reference of a value, adding it on first use"""
+        key = json.dumps(value, sort_keys=True, ensure_ascii=False)
+        position = self._positions.get(key)
+        if position is None:
+            position = self._positions[key] = len(self.values)
+            self.values.append(value)
+        return position
+
+def encode_tasks(tasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Dictionary-encode a task list for storage
+
+    Statuses, projects and people (assigner and assignee users) are stored
+    once in shared tables and tasks hold their integer positions. Only
+    object values are encoded, so tasks without a project or status keep
+    their original value.
+
+    Returns:
+        {'format', 'statuses', 'projects', 'people', 'tasks'}
+    """
+    statuses, projects, people = _Table(), _Table(), _Table()
+
+    encoded = []
+    for task in tasks:
+        task = dict(task)
+        if isinstance(task.get('status'), dict):
+            task['status'] = statuses.ref(task['status'])
+        if isinstance(task.get('project'), dict):
+            task['project'] = projects.ref(task['project'])
+        if isinstance(task.get('assigner'), dict):
+            task['assigner'] = people.ref(task['assigner'])
+
+        assignees = task.get('assignees')
+        if isinstance(assignees, list):
+            task['assignees'] = [people.ref(person) if isinstance(person, dict) else person for person in assignees]
+        elif isinstance(assignees, dict) and isinstance(assignees.get('users'), list):
+            task['assignees'] = dict(assignees, users=[
+                people.ref(person) if isinstance(person, dict) else person for person in assignees['users']
+            ])
+        encoded.append(task)
+
+    return {
+        'format': ENCODED_FORMAT,
+        'statuses': statuses.values,
+        'projects': projects.values,
+        'people': people.values,
+        'tasks': encoded
+    }
+
+def decode_tasks(data: Union[Dict[str, Any], List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Decode a stored task list into task dicts
+
+    Every task referencing the same status, project or person gets the same
+    dict object, so repeated values are held in memory once. Plain task
+    lists (the format before encoding) are interned the same way.
+
+    Treat the shared objects as read-only: changing one changes it in every task.
+    """
+    if isinstance(data, list):
+        return intern_tasks(data)
+
+    if data.get('format') != ENCODED_FORMAT:
+        raise ValueError(f"Unknown task list format: {data.get('format')}")
+
+    statuses, projects, people = data['statuses'], data['projects'], data['people']
+
+    tasks = data['tasks']
+    for task in tasks:
+        if isinstance(task.get('status'), int):
+            task['status'] = statuses[task['status']]
+        if isinstance(task.get('project'), int):
+            task['project'] = projects[task['project']]
+        if isinstance(task.get('assigner'), int):
+            task['assigner'] = people[task['assigner']]
+
+        assignees = task.get('assignees')
+        if isinstance(assignees, list):
+            task['assignees'] = [people[person] if isinstance(person, int) else person for person in assignees]
+        elif isinstance(assignees, dict) and isinstance(assignees.get('users'), list):
+            assignees['users'] = [people[person] if isinstance(person, int) else person for person in assignees['users']]
+
+    return tasks
+
+def intern_tasks(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Make equal statuses, projects and people of a plain task list share one dict object"""
+    encoded = encode_tasks(tasks)
+    return decode_tasks(encoded)
+
+def load_tasks_file(path) -> List[Dict[str, Any]]:
+    """Read a task list file in either format"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return decode_tasks(json.load(f))
+
+def dump_tasks_file(tasks: List[Dict[str, Any]], f, **kwargs):
+    """Write a task list dictionary-encoded to an open file"""
+    json.dump(encode_tasks(tasks), f, ensure_ascii=False, **kwargs)
@@ -0,0 +1,524 @@
+import bisect
+import logging
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Union
+
+from .planfix_cache_service import planfix_cache
+
+try:
+    import numpy as np
+except ImportError:  # Aggregates fall back to plain Python loops
+    np = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Keys accepted by TaskColumns.group_by
+GROUP_KEYS = ('status', 'project', 'assignee', 'assigner')
+
+# Columns with posting lists
+POSTING_KEYS = ('status', 'project', 'assignee', 'assigner')
+
+def date_number(value: Optional[str]) -> int:
+    """Turn a Planfix date (DD-MM-YYYY or ISO) into a YYYYMMDD number, -1 if it is not a date"""
+    if not value:
+        return -1
+    value = value[:10]
+    if len(value) == 10 and value[2] == '-' and value[5] == '-':
+        value = f"{value[6:]}-{value[3:5]}-{value[:2]}"
+    digits = value.replace('-', '')
+    return int(digits) if len(value) == 10 and len(digits) == 8 and digits.isdigit() else -1
+
+class TaskColumns:
+    """
+    Columnar view of one version of the tasks snapshot.
+
+    Every task is a row; statuses, projects and people are coded as
+    positions in tables kept in order of first appearance. Columns:
+
+    - status: status label code
+    - project: project code, -1 without a project
+    - due: rank of the due date string among all distinct due strings,
+      -1 without a due date. Ranks compare exactly like the due strings
+      the rest of the cache compares, so overdue counts stay the same.
+    - due_date: due date as a YYYYMMDD number, -1 without a due date;
+      used for date ranges and ordering in queries
+    - completed: completion flag
+    - assigner: person code of the creator, -1 without one
+    - assignee_offsets / assignees: CSR structure, the assignee person
+      codes of row i are assignees[assignee_offsets[i]:assignee_offsets[i + 1]]
+
+    With NumPy the columns are arrays and aggregates are vectorized,
+    otherwise they are lists and the same aggregates run as loops.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]]):
+        """Build the columns for a list of tasks"""
+        self.tasks = tasks
+        self.size = len(tasks)
+        self.status_labels: List[str] = []
+        # Planfix status IDs seen under every status label
+        self.status_ids: List[set] = []
+        self.projects: List[Dict[str, Any]] = []
+        self.people: List[Dict[str, Any]] = []
+        status_codes, project_codes, person_codes = {}, {}, {}
+
+        def person_code(person):
+            person_id = str(person['id'])
+            code = person_codes.get(person_id)
+            if code is None:
+                code = person_codes[person_id] = len(self.people)
+                self.people.append({
+                    'id': person['id'],
+                    'name': person.get('name', f"User {person_id}"),
+                    'email': person.get('email', '')
+                })
+            return code
+
+        status, project, due_strings, completed, assigner = [], [], [], [], []
+        offsets, assignees = [0], []
+
+        for task in tasks:
+            label = planfix_cache._get_status_label(task)
+            if label not in status_codes:
+                status_codes[label] = len(self.status_labels)
+                self.status_labels.append(label)
+                self.status_ids.append(set())
+            status.append(status_codes[label])
+            if task.get('status') and task['status'].get('id') is not None:
+                self.status_ids[status_codes[label]].add(str(task['status']['id']))
+
+            code = -1
+            if task.get('project') and task['project'].get('id'):
+                project_id = str(task['project']['id'])
+                code = project_codes.get(project_id)
+                if code is None:
+                    code = project_codes[project_id] = len(self.projects)
+                    self.projects.append({
+                        'id': task['project']['id'],
+                        'name': task['project'].get('name', f"Project {project_id}")
+                    })
+            project.append(code)
+
+            for person in planfix_cache._get_task_assignees(task):
+                if person.get('id'):
+                    assignees.append(person_code(person))
+            offsets.append(len(assignees))
+
+            if task.get('assigner') and task['assigner'].get('id'):
+                assigner.append(person_code(task['assigner']))
+            else:
+                assigner.append(-1)
+
+            due_strings.append(planfix_cache._get_task_end_date(task))
+            completed.append(planfix_cache._is_task_completed(task))
+
+        self.due_values = sorted({value for value in due_strings if value})
+        due_ranks = {value: rank for rank, value in enumerate(self.due_values)}
+        due = [due_ranks[value] if value else -1 for value in due_strings]
+        due_date = [date_number(value) for value in due_strings]
+
+        self.task_ids = [str(task.get('id')) for task in tasks]
+        self.row_by_id = {task_id: row for row, task_id in enumerate(self.task_ids)}
+        self._postings = {}
+        self._due_order = None
+
+        # Row of every assignee entry, to spread row masks over the CSR entries
+        assignee_rows = [row for row in range(self.size) for _ in range(offsets[row + 1] - offsets[row])]
+
+        if np is not None:
+            self.status = np.array(status, dtype=np.int32)
+            self.project = np.array(project, dtype=np.int32)
+            self.due = np.array(due, dtype=np.int32)
+            self.due_date = np.array(due_date, dtype=np.int32)
+            self.completed = np.array(completed, dtype=bool)
+            self.assigner = np.array(assigner, dtype=np.int32)
+            self.assignee_offsets = np.array(offsets, dtype=np.int64)
+            self.assignees = np.array(assignees, dtype=np.int32)
+            self.assignee_rows = np.array(assignee_rows, dtype=np.int64)
+        else:
+            self.status, self.project, self.due, self.due_date = status, project, due, due_date
+            self.completed, self.assigner = completed, assigner
+            self.assignee_offsets, self.assignees, self.assignee_rows = offsets, assignees, assignee_rows
+
+        logger.debug(f"Built task columns for {self.size} tasks (numpy: {np is not None})")
+
+    # Vectorized primitives with a plain Python fallback
+
+    def _bincount(self, codes, size: int, mask=None) -> List[int]:
+        """Count rows per code, skipping negative codes and rows outside the mask"""
+        if np is not None:
+            valid = codes >= 0
+            if mask is not None:
+                valid &= mask
+            return np.bincount(codes[valid], minlength=size).tolist()
+
+        counts = [0] * size
+        for row, code in enumerate(codes):
+            if code >= 0 and (mask is None or mask[row]):
+                counts[code] += 1
+        return counts
+
+    def _and(self, left, right):
+        """Combine two row masks"""
+        if np is not None:
+            return left & right
+        return [a and b for a, b in zip(left, right)]
+
+    def _not(self, mask):
+        """Invert a row mask"""
+        if np is not None:
+            return ~mask
+        return [not value for value in mask]
+
+    def _full(self, value: bool):
+        """Mask with every row set to a value"""
+        if np is not None:
+            return np.full(self.size, value, dtype=bool)
+        return [value] * self.size
+
+    def _equals(self, column, value: int):
+        """Rows where a column equals a code"""
+        if np is not None:
+            return column == value
+        return [code == value for code in column]
+
+    def _due_before(self, limit: int):
+        """Rows with a due rank below a limit"""
+        if np is not None:
+            return (self.due >= 0) & (self.due < limit)
+        return [0 <= rank < limit for rank in self.due]
+
+    def _count(self, mask) -> int:
+        """Number of rows in a mask"""
+        return int(mask.sum()) if np is not None else sum(mask)
+
+    def _spread(self, mask):
+        """Turn a row mask into a mask over the assignee entries"""
+        if np is not None:
+            return mask[self.assignee_rows]
+        return [mask[row] for row in self.assignee_rows]
+
+    def _rows_with_assignee(self, code: int):
+        """Rows that have a person among their assignees"""
+        if np is not None:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[self.assignee_rows[self.assignees == code]] = True
+            return mask
+        mask = [False] * self.size
+        for row, person in zip(self.assignee_rows, self.assignees):
+            if person == code:
+                mask[row] = True
+        return mask
+
+    # Row sets, kept as sorted row numbers
+
+    def all_rows(self):
+        """Every row"""
+        return np.arange(self.size, dtype=np.int64) if np is not None else list(range(self.size))
+
+    def rows_from(self, rows: List[int]):
+        """Turn a list of row numbers into a row set"""
+        rows = sorted(set(rows))
+        return np.array(rows, dtype=np.int64) if np is not None else rows
+
+    def _get_postings(self, key: str):
+        """Get (rows ordered by code, start of every code) for a coded column, built on first use"""
+        if key not in self._postings:
+            if key == 'assignee':
+                codes, rows = self.assignees, self.assignee_rows
+                size = len(self.people)
+            else:
+                codes = getattr(self, key)
+                rows = None
+                size = len(self.people) if key == 'assigner' else len(self.projects if key == 'project' else self.status_labels)
+
+            if np is not None:
+                order = np.argsort(codes, kind='stable')
+                skipped = int((codes < 0).sum())
+                starts = np.concatenate([[0], np.cumsum(np.bincount(codes[codes >= 0], minlength=size))]) + skipped
+                ordered_rows = order if rows is None else rows[order]
+                self._postings[key] = (ordered_rows, starts.tolist())
+            else:
+                lists = [[] for _ in range(size)]
+                for position, code in enumerate(codes):
+                    if code >= 0:
+                        lists[code].append(position if rows is None else rows[position])
+                self._postings[key] = lists
+        return self._postings[key]
+
+    def posting(self, key: str, code: int):
+        """Rows with a code in a column (for 'assignee', among the assignees)"""
+        if code < 0:
+            return self.rows_from([])
+        postings = self._get_postings(key)
+        if np is not None:
+            ordered_rows, starts = postings
+            rows = ordered_rows[starts[code]:starts[code + 1]]
+            return np.unique(rows) if key == 'assignee' else rows
+        rows = postings[code]
+        return sorted(set(rows)) if key == 'assignee' else rows
+
+    def posting_size(self, key: str, code: int) -> int:
+        """Length of a posting list without materializing it (an upper bound for 'assignee')"""
+        if code < 0:
+            return 0
+        postings = self._get_postings(key)
+        if np is not None:
+            return postings[1][code + 1] - postings[1][code]
+        return len(postings[code])
+
+    def union(self, row_sets: List[Any]):
+        """Rows in any of the row sets"""
+        if np is not None:
+            return np.unique(np.concatenate(row_sets)) if row_sets else self.rows_from([])
+        return sorted(set().union(*row_sets)) if row_sets else []
+
+    def intersect(self, rows, other):
+        """Rows in both row sets"""
+        if np is not None:
+            return np.intersect1d(rows, other, assume_unique=True)
+        other = set(other)
+        return [row for row in rows if row in other]
+
+    def select(self, rows, key: str, codes: List[int]):
+        """Rows of a row set whose column value is one of the codes"""
+        column = getattr(self, key)
+        if np is not None:
+            return rows[np.isin(column[rows], codes)]
+        codes = set(codes)
+        return [row for row in rows if column[row] in codes]
+
+    def _get_due_order(self):
+        """Get rows ordered by due date and their due dates, built on first use"""
+        if self._due_order is None:
+            if np is not None:
+                order = np.argsort(self.due_date, kind='stable')
+                self._due_order = (order, self.due_date[order])
+            else:
+                order = sorted(range(self.size), key=lambda row: self.due_date[row])
+                self._due_order = (order, [self.due_date[row] for row in order])
+        return self._due_order
+
+    def _due_bounds(self, due_from: Optional[str], due_to: Optional[str]) -> tuple:
+        """Positions of a due date range in the due order"""
+        order, dates = self._get_due_order()
+        low = max(date_number(due_from), 0) if due_from else 0
+        high = date_number(due_to) if due_to else 99999999
+        if np is not None:
+            return int(np.searchsorted(dates, low, 'left')), int(np.searchsorted(dates, high, 'right'))
+        return bisect.bisect_left(dates, low), bisect.bisect_right(dates, high)
+
+    def due_range_size(self, due_from: Optional[str], due_to: Optional[str]) -> int:
+        """Number of tasks due within a date range"""
+        start, end = self._due_bounds(due_from, due_to)
+        return end - start
+
+    def due_range(self, due_from: Optional[str], due_to: Optional[str]):
+        """Rows due within a date range (inclusive), in row order"""
+        start, end = self._due_bounds(due_from, due_to)
+        order = self._get_due_order()[0]
+        return np.sort(order[start:end]) if np is not None else sorted(order[start:end])
+
+    def select_due(self, rows, due_from: Optional[str], due_to: Optional[str]):
+        """Rows of a row set due within a date range (inclusive)"""
+        low = max(date_number(due_from), 0) if due_from else 0
+        high = date_number(due_to) if due_to else 99999999
+        if np is not None:
+            dates = self.due_date[rows]
+            return rows[(dates >= low) & (dates <= high)]
+        return [row for row in rows if low <= self.due_date[row] <= high]
+
+    def sort_rows(self, rows, key: str, descending: bool = False):
+        """Order a row set by 'due' (undated last) or by row order"""
+        if key == 'due':
+            if np is not None:
+                dates = self.due_date[rows].astype(np.int64)
+                dates[dates < 0] = -1 if descending else 99999999
+                order = np.argsort(-dates if descending else dates, kind='stable')
+                return rows[order]
+            missing = -1 if descending else 99999999
+            return sorted(rows, key=lambda row: self.due_date[row] if self.due_date[row] >= 0 else missing,
+                          reverse=descending)
+        return rows[::-1] if descending else rows
+
+    # Masks
+
+    def active_mask(self):
+        """Rows of tasks that are not completed"""
+        return self._not(self.completed)
+
+    def overdue_mask(self, today: Optional[str] = None):
+        """Rows of active tasks whose due date is before today"""
+        today = today or datetime.now().date().isoformat()
+        return self._and(self.active_mask(), self._due_before(bisect.bisect_left(self.due_values, today)))
+
+    def due_by_mask(self, until: str):
+        """Rows of active tasks due on or before a date"""
+        return self._and(self.active_mask(), self._due_before(bisect.bisect_right(self.due_values, until)))
+
+    def mask(self, status: Optional[str] = None, project_id: Optional[Union[str, int]] = None,
+             assignee_id: Optional[Union[str, int]] = None, completed: Optional[bool] = None,
+             overdue: Optional[bool] = None, today: Optional[str] = None):
+        """
+        Build a row mask from filters; unset filters match every row
+
+        Args:
+            status: Status label
+            project_id: Project ID
+            assignee_id: Person ID among the assignees
+            completed: Completion flag
+            overdue: Overdue flag
+        """
+        mask = self._full(True)
+        if status is not None:
+            code = self._find(self.status_labels, status)
+            mask = self._and(mask, self._equals(self.status, code) if code >= 0 else self._full(False))
+        if project_id is not None:
+            code = self._find_id(self.projects, project_id)
+            mask = self._and(mask, self._equals(self.project, code) if code >= 0 else self._full(False))
+        if assignee_id is not None:
+            code = self._find_id(self.people, assignee_id)
+            mask = self._and(mask, self._rows_with_assignee(code) if code >= 0 else self._full(False))
+        if completed is not None:
+            mask = self._and(mask, self.completed if completed else self.active_mask())
+        if overdue is not None:
+            overdue_mask = self.overdue_mask(today)
+            mask = self._and(mask, overdue_mask if overdue else self._not(overdue_mask))
+        return mask
+
+    def _find(self, values: List[str], value: str) -> int:
+        """Code of a table value, or -1 if it is unknown"""
+        try:
+            return values.index(value)
+        except ValueError:
+            return -1
+
+    def _find_id(self, table: List[Dict[str, Any]], item_id: Union[str, int]) -> int:
+        """Code of a table entry by ID, or -1 if it is unknown"""
+        item_id = str(item_id)
+        for code, item in enumerate(table):
+            if str(item['id']) == item_id:
+                return code
+        return -1
+
+    # Aggregates
+
+    def get_stats(self, today: Optional[str] = None, week_end: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get snapshot-wide counts
+
+        Returns:
+            total, active, completed, overdue, due this week and status counts
+        """
+        today = today or datetime.now().date().isoformat()
+        completed = self._count(self.completed)
+        status_counts = self._bincount(self.status, len(self.status_labels))
+
+        return {
+            'total_tasks': self.size,
+            'active_tasks': self.size - completed,
+            'completed_tasks': completed,
+            'overdue_tasks': self._count(self.overdue_mask(today)),
+            'tasks_due_this_week': self._count(self.due_by_mask(week_end)) if week_end else 0,
+            'status_counts': {
+                label: count for label, count in zip(self.status_labels, status_counts) if count
+            }
+        }
+
+    def get_project_counts(self, today: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get task, active, completed and overdue counts of every project"""
+        size = len(self.projects)
+        totals = self._bincount(self.project, size)
+        completed = self._bincount(self.project, size, self.completed)
+        overdue = self._bincount(self.project, size, self.overdue_mask(today))
+
+        return [
+            dict(project, task_count=totals[code], active_tasks=totals[code] - completed[code],
+                 completed_tasks=completed[code], overdue_tasks=overdue[code])
+            for code, project in enumerate(self.projects)
+        ]
+
+    def get_person_counts(self, today: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Get assignment, creation and project counts of every person"""
+        size = len(self.people)
+        assigned = self._bincount(self.assignees, size)
+        completed = self._bincount(self.assignees, size, self._spread(self.completed))
+        overdue = self._bincount(self.assignees, size, self._spread(self.overdue_mask(today)))
+        created = self._bincount(self.assigner, size)
+
+        return [
+            dict(person, assigned_tasks=assigned[code], assigned_active=assigned[code] - completed[code],
+                 assigned_completed=completed[code], assigned_overdue=overdue[code],
+                 created_tasks=created[code], projects=projects)
+            for code, (person, projects) in enumerate(zip(self.people, self._get_person_projects()))
+        ]
+
+    def _get_person_projects(self) -> List[List[str]]:
+        """Get IDs of the projects every person is assigned to or created tasks in"""
+        result = [[] for _ in self.people]
+        if np is not None:
+            # Distinct (person, project) pairs as flattened cell numbers; sized by the
+            # task entries rather than a dense people x projects matrix
+            width = len(self.projects)
+            entry_projects = self.project[self.assignee_rows]
+            valid = entry_projects >= 0
+            cells = [self.assignees[valid].astype(np.int64) * width + entry_projects[valid]]
+            valid = (self.assigner >= 0) & (self.project >= 0)
+            cells.append(self.assigner[valid].astype(np.int64) * width + self.project[valid])
+            pairs = (divmod(cell, width) for cell in np.unique(np.concatenate(cells)).tolist())
+        else:
+            pairs = set()
+            for row, person in zip(self.assignee_rows, self.assignees):
+                if self.project[row] >= 0:
+                    pairs.add((person, self.project[row]))
+            for person, project in zip(self.assigner, self.project):
+                if person >= 0 and project >= 0:
+                    pairs.add((person, project))
+
+        for person, project in pairs:
+            result[person].append(str(self.projects[project]['id']))
+        return result
+
+    def group_by(self, key: str, mask=None, today: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Count tasks per status, project, assignee or assigner
+
+        Args:
+            key: One of GROUP_KEYS
+            mask: Optional row mask from mask()
+            today: Date overdue counts are computed for
+
+        Returns:
+            Groups with the key value and total, active, completed and overdue
+            counts, largest first; groups without tasks are skipped
+        """
+        if key not in GROUP_KEYS:
+            raise ValueError(f"Unknown group key: {key}")
+
+        if key == 'status':
+            codes, values = self.status, [{'status': label} for label in self.status_labels]
+        elif key == 'project':
+            codes, values = self.project, [{'project_id': p['id'], 'project': p['name']} for p in self.projects]
+        else:
+            values = [{f'{key}_id': p['id'], key: p['name']} for p in self.people]
+            codes = self.assignees if key == 'assignee' else self.assigner
+
+        def count(row_mask):
+            if row_mask is not None and key == 'assignee':
+                row_mask = self._spread(row_mask)
+            return self._bincount(codes, len(values), row_mask)
+
+        completed_mask = self.completed if mask is None else self._and(mask, self.completed)
+        overdue_mask = self.overdue_mask(today)
+        if mask is not None:
+            overdue_mask = self._and(mask, overdue_mask)
+
+        totals, completed, overdue = count(mask), count(completed_mask), count(overdue_mask)
+        groups = [
+            dict(value, total=totals[code], active=totals[code] - completed[code],
+                 completed=completed[code], overdue=overdue[code])
+            for code, value in enumerate(values) if totals[code]
+        ]
+        groups.sort(key=lambda group: group['total'], reverse=True)
+        return groups
@@ -33,4 +33,150 @@ TASKS_REQUEST = {
         'pageSize': 100,
         'fields': 'id,name,status,project,startDateTime,endDateTime,description,assignees,assigner'  # Заменено owner на assigner
     }
-}
\ No newline at end of file
+}
+
+# Запрос детальной информации по одной задаче
+TASK_DETAIL_REQUEST = {
+    'endpoint': 'task/{task_id}',
+    'method': 'GET',
+    'fields': TASKS_REQUEST['baseBody']['fields']
+}
+
+# Read-through кэш деталей задач (LRU + короткий TTL)
+TASK_DETAIL_CACHE = {
+    'max_entries': getattr(settings, 'PLANFIX_TASK_DETAIL_CACHE_SIZE', 512),
+    'ttl_seconds': getattr(settings, 'PLANFIX_TASK_DETAIL_TTL', 60),
+    # Сколько ждать ответа Planfix, прежде чем отдать данные из общего кэша
+    'fetch_timeout': getattr(settings, 'PLANFIX_TASK_DETAIL_TIMEOUT', 2.0),
+    'max_workers': 4
+}
+
+# Адаптивный ограничитель частоты запросов к API Planfix (token bucket + AIMD).
+# Ведро токенов общее для всех рабочих процессов: состояние хранится в файле кэша под блокировкой
+RATE_LIMIT = {
+    # Начальная и максимальная частота, запросов в секунду
+    'rate': getattr(settings, 'PLANFIX_RATE_LIMIT', 5.0),
+    'max_rate': getattr(settings, 'PLANFIX_RATE_LIMIT_MAX', 10.0),
+    'min_rate': 0.5,
+    'burst': 5.0,
+    # Прирост частоты после успешного запроса и множитель после ответа 429
+    'additive_increase': 0.5,
+    'decrease_factor': 0.5,
+    # Токены, которые фоновая синхронизация оставляет интерактивным запросам
+    'interactive_reserve': 1.0
+}
+
+# Повторы запросов, отклоненных с кодом 429
+RATE_LIMIT_MAX_RETRIES = getattr(settings, 'PLANFIX_RATE_LIMIT_RETRIES', 3)
+# Сколько интерактивный запрос может ждать своей очереди
+INTERACTIVE_ACQUIRE_TIMEOUT = 5.0
+
+# Таймауты запросов к API Planfix: (подключение, чтение), секунды
+REQUEST_TIMEOUT = (
+    getattr(settings, 'PLANFIX_CONNECT_TIMEOUT', 5),
+    getattr(settings, 'PLANFIX_READ_TIMEOUT', 30)
+)
+
+# Предохранитель: после серии сбоев запросы к Planfix сразу отклоняются,
+# пока пробный запрос не покажет, что сервис восстановился
+CIRCUIT_BREAKER = {
+    'failure_threshold': getattr(settings, 'PLANFIX_CIRCUIT_FAILURES', 5),
+    'reset_timeout': getattr(settings, 'PLANFIX_CIRCUIT_RESET_TIMEOUT', 60)
+}
+
+# Защита от публикации неполного снимка: синхронизация, вернувшая заметно
+# меньше задач, чем последний опубликованный снимок, отклоняется
+SNAPSHOT_SHRINK_GUARD = {
+    'max_shrink_ratio': getattr(settings, 'PLANFIX_MAX_SNAPSHOT_SHRINK', 0.3),
+    # Небольшие снимки не проверяем
+    'min_previous_tasks': 50
+}
+
+# Контрольные точки полной синхронизации: прерванная синхронизация
+# продолжается с последней загруженной страницы, если прошло не больше resume_window секунд
+SYNC_CHECKPOINT = {
+    'resume_window': getattr(settings, 'PLANFIX_SYNC_RESUME_WINDOW', 1800)
+}
+
+# Снимок данных главной страницы агента в кэше Django: пересобирается при
+# публикации нового снимка задач и при изменении пользователей или бесед;
+# изменения, сделанные в других процессах, видны не позже чем через timeout секунд
+DASHBOARD_SNAPSHOT = {
+    'timeout': getattr(settings, 'PLANFIX_DASHBOARD_SNAPSHOT_TIMEOUT', 60),
+    'conversations': 6
+}
+
+# Многоуровневая синхронизация: «горячий» уровень (незавершенные задачи)
+# загружается часто, «холодный» (полный список, включая завершенные и архивные) - редко.
+# Оба уровня сливаются в один снимок задач
+TIERED_SYNC = {
+    'hot_interval': getattr(settings, 'PLANFIX_HOT_SYNC_INTERVAL', 900),
+    'cold_interval': getattr(settings, 'PLANFIX_COLD_SYNC_INTERVAL', 3600 * 24),
+    # Фильтр task/list для горячего уровня: статус задачи не равен «Завершенная» (id 3)
+    'hot_filters': getattr(settings, 'PLANFIX_HOT_SYNC_FILTERS', [
+        {'type': 10, 'operator': 'notequal', 'value': [3]}
+    ]),
+    # Задачи, пропавшие из горячего уровня, запрашиваются по одной; если их больше,
+    # выполняется полная синхронизация
+    'max_departed': 200
+}
+
+# Адаптивное расписание обновления кэша: интервал подбирается по числу изменений
+# задач за прошлые обновления и по активности в этот час недели, в пределах min/max
+ADAPTIVE_REFRESH = {
+    'min_interval': getattr(settings, 'PLANFIX_REFRESH_MIN_INTERVAL', 300),
+    'max_interval': getattr(settings, 'PLANFIX_REFRESH_MAX_INTERVAL', 3600 * 3),
+    # Сколько изменений задач допустимо накопить между обновлениями
+    'target_changes': getattr(settings, 'PLANFIX_REFRESH_TARGET_CHANGES', 25),
+    # Вес нового наблюдения в скользящем среднем
+    'smoothing': 0.3,
+    # Интервал, пока для часа недели нет наблюдений: рабочее время (пн-пт) и остальное
+    'working_hours': (9, 19),
+    'working_interval': 900
+}
+
+# Обновление задач одного проекта по запросу (беседа с planfix_project_id, вопрос о проекте)
+PROJECT_REFRESH = {
+    # Не чаще одного обновления проекта за min_interval секунд
+    'min_interval': getattr(settings, 'PLANFIX_PROJECT_REFRESH_INTERVAL', 120),
+    # Фильтр task/list по проекту (тип фильтра Planfix «Проект»)
+    'filter_type': getattr(settings, 'PLANFIX_PROJECT_FILTER_TYPE', 5),
+    # Задачи проекта, пропавшие из выборки, запрашиваются по одной, но не больше max_departed
+    'max_departed': 50,
+    # Сколько ждать обновления, прежде чем ответить по текущему снимку
+    'wait_timeout': getattr(settings, 'PLANFIX_PROJECT_REFRESH_WAIT', 5.0),
+    'max_workers': 2
+}
+
+# Нечеткий поиск по названиям задач, проектов и именам сотрудников (триграммы)
+FUZZY_SEARCH = {
+    # Минимальное сходство (0..1) для результатов поиска
+    'threshold': getattr(settings, 'PLANFIX_FUZZY_THRESHOLD', 0.3),
+    # Минимальное сходство для упоминаний проектов и сотрудников в вопросе пользователя
+    'mention_threshold': getattr(settings, 'PLANFIX_FUZZY_MENTION_THRESHOLD', 0.45),
+    # Сколько элементов списков триграмм просматривается за один поиск
+    'candidate_budget': 5000,
+    # Во сколько раз больше кандидатов, чем нужно результатов, пересчитывается точно
+    'rescore_factor': 5
+}
+
+# Наборы полей задач для параметра fields= в API задач (вложенные поля через точку)
+TASK_FIELD_PRESETS = {
+    # Строки списков и таблиц: без описания и служебных полей статуса
+    'list': ['id', 'name', 'status.id', 'status.name', 'status.color', 'project', 'assigner', 'assignees',
+             'startDateTime', 'endDateTime'],
+    # Карточка задачи: все поля, запрашиваемые у Planfix
+    'detail': TASKS_REQUEST['baseBody']['fields'].split(',')
+}
+
+# Видимость задач для пользователей со своим API-токеном Planfix. Задачи синхронизируются
+# один раз на аккаунт общим токеном, а по токену пользователя загружаются только ID видимых задач
+TASK_VISIBILITY = {
+    # Возраст набора ID (секунды), после которого он обновляется в фоне
+    'ttl': getattr(settings, 'PLANFIX_VISIBILITY_TTL', 900),
+    # Сколько ждать первой загрузки набора, прежде чем ответить без задач
+    'wait_timeout': getattr(settings, 'PLANFIX_VISIBILITY_WAIT', 5.0),
+    # Сколько refresh_all ждет загрузок всех токенов; незавершенные считаются неудачными
+    'refresh_timeout': getattr(settings, 'PLANFIX_VISIBILITY_REFRESH_TIMEOUT', 300),
+    'max_workers': 2
+}
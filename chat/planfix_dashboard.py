@@ -0,0 +1,119 @@
+import logging
+from typing import Dict, Any
+
+from django.core.cache import cache
+
+from .planfix_cache_service import planfix_cache, STATS_CACHE
+from .planfix_config import DASHBOARD_SNAPSHOT
+from .planfix_workload import employee_workload
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_KEY_PREFIX = 'planfix_dashboard'
+DB_VERSION_KEY = 'planfix_dashboard:db_version'
+
+class DashboardSnapshotService:
+    """
+    Assembled payload of the agent dashboard stored in the Django cache.
+
+    The key combines the published task snapshot generation (the version
+    markers of the snapshot, stats and workload files, which change
+    whenever a generation or its derived caches are written) with a DB
+    version bumped by User and Conversation signals. Signals only reach the
+    local cache of the process that saved the row, so snapshots also expire
+    after DASHBOARD_SNAPSHOT['timeout'] seconds: that is the window in which
+    DB changes made elsewhere may not be visible yet.
+    """
+
+    def __init__(self, timeout: int = DASHBOARD_SNAPSHOT['timeout']):
+        """Initialize the service"""
+        self.timeout = timeout
+
+    def _get_generation_key(self) -> str:
+        """Get a marker of the published task snapshot and its derived caches"""
+        markers = [planfix_cache._get_snapshot_version()]
+        for cache_file in (STATS_CACHE, employee_workload.cache_file):
+            try:
+                stat = cache_file.stat()
+                markers.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                markers.append(None)
+        return '-'.join('x' if marker is None else f"{marker[0]}.{marker[1]}" for marker in markers)
+
+    def _get_db_version(self) -> int:
+        """Get the DB version, starting a new one if the cache lost it"""
+        version = cache.get(DB_VERSION_KEY)
+        if version is None:
+            version = 1
+            cache.add(DB_VERSION_KEY, version, None)
+        return version
+
+    def invalidate(self):
+        """Invalidate snapshots after a DB change"""
+        try:
+            cache.incr(DB_VERSION_KEY)
+        except ValueError:
+            cache.set(DB_VERSION_KEY, 1, None)
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """Get the dashboard payload, assembling it on a cache miss"""
+        key = f"{SNAPSHOT_KEY_PREFIX}:{self._get_generation_key()}:{self._get_db_version()}"
+        snapshot = cache.get(key)
+        if snapshot is None:
+            snapshot = self._build()
+            cache.set(key, snapshot, self.timeout)
+        return snapshot
+
+    def _build(self) -> Dict[str, Any]:
+        """Assemble the dashboard payload"""
+        from .models import Conversation, User
+
+        user, _ = User.objects.get_or_create(username='anonymous')
+        conversations = [
+            {'id': conversation.id, 'title': conversation.title, 'updated_at': conversation.updated_at}
+            for conversation in Conversation.objects.filter(user=user).order_by('-updated_at')[:DASHBOARD_SNAPSHOT['conversations']]
+        ]
+
+        employees = []
+        try:
+            for employee in employee_workload.get_all().values():
+                if str(employee['id']).startswith('user:'):
+                    employees.append({
+                        'id': employee['id'],
+                        'name': employee['name'],
+                        'email': employee['email'],
+                        'role': 'Сотрудник',
+                        'active_tasks': employee['active_count'],
+                        'completed_tasks': employee['completed_count'],
+                        'overdue_tasks': employee['overdue_count'],
+                        'total_tasks': employee['total_count'],
+                        'created_tasks': employee['created_tasks'],
+                        'projects': employee['project_count']
+                    })
+        except Exception as e:
+            logger.error(f"Error reading employee workload: {e}")
+            employees = []
+
+        users = [
+            {
+                'name': user.username,
+                'email': user.email,
+                'role': user.get_role_display(),
+                'date_joined': user.date_joined,
+                'last_active': user.last_active,
+                'is_admin': user.is_admin,
+                'is_staff': user.is_staff
+            }
+            for user in User.objects.filter(is_active=True).order_by('-date_joined')
+        ]
+
+        return {
+            'conversations': conversations,
+            'stats': planfix_cache.get_stats(),
+            'employees': employees,
+            'users': users
+        }
+
+# Singleton instance
+dashboard_snapshot = DashboardSnapshotService()
@@ -0,0 +1,122 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Union
+
+from .planfix_api import get_task_detail
+from .planfix_config import TASK_DETAIL_CACHE
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class TaskDetailCache:
+    """
+    Read-through cache of single task details fetched from Planfix.
+
+    Entries live for a short TTL and are evicted in LRU order. Concurrent
+    lookups of the same task share one in-flight request, and callers that
+    wait longer than fetch_timeout get the fallback (usually the task from
+    the bulk snapshot) while the request finishes in the background.
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 60,
+                 fetch_timeout: float = 2.0, max_workers: int = 4):
+        """Initialize the cache"""
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fetch_timeout = fetch_timeout
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._inflight: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='planfix-detail')
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+
+    def get(self, task_id: Union[str, int], fallback: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get fresh task details, fetching from Planfix when the entry is missing or expired
+
+        Args:
+            task_id: Planfix task ID
+            fallback: Task to return if Planfix is slow or fails (e.g. the snapshot copy)
+
+        Returns:
+            Task details, a stale cached copy, the fallback, or None
+        """
+        key = str(task_id)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._fetch, key)
+                self._inflight[key] = future
+
+        try:
+            task = future.result(timeout=self.fetch_timeout)
+            if task:
+                return task
+        except FutureTimeoutError:
+            logger.warning(f"Planfix detail request for task {key} is slow, serving cached copy")
+        except Exception as e:
+            logger.error(f"Error fetching task {key} details: {e}")
+
+        with self._lock:
+            self.fallbacks += 1
+            # A stale detail entry is still fresher than the bulk snapshot
+            entry = self._entries.get(key)
+
+        return entry[1] if entry else fallback
+
+    def _fetch(self, key: str) -> Optional[Dict[str, Any]]:
+        """Fetch task details from Planfix and store them"""
+        task = None
+        try:
+            task = get_task_detail(key) or None
+        finally:
+            with self._lock:
+                if task:
+                    self._store(key, task)
+                self._inflight.pop(key, None)
+        return task
+
+    def _store(self, key: str, task: Dict[str, Any]):
+        """Store an entry and evict least recently used ones (lock must be held)"""
+        self._entries[key] = (time.monotonic(), task)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, task_id: Union[str, int]):
+        """Drop a cached entry so the next lookup goes to Planfix"""
+        with self._lock:
+            self._entries.pop(str(task_id), None)
+
+    def clear(self):
+        """Drop all cached entries"""
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'in_flight': len(self._inflight),
+                'hits': self.hits,
+                'misses': self.misses,
+                'fallbacks': self.fallbacks
+            }
+
+# Singleton instance
+task_detail_cache = TaskDetailCache(**TASK_DETAIL_CACHE)
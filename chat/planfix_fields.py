@@ -0,0 +1,84 @@
+from typing import Dict, List, Any, Optional
+
+from .planfix_config import TASK_FIELD_PRESETS
+
+# Top-level task fields that can be requested
+TASK_FIELDS = tuple(TASK_FIELD_PRESETS['detail'])
+
+def parse_fields(value: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Parse a fields= parameter into a projection tree
+
+    The value is a comma-separated list of preset names (TASK_FIELD_PRESETS)
+    and field paths, nested fields separated by dots ("status.name").
+    In the tree, None selects a whole value and a dict selects some of its keys.
+
+    Returns:
+        Projection tree, or None when every field is requested
+
+    Raises:
+        ValueError: For an unknown top-level field
+    """
+    if not value:
+        return None
+
+    tree: Dict[str, Any] = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        for path in TASK_FIELD_PRESETS.get(item, [item]):
+            parts = path.split('.')
+            if parts[0] not in TASK_FIELDS:
+                raise ValueError(f"Unknown task field: {parts[0]}")
+            _add_path(tree, parts)
+
+    return tree or None
+
+def _add_path(tree: Dict[str, Any], parts: List[str]):
+    """Add one field path to a projection tree"""
+    node = tree
+    for part in parts[:-1]:
+        if part in node and node[part] is None:
+            return  # The whole value is already selected
+        node = node.setdefault(part, {})
+    node[parts[-1]] = None
+
+def project(value: Any, tree: Optional[Dict[str, Any]]) -> Any:
+    """Keep only the selected keys of a value; lists are projected item by item"""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+def project_tasks(tasks: List[Dict[str, Any]], tree: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Project a list of tasks, returning it as is when every field is requested
+
+    Statuses, projects and people are shared between the tasks of a snapshot,
+    so each of them is projected once and the result shared as well.
+    """
+    if tree is None:
+        return tasks
+
+    fields = list(tree.items())
+    shared: Dict[tuple, Any] = {}
+    result = []
+    for task in tasks:
+        projected = {}
+        for key, subtree in fields:
+            if key not in task:
+                continue
+            value = task[key]
+            if subtree is not None and isinstance(value, (dict, list)):
+                # The tasks keep their values alive, so the ids stay unique during the call
+                shared_key = (id(value), key)
+                if shared_key not in shared:
+                    shared[shared_key] = project(value, subtree)
+                value = shared[shared_key]
+            projected[key] = value
+        result.append(projected)
+    return result
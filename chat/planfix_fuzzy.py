@@ -0,0 +1,238 @@
+import heapq
+import logging
+import re
+import threading
+from array import array
+from typing import Dict, List, Any, Optional, Iterable, Set
+
+from .planfix_cache_service import planfix_cache
+from .planfix_config import FUZZY_SEARCH
+
+try:
+    import numpy as np
+except ImportError:  # Shared trigrams are counted in a plain Python loop
+    np = None
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Searchable entity kinds
+KINDS = ('tasks', 'projects', 'users')
+
+# Names are compared in Latin script, so "Девент" and "Devent" share trigrams
+CYRILLIC_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh',
+    'з': 'z', 'и': 'i', 'й': 'i', 'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o',
+    'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'ts',
+    'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu',
+    'я': 'ya'
+}
+_TRANSLITERATION = str.maketrans(CYRILLIC_TO_LATIN)
+_SEPARATORS = re.compile(r'[\W_]+')
+
+def normalize(text: str) -> str:
+    """Lowercase, transliterate and collapse separators"""
+    return _SEPARATORS.sub(' ', text.lower().translate(_TRANSLITERATION)).strip()
+
+def trigrams(text: str) -> Set[str]:
+    """Get the trigrams of every word of a text, words padded like in pg_trgm"""
+    result = set()
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+def similarity(query: Set[str], name: Set[str], partial: bool = False) -> float:
+    """
+    Share of common trigrams (Jaccard)
+
+    With partial, the Jaccard score is averaged with the share of the query
+    trigrams found in the name, so a word of a long task name still scores well.
+    """
+    if not query or not name:
+        return 0.0
+    shared = len(query & name)
+    score = shared / (len(query) + len(name) - shared)
+    return (score + shared / len(query)) / 2 if partial else score
+
+class TrigramIndex:
+    """
+    Trigram posting lists over a list of names.
+
+    Lookups count shared trigrams over the posting lists of the query's
+    rarest trigrams, up to a budget of posting entries, and rescore the
+    best candidates with their exact similarity. Very common trigrams
+    therefore never cost a scan of most of the names.
+    """
+
+    def __init__(self, names: List[str]):
+        """Build the index"""
+        self.names = names
+        self.postings: Dict[str, array] = {}
+        for position, name in enumerate(names):
+            for trigram in trigrams(name or ''):
+                posting = self.postings.get(trigram)
+                if posting is None:
+                    posting = self.postings[trigram] = array('i')
+                posting.append(position)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def search(self, query: str, limit: int = 10, threshold: float = FUZZY_SEARCH['threshold'],
+               partial: bool = True, budget: int = FUZZY_SEARCH['candidate_budget']) -> List[tuple]:
+        """
+        Find the names most similar to a query
+
+        Args:
+            partial: Score a query that is only part of a name (see similarity)
+
+        Returns:
+            (position, score) pairs, best first
+        """
+        query_trigrams = trigrams(query)
+        postings = sorted(
+            (self.postings[trigram] for trigram in query_trigrams if trigram in self.postings), key=len
+        )
+
+        used = []
+        scanned = 0
+        for posting in postings:
+            if used and scanned + len(posting) > budget:
+                break
+            scanned += len(posting)
+            used.append(posting)
+
+        candidate_count = limit * FUZZY_SEARCH['rescore_factor']
+        if not used:
+            candidates = []
+        elif np is not None:
+            positions, counts = np.unique(
+                np.concatenate([np.frombuffer(posting, dtype=np.intc) for posting in used]), return_counts=True
+            )
+            best = np.argsort(-counts, kind='stable')[:candidate_count]
+            candidates = positions[best].tolist()
+        else:
+            counts: Dict[int, int] = {}
+            for posting in used:
+                for position in posting:
+                    counts[position] = counts.get(position, 0) + 1
+            candidates = heapq.nlargest(candidate_count, counts, key=counts.get)
+
+        scored = []
+        for position in candidates:
+            score = similarity(query_trigrams, trigrams(self.names[position] or ''), partial)
+            if score >= threshold:
+                scored.append((position, score))
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:limit]
+
+class FuzzyNameSearch:
+    """
+    Typo- and script-tolerant search over task, project and user names.
+
+    One trigram index per kind is built for each snapshot version (at
+    refresh time in the refreshing process, on first use elsewhere).
+    Projects and users come from the columnar task view, so their IDs and
+    names match the derived caches.
+    """
+
+    def __init__(self, cache=planfix_cache):
+        """Initialize the search"""
+        self.cache = cache
+        self._columns = None
+        self._indexes: Dict[str, TrigramIndex] = {}
+        self._lock = threading.Lock()
+
+    def _get_index(self, kind: str):
+        """Get the trigram index and the entities of a kind for the current snapshot"""
+        columns = self.cache.get_task_columns()
+        with self._lock:
+            if self._columns is not columns:
+                self._columns = columns
+                self._indexes = {}
+            if kind not in self._indexes:
+                entities = self._get_entities(columns, kind)
+                self._indexes[kind] = TrigramIndex([entity.get('name') or '' for entity in entities])
+                logger.debug(f"Built {kind} trigram index with {len(entities)} names")
+            return self._indexes[kind], self._get_entities(columns, kind)
+
+    def _get_entities(self, columns, kind: str) -> List[Dict[str, Any]]:
+        """Get the entities of a kind in index order"""
+        if kind == 'tasks':
+            return columns.tasks
+        if kind == 'projects':
+            return columns.projects
+        return columns.people
+
+    def warm(self):
+        """Build the indexes of every kind for the current snapshot"""
+        for kind in KINDS:
+            self._get_index(kind)
+
+    def search(self, query: str, kinds: Optional[Iterable[str]] = None, limit: int = 10,
+               threshold: float = FUZZY_SEARCH['threshold']) -> List[Dict[str, Any]]:
+        """
+        Find tasks, projects and users by approximate name
+
+        Args:
+            query: Name or part of it, in any script and with typos
+            kinds: Kinds to search (KINDS by default)
+            limit: Results per kind
+            threshold: Minimal similarity between 0 and 1
+
+        Returns:
+            Matches with kind, id, name and score, best first
+        """
+        results = []
+        for kind in kinds or KINDS:
+            if kind not in KINDS:
+                raise ValueError(f"Unknown search kind: {kind}")
+            index, entities = self._get_index(kind)
+            for position, score in index.search(query, limit, threshold):
+                entity = entities[position]
+                results.append({'kind': kind, 'id': entity.get('id'), 'name': entity.get('name'),
+                                'score': round(score, 3)})
+
+        results.sort(key=lambda result: result['score'], reverse=True)
+        return results
+
+    def find_ids(self, query: str, kind: str, limit: int = 50,
+                 threshold: float = FUZZY_SEARCH['threshold']) -> List[str]:
+        """Get IDs of the entities of a kind whose names approximately match a query"""
+        return [str(result['id']) for result in self.search(query, [kind], limit, threshold)]
+
+    def find_mentions(self, text: str, kind: str, limit: int = 5,
+                      threshold: float = FUZZY_SEARCH['mention_threshold'],
+                      skip_prefixes: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        """
+        Find projects or users whose names are mentioned in a free-form text, allowing typos
+
+        Every run of up to three consecutive words of the text is matched
+        against the names; each entity keeps its best score.
+
+        Args:
+            skip_prefixes: Words starting with these are left out, e.g. "проект"
+                so that it does not match every project called "Проект N"
+        """
+        index, entities = self._get_index(kind)
+        skip_prefixes = tuple(normalize(prefix) for prefix in skip_prefixes)
+        words = [word for word in normalize(text).split() if not (skip_prefixes and word.startswith(skip_prefixes))]
+
+        best: Dict[int, float] = {}
+        for size in range(1, 4):
+            for start in range(len(words) - size + 1):
+                window = ' '.join(words[start:start + size])
+                for position, score in index.search(window, limit, threshold, partial=False):
+                    if score > best.get(position, 0):
+                        best[position] = score
+
+        matches = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {'kind': kind, 'id': entities[position].get('id'), 'name': entities[position].get('name'),
+             'score': round(score, 3)}
+            for position, score in matches
+        ]
+
+# Singleton instance
+fuzzy_search = FuzzyNameSearch()
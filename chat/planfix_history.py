@@ -0,0 +1,513 @@
+import gzip
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Optional
+
+from .planfix_cache_service import planfix_cache, CACHE_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# History store layout
+HISTORY_DIR = CACHE_DIR / 'history'
+HISTORY_MANIFEST = HISTORY_DIR / 'manifest.json'
+HISTORY_METRICS = HISTORY_DIR / 'metrics.json'
+
+# A full keyframe is written after this many deltas
+KEYFRAME_INTERVAL = 48
+
+# Compaction defaults
+MERGE_AFTER_DAYS = 7       # Deltas older than this are merged into one delta per day
+KEYFRAME_DAYS = 7          # Keyframes older than MERGE_AFTER_DAYS are thinned to one per this many days
+RETENTION_DAYS = 365       # Segments older than this are dropped (metrics are kept)
+
+# Longest trend window, in days
+MAX_TREND_DAYS = 365
+
+class TaskHistoryStore:
+    """
+    Compact history of tasks snapshots.
+
+    Every published generation is stored as a gzip-compressed delta against
+    the previous one (changed top-level fields only), with a full keyframe
+    every KEYFRAME_INTERVAL deltas; compact() later thins old keyframes to one
+    per KEYFRAME_DAYS days and merges old deltas to one per day. Daily open/overdue/completed metrics per
+    project and assignee are rolled up at record time, so trend queries only
+    read metrics.json and never rehydrate snapshots.
+
+    Writers must hold snapshot_write_lock().
+    """
+
+    def __init__(self, history_dir=HISTORY_DIR, keyframe_interval: int = KEYFRAME_INTERVAL):
+        """Initialize the history store"""
+        self.history_dir = history_dir
+        self.manifest_file = history_dir / HISTORY_MANIFEST.name
+        self.metrics_file = history_dir / HISTORY_METRICS.name
+        self.keyframe_interval = keyframe_interval
+
+    # Storage helpers
+
+    def _read_json(self, path, default):
+        """Read a JSON file, returning default if missing or broken"""
+        if not path.exists():
+            return default
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading history file {path.name}: {e}")
+            return default
+
+    def _write_json(self, path, data):
+        """Atomically write a JSON file"""
+        tmp_file = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, path)
+
+    def _read_segment(self, name: str) -> Dict[str, Any]:
+        """Read a compressed segment"""
+        with gzip.open(self.history_dir / name, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_segment(self, name: str, data: Dict[str, Any]):
+        """Write a compressed segment"""
+        tmp_file = self.history_dir / f"{name}.{os.getpid()}.tmp"
+        with gzip.open(tmp_file, 'wt', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(tmp_file, self.history_dir / name)
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        """Load the list of segments, oldest first"""
+        return self._read_json(self.manifest_file, {'segments': []})
+
+    # Recording
+
+    def record(self, generation: int, old_tasks: List[Dict[str, Any]], new_tasks: List[Dict[str, Any]],
+               timestamp: Optional[float] = None):
+        """
+        Record a published generation
+
+        Args:
+            generation: Generation number from the change log
+            old_tasks: Previous snapshot
+            new_tasks: Published snapshot
+            timestamp: Publish time (defaults to now)
+        """
+        timestamp = timestamp or time.time()
+        self.history_dir.mkdir(parents=True, exist_ok=True)
+
+        manifest = self._load_manifest()
+        segments = manifest['segments']
+        last = segments[-1] if segments else None
+        deltas_since_keyframe = 0
+        for segment in reversed(segments):
+            if segment['kind'] == 'keyframe':
+                break
+            deltas_since_keyframe += 1
+
+        new_by_id = {str(task.get('id')): task for task in new_tasks}
+        old_by_id = {str(task.get('id')): task for task in old_tasks}
+
+        # A gap in generations means the previous snapshot is not what we stored
+        needs_keyframe = (
+            last is None
+            or last['generation'] != generation - 1
+            or deltas_since_keyframe >= self.keyframe_interval
+        )
+
+        if needs_keyframe:
+            kind = 'keyframe'
+            name = f"{generation:08d}.key.json.gz"
+            self._write_segment(name, {
+                'generation': generation,
+                'timestamp': timestamp,
+                'tasks': new_by_id
+            })
+        else:
+            kind = 'delta'
+            name = f"{generation:08d}.delta.json.gz"
+            delta = self._diff(old_by_id, new_by_id)
+            delta.update({'generation': generation, 'timestamp': timestamp})
+            self._write_segment(name, delta)
+
+        segments.append({'generation': generation, 'timestamp': timestamp, 'kind': kind, 'file': name})
+        self._write_json(self.manifest_file, manifest)
+
+        # Transitions are only meaningful against a snapshot we actually know
+        self._update_metrics(old_by_id if last else {}, new_by_id, timestamp, count_transitions=bool(last))
+
+    def _diff(self, old_by_id: Dict[str, Any], new_by_id: Dict[str, Any]) -> Dict[str, Any]:
+        """Compute a field-level delta between two snapshots"""
+        delta = {'new': [], 'removed': [], 'set': {}, 'unset': {}}
+
+        for task_id, task in new_by_id.items():
+            old = old_by_id.get(task_id)
+            if old is None:
+                delta['new'].append(task_id)
+                delta['set'][task_id] = task
+                continue
+            if old == task:
+                continue
+
+            changed = {key: value for key, value in task.items() if old.get(key, object()) != value}
+            if changed:
+                delta['set'][task_id] = changed
+            missing = [key for key in old if key not in task]
+            if missing:
+                delta['unset'][task_id] = missing
+
+        delta['removed'] = [task_id for task_id in old_by_id if task_id not in new_by_id]
+        return delta
+
+    @staticmethod
+    def _apply_delta(state: Dict[str, Any], delta: Dict[str, Any]):
+        """Apply a delta to a {task_id: task} state in place"""
+        for task_id in delta['removed']:
+            state.pop(task_id, None)
+        for task_id in delta['new']:
+            state[task_id] = {}
+        for task_id, fields in delta['set'].items():
+            state.setdefault(task_id, {}).update(fields)
+        for task_id, fields in delta['unset'].items():
+            task = state.get(task_id)
+            if task is not None:
+                for key in fields:
+                    task.pop(key, None)
+
+    @staticmethod
+    def _merge_deltas(first: Dict[str, Any], second: Dict[str, Any]) -> Dict[str, Any]:
+        """Fold two consecutive deltas into one equivalent delta"""
+        new = set(first['new'])
+        removed = set(first['removed'])
+        set_fields = {task_id: dict(fields) for task_id, fields in first['set'].items()}
+        unset_fields = {task_id: set(fields) for task_id, fields in first['unset'].items()}
+
+        for task_id in second['removed']:
+            set_fields.pop(task_id, None)
+            unset_fields.pop(task_id, None)
+            if task_id in new:
+                new.discard(task_id)  # Created and deleted within the merged range
+            else:
+                removed.add(task_id)
+
+        for task_id in second['new']:
+            # A (re)created task replaces whatever the first delta left
+            new.add(task_id)
+            set_fields[task_id] = {}
+            unset_fields.pop(task_id, None)
+
+        for task_id, fields in second['set'].items():
+            set_fields.setdefault(task_id, {}).update(fields)
+            if task_id in unset_fields:
+                unset_fields[task_id] -= set(fields)
+        for task_id, fields in second['unset'].items():
+            for key in fields:
+                set_fields.get(task_id, {}).pop(key, None)
+            if task_id not in new:
+                unset_fields.setdefault(task_id, set()).update(fields)
+
+        return {
+            'generation': second['generation'],
+            'timestamp': second['timestamp'],
+            'new': sorted(new),
+            'removed': sorted(removed - new),
+            'set': set_fields,
+            'unset': {task_id: sorted(fields) for task_id, fields in unset_fields.items() if fields}
+        }
+
+    # Metrics
+
+    def _task_facts(self, task: Dict[str, Any], today: str) -> Dict[str, Any]:
+        """Extract the fields that metrics are grouped by"""
+        project_id = None
+        if task.get('project') and task['project'].get('id'):
+            project_id = str(task['project']['id'])
+
+        return {
+            'completed': planfix_cache._is_task_completed(task),
+            'overdue': planfix_cache._is_task_overdue(task, today),
+            'project': project_id,
+            'assignees': [
+                str(assignee['id']) for assignee in planfix_cache._get_task_assignees(task)
+                if assignee.get('id')
+            ]
+        }
+
+    def _update_metrics(self, old_by_id: Dict[str, Any], new_by_id: Dict[str, Any], timestamp: float,
+                        count_transitions: bool = True):
+        """Roll the published snapshot up into per-day metrics"""
+        metrics = self._read_json(self.metrics_file, {'days': {}, 'names': {'projects': {}, 'assignees': {}}})
+        day = datetime.fromtimestamp(timestamp).date().isoformat()
+        names = metrics['names']
+
+        empty = lambda: {'open': 0, 'overdue': 0, 'completed': 0, 'created': 0}
+        previous = metrics['days'].get(day, {})
+        bucket = {'total': empty(), 'projects': {}, 'assignees': {}}
+
+        # Flow counters accumulate over the day, stock counters are overwritten
+        for group in ('total',):
+            for key in ('completed', 'created'):
+                bucket[group][key] = previous.get(group, {}).get(key, 0)
+        for group in ('projects', 'assignees'):
+            for group_key, values in previous.get(group, {}).items():
+                bucket[group][group_key] = empty()
+                bucket[group][group_key]['completed'] = values.get('completed', 0)
+                bucket[group][group_key]['created'] = values.get('created', 0)
+
+        def targets(facts):
+            result = [bucket['total']]
+            if facts['project']:
+                result.append(bucket['projects'].setdefault(facts['project'], empty()))
+            for assignee_id in facts['assignees']:
+                result.append(bucket['assignees'].setdefault(assignee_id, empty()))
+            return result
+
+        for task_id, task in new_by_id.items():
+            facts = self._task_facts(task, day)
+
+            if facts['project']:
+                names['projects'][facts['project']] = task['project'].get('name') or names['projects'].get(facts['project'])
+            for assignee in planfix_cache._get_task_assignees(task):
+                if assignee.get('id') and assignee.get('name'):
+                    names['assignees'][str(assignee['id'])] = assignee['name']
+
+            for target in targets(facts):
+                if not facts['completed']:
+                    target['open'] += 1
+                    if facts['overdue']:
+                        target['overdue'] += 1
+
+            if not count_transitions:
+                continue
+
+            old = old_by_id.get(task_id)
+            if old is None:
+                for target in targets(facts):
+                    target['created'] += 1
+            elif facts['completed'] and not planfix_cache._is_task_completed(old):
+                for target in targets(facts):
+                    target['completed'] += 1
+
+        metrics['days'][day] = bucket
+        self._write_json(self.metrics_file, metrics)
+
+    def get_trends(self, days: int = 30, group_by: Optional[str] = None,
+                   key: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Get daily open/overdue/completed/created series
+
+        Args:
+            days: Number of days back from today, clamped to 1..MAX_TREND_DAYS
+            group_by: None for account totals, 'project' or 'assignee'
+            key: Project or assignee ID; without it every group is returned
+
+        Returns:
+            Dict with 'days' labels and 'series' per group
+        """
+        days = max(1, min(days, MAX_TREND_DAYS))
+        metrics = self._read_json(self.metrics_file, {'days': {}, 'names': {'projects': {}, 'assignees': {}}})
+        today = datetime.now().date()
+        labels = [(today - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)]
+        recorded_days = sorted(metrics['days'])
+
+        if group_by is None:
+            group_keys = ['total']
+        else:
+            group_name = 'projects' if group_by == 'project' else 'assignees'
+            if key is not None:
+                group_keys = [str(key)]
+            else:
+                group_keys = sorted({
+                    group_key
+                    for day in recorded_days if day >= labels[0]
+                    for group_key in metrics['days'][day].get(group_name, {})
+                })
+
+        series = {}
+        for group_key in group_keys:
+            values = {'open': [], 'overdue': [], 'completed': [], 'created': []}
+            last_stock = None
+
+            # Stock counters carry forward from the last recorded day before the window
+            for day in recorded_days:
+                if day >= labels[0]:
+                    break
+                last_stock = self._get_bucket(metrics['days'][day], group_by, group_key)
+
+            for label in labels:
+                bucket = None
+                if label in metrics['days']:
+                    bucket = self._get_bucket(metrics['days'][label], group_by, group_key)
+                if bucket is not None:
+                    last_stock = bucket
+                values['open'].append(last_stock['open'] if last_stock else None)
+                values['overdue'].append(last_stock['overdue'] if last_stock else None)
+                values['completed'].append(bucket['completed'] if bucket else 0)
+                values['created'].append(bucket['created'] if bucket else 0)
+
+            if group_by is None:
+                name = 'Все задачи'
+            else:
+                name = metrics['names']['projects' if group_by == 'project' else 'assignees'].get(group_key, group_key)
+            series[group_key] = {'name': name, **values}
+
+        return {'days': labels, 'group_by': group_by or 'total', 'series': series}
+
+    @staticmethod
+    def _get_bucket(day_metrics: Dict[str, Any], group_by: Optional[str], group_key: str) -> Optional[Dict[str, int]]:
+        """Get the metrics bucket of one group on one day"""
+        if group_by is None:
+            return day_metrics.get('total')
+        group_name = 'projects' if group_by == 'project' else 'assignees'
+        # A group missing on a recorded day had no tasks that day
+        return day_metrics.get(group_name, {}).get(group_key, {'open': 0, 'overdue': 0, 'completed': 0, 'created': 0})
+
+    # Reconstruction and compaction
+
+    def get_snapshot_at(self, timestamp: float) -> Optional[List[Dict[str, Any]]]:
+        """Reconstruct the snapshot that was published at or before a point in time"""
+        segments = [s for s in self._load_manifest()['segments'] if s['timestamp'] <= timestamp]
+        if not segments:
+            return None
+
+        start = max(i for i, segment in enumerate(segments) if segment['kind'] == 'keyframe')
+        state = self._read_segment(segments[start]['file'])['tasks']
+        for segment in segments[start + 1:]:
+            self._apply_delta(state, self._read_segment(segment['file']))
+
+        return list(state.values())
+
+    def compact(self, merge_after_days: int = MERGE_AFTER_DAYS, retention_days: int = RETENTION_DAYS,
+                keyframe_days: int = KEYFRAME_DAYS) -> Dict[str, int]:
+        """
+        Thin old keyframes, merge old deltas into one delta per day and drop segments past retention
+
+        Segments older than merge_after_days keep one keyframe per keyframe_days
+        days; the other keyframes are rewritten as deltas against the snapshot
+        rebuilt from the kept one, and then merged like any other delta.
+
+        Returns:
+            Counts of rebased keyframes, merged and dropped segments
+        """
+        manifest = self._load_manifest()
+        segments = manifest['segments']
+        now = time.time()
+        merge_before = now - merge_after_days * 86400
+        drop_before = now - retention_days * 86400
+        result = {'rebased': 0, 'merged': 0, 'dropped': 0}
+
+        # Drop everything before the newest keyframe that is past retention
+        old_keyframes = [
+            i for i, segment in enumerate(segments)
+            if segment['kind'] == 'keyframe' and segment['timestamp'] < drop_before
+        ]
+        if old_keyframes and old_keyframes[-1] > 0:
+            for segment in segments[:old_keyframes[-1]]:
+                self._remove_segment(segment['file'])
+                result['dropped'] += 1
+            segments = segments[old_keyframes[-1]:]
+
+        result['rebased'] = self._thin_keyframes(segments, merge_before, keyframe_days)
+
+        # Merge runs of same-day deltas (never across keyframes)
+        compacted = []
+        for segment in segments:
+            previous = compacted[-1] if compacted else None
+            same_day = previous is not None and (
+                datetime.fromtimestamp(previous['timestamp']).date()
+                == datetime.fromtimestamp(segment['timestamp']).date()
+            )
+            if (segment['kind'] == 'delta' and previous is not None and previous['kind'] == 'delta'
+                    and same_day and segment['timestamp'] < merge_before):
+                merged = self._merge_deltas(self._read_segment(previous['file']), self._read_segment(segment['file']))
+                self._write_segment(segment['file'], merged)
+                self._remove_segment(previous['file'])
+                compacted[-1] = segment
+                result['merged'] += 1
+            else:
+                compacted.append(segment)
+
+        manifest['segments'] = compacted
+        self._write_json(self.manifest_file, manifest)
+        logger.info(f"Compacted task history: {result}")
+        return result
+
+    def _thin_keyframes(self, segments: List[Dict[str, Any]], before: float, keyframe_days: int) -> int:
+        """
+        Rewrite all but the first keyframe of every keyframe_days period before a time as deltas
+
+        Segments are updated in place; only periods holding more than one
+        keyframe are read.
+
+        Returns:
+            Number of rebased keyframes
+        """
+        def period(segment):
+            return datetime.fromtimestamp(segment['timestamp']).date().toordinal() // max(1, keyframe_days)
+
+        keyframes_per_period: Dict[int, int] = {}
+        for segment in segments:
+            if segment['kind'] == 'keyframe' and segment['timestamp'] < before:
+                keyframes_per_period[period(segment)] = keyframes_per_period.get(period(segment), 0) + 1
+
+        rebased = 0
+        state = None
+        state_period = None
+        for i, segment in enumerate(segments):
+            if segment['timestamp'] >= before:
+                break
+            segment_period = period(segment)
+            if keyframes_per_period.get(segment_period, 0) < 2:
+                state = None
+                continue
+
+            if segment['kind'] == 'delta':
+                if state is not None and state_period == segment_period:
+                    self._apply_delta(state, self._read_segment(segment['file']))
+                continue
+
+            tasks = self._read_segment(segment['file'])['tasks']
+            if state is None or state_period != segment_period:
+                # The period's first keyframe is kept
+                state, state_period = tasks, segment_period
+                continue
+
+            delta = self._diff(state, tasks)
+            delta.update({'generation': segment['generation'], 'timestamp': segment['timestamp']})
+            name = f"{segment['generation']:08d}.delta.json.gz"
+            self._write_segment(name, delta)
+            self._remove_segment(segment['file'])
+            segments[i] = dict(segment, kind='delta', file=name)
+            state = tasks
+            rebased += 1
+
+        return rebased
+
+    def _remove_segment(self, name: str):
+        """Delete a segment file"""
+        try:
+            os.remove(self.history_dir / name)
+        except OSError:
+            pass
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get history store size information"""
+        segments = self._load_manifest()['segments']
+        size = sum(
+            (self.history_dir / segment['file']).stat().st_size
+            for segment in segments if (self.history_dir / segment['file']).exists()
+        )
+        return {
+            'segments': len(segments),
+            'keyframes': sum(1 for segment in segments if segment['kind'] == 'keyframe'),
+            'bytes': size,
+            'oldest': segments[0]['timestamp'] if segments else None,
+            'newest': segments[-1]['timestamp'] if segments else None
+        }
+
+# Singleton instance
+task_history = TaskHistoryStore()
@@ -0,0 +1,43 @@
+import logging
+from typing import Dict, List, Any, Optional, Union, Iterable
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+class TaskIndex:
+    """
+    In-memory lookup structures over one version of the tasks snapshot.
+
+    The index is built once per snapshot version and then shared by every
+    reader in the process, so lookups no longer re-parse tasks_cache.json.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]], version: Any = None):
+        """Build the index for a list of tasks"""
+        self.version = version
+        self.tasks = tasks
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        # Columnar view, built on first use by PlanfixCacheService.get_task_columns
+        self.columns = None
+
+        for task in tasks:
+            if task.get('id') is not None:
+                self.by_id[str(task['id'])] = task
+
+        logger.debug(f"Built task index with {len(self.by_id)} tasks")
+
+    def __len__(self) -> int:
+        return len(self.tasks)
+
+    def get(self, task_id: Union[str, int]) -> Optional[Dict[str, Any]]:
+        """Get a task by ID"""
+        return self.by_id.get(str(task_id))
+
+    def get_many(self, task_ids: Iterable[Union[str, int]]) -> List[Dict[str, Any]]:
+        """Get tasks by ID, skipping unknown IDs and keeping the requested order"""
+        result = []
+        for task_id in task_ids:
+            task = self.by_id.get(str(task_id))
+            if task is not None:
+                result.append(task)
+        return result
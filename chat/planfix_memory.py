@@ -0,0 +1,259 @@
+import gc
+import logging
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Any, Callable, Optional
+
+from .planfix_cache_service import planfix_cache
+from .planfix_index import TaskIndex
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Snapshots kept per process
+MAX_SNAPSHOTS = 10
+
+# Allocations of the profiler itself are not interesting
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>')
+]
+
+class MemoryProfiler:
+    """
+    Opt-in tracemalloc instrumentation for the Planfix cache.
+
+    Tracing is only enabled on request (it slows every allocation down),
+    snapshots are kept in memory of the current process under a label, and
+    can be reported as top allocation sites or diffed against each other.
+    Retained sizes are measured by loading each derived view and the task
+    index while tracing and keeping the result alive until it is counted.
+    """
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        """Initialize the profiler"""
+        self.max_snapshots = max_snapshots
+        self._snapshots: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._started_here = False
+
+    def start(self, frames: int = 10):
+        """Start tracing allocations"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            self._started_here = True
+            logger.info(f"tracemalloc started with {frames} frames")
+
+    @contextmanager
+    def tracing(self, frames: int = 10):
+        """Trace allocations for a block; tracing started by the block is stopped after it, snapshots are kept"""
+        started = not tracemalloc.is_tracing()
+        self.start(frames)
+        try:
+            yield
+        finally:
+            if started and tracemalloc.is_tracing():
+                tracemalloc.stop()
+                self._started_here = False
+                logger.info("tracemalloc stopped")
+
+    def stop(self):
+        """Stop tracing and drop snapshots"""
+        if tracemalloc.is_tracing() and self._started_here:
+            tracemalloc.stop()
+            self._started_here = False
+            logger.info("tracemalloc stopped")
+        with self._lock:
+            self._snapshots.clear()
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get tracing status and the list of snapshots"""
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        with self._lock:
+            snapshots = [
+                {'label': label, 'taken_at': taken_at, 'traced_bytes': traced}
+                for label, (taken_at, traced, _) in self._snapshots.items()
+            ]
+        return {
+            'tracing': tracemalloc.is_tracing(),
+            'frames': tracemalloc.get_traceback_limit() if tracemalloc.is_tracing() else 0,
+            'traced_bytes': current,
+            'peak_bytes': peak,
+            'snapshots': snapshots
+        }
+
+    def take_snapshot(self, label: Optional[str] = None) -> str:
+        """
+        Take a snapshot of the traced allocations
+
+        Returns:
+            The snapshot label
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing, start the profiler first")
+
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+        label = label or time.strftime('%H%M%S')
+        traced = tracemalloc.get_traced_memory()[0]
+
+        with self._lock:
+            self._snapshots.pop(label, None)
+            self._snapshots[label] = (time.time(), traced, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return label
+
+    def get_snapshot(self, label: str) -> tracemalloc.Snapshot:
+        """Get a stored snapshot"""
+        with self._lock:
+            if label not in self._snapshots:
+                raise KeyError(f"Unknown snapshot: {label}")
+            return self._snapshots[label][2]
+
+    def dump_snapshot(self, label: str, path: str):
+        """Write a snapshot to a file, to diff it against a later process"""
+        self.get_snapshot(label).dump(str(path))
+
+    def load_snapshot(self, path: str, label: Optional[str] = None) -> str:
+        """
+        Load a snapshot written by dump_snapshot
+
+        Returns:
+            The snapshot label (the file name by default)
+        """
+        snapshot = tracemalloc.Snapshot.load(str(path))
+        label = label or str(path).rsplit('/', 1)[-1]
+        traced = sum(trace.size for trace in snapshot.traces)
+
+        with self._lock:
+            self._snapshots.pop(label, None)
+            self._snapshots[label] = (time.time(), traced, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return label
+
+    def top(self, label: str, limit: int = 20, key_type: str = 'lineno') -> List[Dict[str, Any]]:
+        """
+        Get the top allocation sites of a snapshot
+
+        Args:
+            label: Snapshot label
+            limit: Number of sites
+            key_type: 'lineno', 'filename' or 'traceback'
+        """
+        stats = self.get_snapshot(label).statistics(key_type)
+        return [
+            {
+                'location': self._format_traceback(stat.traceback, key_type),
+                'size': stat.size,
+                'count': stat.count
+            }
+            for stat in stats[:limit]
+        ]
+
+    def diff(self, old_label: str, new_label: str, limit: int = 20,
+             key_type: str = 'lineno') -> Dict[str, Any]:
+        """
+        Compare two snapshots; growing allocation sites come first
+
+        Returns:
+            Total size difference and the top changed sites
+        """
+        stats = self.get_snapshot(new_label).compare_to(self.get_snapshot(old_label), key_type)
+        return {
+            'old': old_label,
+            'new': new_label,
+            'size_diff': sum(stat.size_diff for stat in stats),
+            'sites': [
+                {
+                    'location': self._format_traceback(stat.traceback, key_type),
+                    'size': stat.size,
+                    'size_diff': stat.size_diff,
+                    'count_diff': stat.count_diff
+                }
+                for stat in stats[:limit]
+            ]
+        }
+
+    def _format_traceback(self, traceback: tracemalloc.Traceback, key_type: str) -> str:
+        """Render an allocation site"""
+        if key_type == 'traceback':
+            return ' <- '.join(f"{frame.filename}:{frame.lineno}" for frame in traceback)
+        frame = traceback[0]
+        return frame.filename if key_type == 'filename' else f"{frame.filename}:{frame.lineno}"
+
+    def measure_retained(self, loader: Callable[[], Any]) -> Dict[str, int]:
+        """
+        Measure how much traced memory a loaded structure keeps alive
+
+        Returns:
+            Retained bytes and the transient peak while loading
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing, start the profiler first")
+
+        gc.collect()
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        result = loader()
+        gc.collect()
+        current, peak = tracemalloc.get_traced_memory()
+        retained = {'retained_bytes': current - before, 'peak_bytes': peak - before}
+        del result
+        return retained
+
+    def measure_cache_views(self) -> Dict[str, Dict[str, int]]:
+        """Measure retained sizes of the task index and every derived view"""
+        views = {
+            # A fresh index, not the memoized one, so its full size is counted
+            'task_index': lambda: TaskIndex(planfix_cache._read_tasks_file(), None),
+            'active_tasks': planfix_cache.get_active_tasks,
+            'completed_tasks': planfix_cache.get_completed_tasks,
+            'overdue_tasks': planfix_cache.get_overdue_tasks,
+            'projects': planfix_cache.get_projects,
+            'users': planfix_cache.get_users,
+            'stats': planfix_cache.get_stats
+        }
+
+        sizes = {}
+        for name, loader in views.items():
+            sizes[name] = self.measure_retained(loader)
+        return sizes
+
+    def profile_refresh(self, refresh: bool = True, limit: int = 20,
+                        key_type: str = 'lineno') -> Dict[str, Any]:
+        """
+        Snapshot memory before and after a cache refresh and after loading all views
+
+        Args:
+            refresh: Run refresh_all_caches (talks to Planfix); otherwise only loads are profiled
+            limit: Number of allocation sites in reports
+            key_type: 'lineno', 'filename' or 'traceback'
+        """
+        report = {}
+        with self.tracing():
+            before = self.take_snapshot('before_refresh')
+
+            if refresh:
+                planfix_cache.refresh_all_caches()
+                after_refresh = self.take_snapshot('after_refresh')
+                report['refresh_diff'] = self.diff(before, after_refresh, limit, key_type)
+                before = after_refresh
+
+            report['retained'] = self.measure_cache_views()
+            # A serving process keeps the memoized index loaded
+            planfix_cache.get_task_index()
+            after_loads = self.take_snapshot('after_loads')
+            report['loads_diff'] = self.diff(before, after_loads, limit, key_type)
+            report['top'] = self.top(after_loads, limit, key_type)
+        report['status'] = self.get_status()
+        return report
+
+# Singleton instance
+memory_profiler = MemoryProfiler()
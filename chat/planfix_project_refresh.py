@@ -0,0 +1,202 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, Optional, Union
+
+from .planfix_api import get_tasks_page, get_task_detail, PlanfixAPIError
+from .planfix_cache_service import planfix_cache, file_lock, CACHE_DIR
+from .planfix_config import PROJECT_REFRESH, TASKS_REQUEST
+from .planfix_ratelimit import PRIORITY_BACKGROUND
+from .planfix_telemetry import refresh_run, track_stage
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Start times of project refreshes, shared by worker processes for rate limiting
+PROJECT_REFRESH_FILE = CACHE_DIR / 'project_refresh.json'
+
+class ProjectRefresher:
+    """
+    Refreshes the tasks of a single project on demand.
+
+    A project-filtered task/list download is patched into the snapshot with
+    apply_task_changes, which also updates the project, assignee and
+    workload aggregates. Refreshes of one project are rate-limited to one
+    per min_interval (across processes, through a small state file), and
+    concurrent callers in a process share the in-flight refresh.
+    """
+
+    def __init__(self, min_interval: float = 120, filter_type: int = 5, max_departed: int = 50,
+                 wait_timeout: float = 5.0, max_workers: int = 2, state_file=PROJECT_REFRESH_FILE):
+        """Initialize the refresher"""
+        self.min_interval = min_interval
+        self.filter_type = filter_type
+        self.max_departed = max_departed
+        self.wait_timeout = wait_timeout
+        self.state_file = state_file
+        self.lock_file = state_file.with_name(f"{state_file.name}.lock")
+        self._inflight: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='planfix-project')
+
+    def _load_state(self) -> Dict[str, float]:
+        """Load the last start time of every project refresh"""
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading project refresh state: {e}")
+            return {}
+
+    def _claim(self, key: str, now: float) -> Optional[float]:
+        """
+        Record the start of a project refresh unless one started within min_interval
+
+        The state file is read and written under a file lock, so worker
+        processes see each other's starts.
+
+        Returns:
+            Start time of the recent refresh that blocks this one, or None if claimed
+        """
+        with file_lock(self.lock_file):
+            state = self._load_state()
+            last_started = state.get(key)
+            if last_started is not None and now - last_started < self.min_interval:
+                return last_started
+            self._mark_started(state, key, now)
+            return None
+
+    def _mark_started(self, state: Dict[str, float], key: str, now: float):
+        """Record the start of a project refresh (file lock must be held)"""
+        state[key] = now
+        # Entries older than the rate limit window are no longer needed
+        state = {project_id: started for project_id, started in state.items() if now - started < self.min_interval}
+        tmp_file = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def refresh(self, project_id: Union[str, int], wait: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Refresh one project's tasks
+
+        Args:
+            project_id: Planfix project ID
+            wait: Seconds to wait for the result (None: wait_timeout, 0: run in the background)
+
+        Returns:
+            Status dict: 'refreshed' with change counts, 'skipped' if the project was
+            refreshed recently, 'started' if the refresh continues in the background,
+            or 'failed'
+        """
+        key = str(project_id)
+        now = time.time()
+
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                last_started = self._claim(key, now)
+                if last_started is not None:
+                    return {
+                        'project_id': key,
+                        'status': 'skipped',
+                        'last_refresh_at': last_started,
+                        'retry_after': round(self.min_interval - (now - last_started), 1)
+                    }
+                future = self._executor.submit(self._run, key)
+                self._inflight[key] = future
+
+        wait = self.wait_timeout if wait is None else wait
+        try:
+            return future.result(timeout=wait) if wait > 0 else {'project_id': key, 'status': 'started'}
+        except FutureTimeoutError:
+            return {'project_id': key, 'status': 'started'}
+
+    def _run(self, key: str) -> Dict[str, Any]:
+        """Run a refresh and release the in-flight slot"""
+        try:
+            with refresh_run('project_refresh'):
+                return self._refresh_project(key)
+        except Exception as e:
+            logger.error(f"Error refreshing Planfix project {key}: {e}", exc_info=True)
+            return {'project_id': key, 'status': 'failed', 'error': str(e)}
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _refresh_project(self, key: str) -> Dict[str, Any]:
+        """Download the project's tasks and patch them into the snapshot"""
+        started = time.perf_counter()
+        filters = [{'type': self.filter_type, 'operator': 'equal', 'value': key}]
+
+        fetched = []
+        with track_stage('fetch_project_pages') as stage:
+            page = 0
+            while True:
+                tasks = get_tasks_page(page, filters=filters).get('tasks', [])
+                # Tasks of other projects would mean the filter was not applied
+                fetched.extend(
+                    task for task in tasks
+                    if task.get('project') and str(task['project'].get('id')) == key
+                )
+                page += 1
+                if len(tasks) < TASKS_REQUEST['pageSize']:
+                    break
+            stage['items'] = len(fetched)
+
+        index = planfix_cache.get_task_index()
+        fetched_ids = {str(task.get('id')) for task in fetched}
+        departed = [
+            str(task.get('id')) for task in index.tasks
+            if task.get('project') and str(task['project'].get('id')) == key
+            and str(task.get('id')) not in fetched_ids
+        ]
+        if len(departed) > self.max_departed:
+            raise PlanfixAPIError(
+                f"{len(departed)} tasks of project {key} are missing from the filtered list, "
+                f"leaving the project to the next full sync"
+            )
+
+        # Tasks that left the project were moved or deleted. Only a 404 (an empty detail) means
+        # deleted; any other error, such as a 401/403 for the shared token, fails the refresh
+        # before anything is published
+        deleted_ids = []
+        with track_stage('fetch_departed') as stage:
+            for task_id in departed:
+                task = get_task_detail(task_id, priority=PRIORITY_BACKGROUND)
+                if task == {}:
+                    deleted_ids.append(task_id)
+                else:
+                    fetched.append(task)
+            stage['items'] = len(departed)
+
+        # Only real changes are published, so an idle project does not bump the generation
+        upserted = [task for task in fetched if index.get(task.get('id')) != task]
+        summary = {'added': 0, 'updated': 0, 'removed': 0}
+        if upserted or deleted_ids:
+            with track_stage('publish', cache_name='tasks') as stage:
+                summary = planfix_cache.apply_task_changes(upserted, deleted_ids, source='project_refresh')
+                stage['items'] = len(upserted) + len(deleted_ids)
+
+        logger.info(f"Refreshed Planfix project {key}: {len(fetched)} tasks, {summary}")
+        return dict(
+            summary,
+            project_id=key,
+            status='refreshed',
+            fetched=len(fetched),
+            duration=round(time.perf_counter() - started, 3)
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get in-flight and recently refreshed projects"""
+        with self._lock:
+            in_flight = sorted(self._inflight)
+        return {'in_flight': in_flight, 'recent': self._load_state(), 'min_interval': self.min_interval}
+
+# Singleton instance
+project_refresher = ProjectRefresher(**PROJECT_REFRESH)
@@ -0,0 +1,102 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+
+from .planfix_cache_service import CACHE_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+PROJECT_CATALOGUE_FILE = CACHE_DIR / 'project_catalogue.json'
+
+class ProjectCatalogue:
+    """
+    Project catalogue of the Planfix account: names, statuses and dates.
+
+    The full task sync fetches every page of projects and stores them next
+    to the tasks snapshot. Readers share an in-memory copy that is reloaded
+    when the file changes, so serving projects never calls Planfix. The
+    ETag is a hash of the projects, and the file (with its update time) is
+    only rewritten when they actually change.
+    """
+
+    def __init__(self, catalogue_file=PROJECT_CATALOGUE_FILE):
+        """Initialize the catalogue"""
+        self.catalogue_file = catalogue_file
+        self._data: Optional[Dict[str, Any]] = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _get_file_version(self) -> Optional[tuple]:
+        """Get a cheap version marker of the catalogue file"""
+        try:
+            stat = self.catalogue_file.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def get(self) -> Optional[Dict[str, Any]]:
+        """Get {'projects', 'etag', 'updated_at'}, or None before the first sync"""
+        version = self._get_file_version()
+        with self._lock:
+            if version != self._version:
+                self._data = self._load() if version is not None else None
+                self._version = version
+            return self._data
+
+    def _load(self) -> Optional[Dict[str, Any]]:
+        """Load the catalogue from disk"""
+        try:
+            with open(self.catalogue_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading project catalogue: {e}")
+            return None
+
+    def get_projects(self) -> List[Dict[str, Any]]:
+        """Get the catalogue projects, empty before the first sync"""
+        data = self.get()
+        return data['projects'] if data else []
+
+    def get_etag(self) -> Optional[str]:
+        """Get the ETag of the current projects"""
+        data = self.get()
+        return data['etag'] if data else None
+
+    def get_last_modified(self) -> Optional[datetime]:
+        """Get the time the projects last changed"""
+        data = self.get()
+        return datetime.fromisoformat(data['updated_at']) if data else None
+
+    def save(self, projects: List[Dict[str, Any]]) -> bool:
+        """
+        Store projects fetched from Planfix
+
+        Returns:
+            Whether the catalogue changed
+        """
+        etag = hashlib.sha1(
+            json.dumps(projects, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        if etag == self.get_etag():
+            return False
+
+        data = {
+            'etag': etag,
+            'updated_at': datetime.now(timezone.utc).replace(microsecond=0).isoformat(),
+            'projects': projects
+        }
+        tmp_file = self.catalogue_file.with_name(f"{self.catalogue_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.catalogue_file)
+
+        logger.info(f"Project catalogue updated with {len(projects)} projects")
+        return True
+
+# Singleton instance
+project_catalogue = ProjectCatalogue()
@@ -0,0 +1,330 @@
+import base64
+import logging
+import re
+import threading
+from datetime import date
+from typing import Dict, List, Any, Optional, Union, Callable, Iterable
+
+from .planfix_cache_service import planfix_cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\w+')
+
+# Accepted sort orders; a '-' prefix reverses them
+SORT_KEYS = ('id', 'due', 'name')
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+
+def task_texts(task: Dict[str, Any]) -> List[str]:
+    """Get the lowercased task fields the text filter matches: name, description, status and project name"""
+    texts = []
+    if task.get('name'):
+        texts.append(task['name'].lower())
+    if task.get('description'):
+        texts.append(task['description'].lower())
+    if task.get('status') and task['status'].get('name'):
+        texts.append(task['status']['name'].lower())
+    if task.get('project') and task['project'].get('name'):
+        texts.append(task['project']['name'].lower())
+    return texts
+
+def encode_cursor(offset: int) -> str:
+    """Encode a result offset as an opaque cursor"""
+    return base64.urlsafe_b64encode(str(offset).encode()).decode()
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    """Decode a cursor made by encode_cursor"""
+    if not cursor:
+        return 0
+    try:
+        offset = int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    if offset < 0:
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return offset
+
+def normalize_due_date(value: Optional[str]) -> Optional[str]:
+    """Check a due date bound and return it as YYYY-MM-DD"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid due date: {value}")
+
+class TextIndex:
+    """
+    Inverted index from word tokens to the rows whose text fields contain them.
+
+    A text filter matches a case-insensitive substring. Every word of the
+    query lies inside one token of a matching task, so the rows of the
+    tokens containing each query word are a superset of the matches that
+    is then verified against the full query.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]]):
+        """Build the index for the rows of a snapshot"""
+        self.postings: Dict[str, List[int]] = {}
+        for row, task in enumerate(tasks):
+            tokens = set()
+            for text in task_texts(task):
+                tokens.update(TOKEN_PATTERN.findall(text))
+            for token in tokens:
+                self.postings.setdefault(token, []).append(row)
+
+        logger.debug(f"Built text index with {len(self.postings)} tokens")
+
+    def matching_tokens(self, word: str) -> List[str]:
+        """Get the indexed tokens containing a word"""
+        return [token for token in self.postings if word in token]
+
+class TaskQueryPlanner:
+    """
+    Structured queries over the tasks snapshot.
+
+    Each filter is a predicate that can both produce its rows from an
+    index (id map, posting lists of the task columns, due date order,
+    text index) and narrow down an existing candidate set. The planner
+    estimates every predicate's size from its index, lets the most
+    selective one produce the candidates and applies the rest smallest
+    first: posting list predicates intersect when their list is smaller
+    than the candidates and check column values of the candidates
+    otherwise, so no filter scans the whole snapshot once candidates exist.
+    """
+
+    def __init__(self, cache=planfix_cache):
+        """Initialize the planner"""
+        self.cache = cache
+        self._text_index = None
+        self._text_index_columns = None
+        self._lock = threading.Lock()
+
+    def get_text_index(self, columns) -> TextIndex:
+        """Get the text index of a columns version, built on first use"""
+        with self._lock:
+            if self._text_index_columns is not columns:
+                self._text_index = TextIndex(columns.tasks)
+                self._text_index_columns = columns
+            return self._text_index
+
+    def query(self, ids: Optional[Iterable[Union[str, int]]] = None,
+              statuses: Optional[Iterable[Union[str, int]]] = None,
+              project_id: Optional[Union[str, int]] = None,
+              assignee_id: Optional[Union[str, int]] = None,
+              assigner_id: Optional[Union[str, int]] = None,
+              due_from: Optional[str] = None, due_to: Optional[str] = None,
+              text: Optional[str] = None, completed: Optional[bool] = None, fuzzy: bool = False,
+              sort: Optional[str] = None, limit: Optional[int] = DEFAULT_LIMIT,
+              cursor: Optional[str] = None, explain: bool = False) -> Dict[str, Any]:
+        """
+        Find tasks matching every given filter
+
+        Args:
+            ids: Task IDs
+            statuses: Status names or IDs, any of which matches
+            project_id: Project ID
+            assignee_id: Person ID among the assignees
+            assigner_id: Person ID of the creator
+            due_from: First due date (YYYY-MM-DD), inclusive
+            due_to: Last due date (YYYY-MM-DD), inclusive
+            text: Case-insensitive substring of the name, description, status or project name
+            completed: Completion flag
+            fuzzy: Match text against task names allowing typos (trigram index) instead of substrings
+            sort: 'id', 'due' or 'name', '-' prefix for descending; snapshot order by default
+            limit: Page size; None returns every match
+            cursor: next_cursor of the previous page
+            explain: Include the executed plan
+
+        Returns:
+            {'tasks', 'total', 'next_cursor'} and 'plan' when explain is set
+
+        Raises:
+            ValueError: For an unknown sort order, an invalid due date or an invalid cursor
+        """
+        sort_key = (sort or '').lstrip('-')
+        if sort and sort_key not in SORT_KEYS:
+            raise ValueError(f"Unknown sort order: {sort}")
+        due_from, due_to = normalize_due_date(due_from), normalize_due_date(due_to)
+        offset = decode_cursor(cursor)
+
+        columns = self.cache.get_task_columns()
+        predicates = self._build_predicates(columns, ids, statuses, project_id, assignee_id, assigner_id,
+                                            due_from, due_to, text, completed, fuzzy)
+
+        plan = []
+        if any(predicate['estimate'] == 0 for predicate in predicates):
+            rows = columns.rows_from([])
+            plan.append({'filter': 'empty', 'index': 'estimate', 'rows': 0})
+        elif not predicates:
+            rows = columns.all_rows()
+            plan.append({'filter': 'all', 'index': 'scan', 'rows': len(rows)})
+        else:
+            predicates.sort(key=lambda predicate: predicate['estimate'])
+            driver = predicates[0]
+            rows = driver['rows']()
+            plan.append({'filter': driver['filter'], 'index': driver['index'], 'estimate': driver['estimate'],
+                         'strategy': 'driver', 'rows': len(rows)})
+
+            for predicate in predicates[1:]:
+                if not len(rows):
+                    break
+                intersect = predicate['intersect'] is not None and predicate['estimate'] < len(rows)
+                rows = predicate['intersect'](rows) if intersect else predicate['check'](rows)
+                plan.append({'filter': predicate['filter'], 'index': predicate['index'],
+                             'estimate': predicate['estimate'],
+                             'strategy': 'intersect' if intersect else 'check', 'rows': len(rows)})
+
+        if sort_key:
+            rows = self._sort(columns, rows, sort_key, sort.startswith('-'))
+
+        total = len(rows)
+        if limit is None:
+            page_rows, next_offset = rows[offset:], None
+        else:
+            limit = max(1, min(limit, MAX_LIMIT))
+            page_rows = rows[offset:offset + limit]
+            next_offset = offset + limit if offset + limit < total else None
+
+        result = {
+            'tasks': [columns.tasks[row] for row in page_rows],
+            'total': total,
+            'next_cursor': encode_cursor(next_offset) if next_offset is not None else None
+        }
+        if explain:
+            result['plan'] = plan
+        return result
+
+    def _predicate(self, name: str, index: str, estimate: int, rows: Callable,
+                   check: Callable, intersect: Optional[Callable] = None) -> Dict[str, Any]:
+        """Describe one filter for the planner"""
+        return {'filter': name, 'index': index, 'estimate': estimate,
+                'rows': rows, 'check': check, 'intersect': intersect}
+
+    def _build_predicates(self, columns, ids, statuses, project_id, assignee_id, assigner_id,
+                          due_from, due_to, text, completed, fuzzy) -> List[Dict[str, Any]]:
+        """Turn the given filters into predicates with size estimates"""
+        predicates = []
+
+        if ids is not None:
+            id_rows = columns.rows_from([columns.row_by_id[str(task_id)] for task_id in ids
+                                         if str(task_id) in columns.row_by_id])
+            predicates.append(self._predicate(
+                'ids', 'id', len(id_rows), lambda: id_rows,
+                lambda rows: columns.intersect(rows, id_rows)
+            ))
+
+        if statuses is not None:
+            codes = self._status_codes(columns, statuses)
+            predicates.append(self._predicate(
+                'statuses', 'status postings', sum(columns.posting_size('status', code) for code in codes),
+                lambda: columns.union([columns.posting('status', code) for code in codes]),
+                lambda rows: columns.select(rows, 'status', codes)
+            ))
+
+        for name, key, table, value in (('project', 'project', columns.projects, project_id),
+                                        ('assigner', 'assigner', columns.people, assigner_id)):
+            if value is not None:
+                code = columns._find_id(table, value)
+                predicates.append(self._predicate(
+                    name, f'{key} postings', columns.posting_size(key, code),
+                    lambda key=key, code=code: columns.posting(key, code),
+                    lambda rows, key=key, code=code: columns.select(rows, key, [code]),
+                    lambda rows, key=key, code=code: columns.intersect(rows, columns.posting(key, code))
+                ))
+
+        if assignee_id is not None:
+            code = columns._find_id(columns.people, assignee_id)
+            posting = lambda: columns.posting('assignee', code)
+            predicates.append(self._predicate(
+                'assignee', 'assignee postings', columns.posting_size('assignee', code), posting,
+                lambda rows: columns.intersect(rows, posting())
+            ))
+
+        if due_from or due_to:
+            predicates.append(self._predicate(
+                'due', 'due date order', columns.due_range_size(due_from, due_to),
+                lambda: columns.due_range(due_from, due_to),
+                lambda rows: columns.select_due(rows, due_from, due_to)
+            ))
+
+        if completed is not None:
+            completed_count = columns._count(columns.completed)
+            predicates.append(self._predicate(
+                'completed', 'completion column', completed_count if completed else columns.size - completed_count,
+                lambda: columns.select(columns.all_rows(), 'completed', [completed]),
+                lambda rows: columns.select(rows, 'completed', [completed])
+            ))
+
+        if text is not None and fuzzy:
+            from .planfix_fuzzy import fuzzy_search
+            fuzzy_rows = columns.rows_from([columns.row_by_id[task_id] for task_id in
+                                            fuzzy_search.find_ids(text, 'tasks', limit=MAX_LIMIT)
+                                            if task_id in columns.row_by_id])
+            predicates.append(self._predicate(
+                'text', 'trigram index', len(fuzzy_rows), lambda: fuzzy_rows,
+                lambda rows: columns.intersect(rows, fuzzy_rows)
+            ))
+        elif text is not None:
+            predicates.append(self._text_predicate(columns, text.lower()))
+
+        return predicates
+
+    def _status_codes(self, columns, statuses: Iterable[Union[str, int]]) -> List[int]:
+        """Get status label codes matching status names (case-insensitive) or IDs"""
+        wanted = {str(status).lower() for status in statuses}
+        return [
+            code for code, label in enumerate(columns.status_labels)
+            if label.lower() in wanted or columns.status_ids[code] & wanted
+        ]
+
+    def _text_predicate(self, columns, query: str) -> Dict[str, Any]:
+        """Text filter: candidate rows from the text index, verified against the whole query"""
+        def verify(rows):
+            return columns.rows_from([
+                row for row in rows if any(query in text for text in task_texts(columns.tasks[row]))
+            ])
+
+        words = TOKEN_PATTERN.findall(query)
+        if not words:
+            return self._predicate('text', 'scan', columns.size, lambda: verify(columns.all_rows()), verify)
+
+        text_index = self.get_text_index(columns)
+        word_postings = []
+        for word in set(words):
+            postings = [text_index.postings[token] for token in text_index.matching_tokens(word)]
+            word_postings.append((sum(len(posting) for posting in postings), postings))
+        word_postings.sort(key=lambda item: item[0])
+
+        def candidates():
+            rows = None
+            for _, postings in word_postings:
+                word_rows = columns.union([columns.rows_from(posting) for posting in postings])
+                rows = word_rows if rows is None else columns.intersect(rows, word_rows)
+            return rows
+
+        return self._predicate(
+            'text', 'text index', word_postings[0][0],
+            lambda: verify(candidates()), verify,
+            lambda rows: verify(columns.intersect(rows, candidates()))
+        )
+
+    def _sort(self, columns, rows, key: str, descending: bool):
+        """Order matching rows"""
+        if key == 'due':
+            return columns.sort_rows(rows, 'due', descending)
+
+        def sort_value(row):
+            task = columns.tasks[row]
+            if key == 'name':
+                return (task.get('name') or '').lower()
+            task_id = str(task.get('id'))
+            return (0, int(task_id), '') if task_id.isdigit() else (1, 0, task_id)
+
+        return sorted(rows, key=sort_value, reverse=descending)
+
+# Singleton instance
+task_query = TaskQueryPlanner()
@@ -0,0 +1,211 @@
+import json
+import logging
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Any, Optional
+
+from .planfix_cache_service import file_lock, CACHE_DIR
+from .planfix_config import RATE_LIMIT
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Priority lanes
+PRIORITY_INTERACTIVE = 'interactive'
+PRIORITY_BACKGROUND = 'background'
+
+# Bucket state shared by every worker process
+RATE_LIMIT_STATE_FILE = CACHE_DIR / 'planfix_ratelimit.json'
+
+# Seconds background callers keep yielding after an interactive caller's expected wait
+INTERACTIVE_HOLD = 0.5
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header (delay in seconds or an HTTP date)
+
+    Returns:
+        Seconds to wait, or None if the header is missing or malformed
+    """
+    if not value:
+        return None
+
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all Planfix requests of every worker process.
+
+    The bucket lives in a small state file read and written under a file
+    lock, so gunicorn workers and Celery draw from one budget instead of
+    one budget each. The refill rate adapts AIMD-style: every successful
+    request adds a small increment (up to max_rate), every 429 multiplies
+    the rate by decrease_factor and pauses the bucket for Retry-After.
+    Interactive requests (detail lookups) are served ahead of background
+    sync: while interactive callers are waiting in any process, background
+    callers do not take tokens, and background callers always leave
+    `interactive_reserve` tokens.
+    """
+
+    def __init__(self, rate: float = 5.0, burst: float = 5.0, min_rate: float = 0.5, max_rate: float = 10.0,
+                 additive_increase: float = 0.5, decrease_factor: float = 0.5, interactive_reserve: float = 1.0,
+                 state_file=RATE_LIMIT_STATE_FILE):
+        """Initialize the limiter"""
+        self.initial_rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.additive_increase = additive_increase
+        self.decrease_factor = decrease_factor
+        self.interactive_reserve = min(interactive_reserve, burst - 1) if burst > 1 else 0
+        self.state_file = state_file
+        self.lock_file = state_file.with_name(f"{state_file.name}.lock")
+
+        self._waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BACKGROUND: 0}
+        self._condition = threading.Condition()
+
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+
+    def _load_state(self, now: float) -> Dict[str, float]:
+        """Read the shared bucket (file lock must be held); a missing or corrupt file starts a full bucket"""
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if all(key in state for key in ('tokens', 'updated', 'rate', 'paused_until', 'interactive_until')):
+                return state
+        except (json.JSONDecodeError, IOError):
+            pass
+        return {'tokens': self.burst, 'updated': now, 'rate': self.initial_rate,
+                'paused_until': 0.0, 'interactive_until': 0.0}
+
+    def _save_state(self, state: Dict[str, float]):
+        """Write the shared bucket (file lock must be held)"""
+        tmp_file = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f)
+            os.replace(tmp_file, self.state_file)
+        except IOError as e:
+            logger.error(f"Error writing Planfix rate limit state: {e}")
+
+    def _refill(self, state: Dict[str, float], now: float):
+        """Add tokens for the elapsed time"""
+        if now > state['updated']:
+            state['tokens'] = min(self.burst, state['tokens'] + (now - state['updated']) * state['rate'])
+            state['updated'] = now
+
+    def acquire(self, priority: str = PRIORITY_BACKGROUND, timeout: Optional[float] = None) -> bool:
+        """
+        Take one token, waiting for it if necessary
+
+        Args:
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BACKGROUND
+            timeout: Maximum wait in seconds (None waits indefinitely)
+
+        Returns:
+            True if a token was taken, False on timeout
+        """
+        started = time.time()
+        deadline = started + timeout if timeout is not None else None
+        interactive = priority == PRIORITY_INTERACTIVE
+        needed = 1 if interactive else 1 + self.interactive_reserve
+
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    with file_lock(self.lock_file):
+                        now = time.time()
+                        state = self._load_state(now)
+                        self._refill(state, now)
+
+                        if now >= state['paused_until']:
+                            if interactive:
+                                available = state['tokens'] >= 1
+                            else:
+                                available = (
+                                    self._waiting[PRIORITY_INTERACTIVE] == 0
+                                    and now >= state['interactive_until']
+                                    and state['tokens'] >= needed
+                                )
+                            if available:
+                                state['tokens'] -= 1
+                                self._save_state(state)
+                                self.requests += 1
+                                self.wait_seconds += now - started
+                                return True
+
+                        # Sleep until the next token (or the end of a pause) is due
+                        delay = max(state['paused_until'] - now, (needed - state['tokens']) / state['rate'], 0.01)
+                        if interactive:
+                            # Hold background callers of other processes back while this one waits
+                            state['interactive_until'] = max(state['interactive_until'], now + delay + INTERACTIVE_HOLD)
+                        self._save_state(state)
+
+                    if deadline is not None:
+                        if now >= deadline:
+                            return False
+                        delay = min(delay, deadline - now)
+                    self._condition.wait(delay)
+            finally:
+                self._waiting[priority] -= 1
+                # Let background waiters re-check once interactive ones are done
+                self._condition.notify_all()
+
+    def on_success(self):
+        """Additive increase after a successful request"""
+        with self._condition, file_lock(self.lock_file):
+            now = time.time()
+            state = self._load_state(now)
+            self._refill(state, now)
+            state['rate'] = min(self.max_rate, state['rate'] + self.additive_increase / max(state['rate'], 1.0))
+            self._save_state(state)
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease after a 429, pausing the bucket for Retry-After"""
+        with self._condition:
+            self.throttled += 1
+            with file_lock(self.lock_file):
+                now = time.time()
+                state = self._load_state(now)
+                state['rate'] = max(self.min_rate, state['rate'] * self.decrease_factor)
+                state['tokens'] = 0
+                state['updated'] = now
+                pause = retry_after if retry_after is not None else 1.0 / state['rate']
+                state['paused_until'] = max(state['paused_until'], now + pause)
+                self._save_state(state)
+            logger.warning(f"Planfix rate limit hit, slowing down to {state['rate']:.2f} req/s, pausing {pause:.1f}s")
+            self._condition.notify_all()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get the shared bucket state and the request statistics of this process"""
+        with self._condition:
+            with file_lock(self.lock_file):
+                now = time.time()
+                state = self._load_state(now)
+            self._refill(state, now)
+            return {
+                'rate': round(state['rate'], 3),
+                'max_rate': self.max_rate,
+                'tokens': round(state['tokens'], 3),
+                'paused_for': round(max(0.0, state['paused_until'] - now), 3),
+                'waiting': dict(self._waiting),
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'wait_seconds': round(self.wait_seconds, 3)
+            }
+
+# Singleton instance
+planfix_rate_limiter = AdaptiveRateLimiter(**RATE_LIMIT)
@@ -0,0 +1,177 @@
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Any, Optional
+
+from django.utils import timezone
+
+from .planfix_cache_service import CACHE_DIR
+from .planfix_changes import task_change_log
+from .planfix_config import ADAPTIVE_REFRESH
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+REFRESH_SCHEDULE_FILE = CACHE_DIR / 'refresh_schedule.json'
+
+# Refreshes kept in the schedule history
+MAX_HISTORY = 50
+
+# Change log source of webhook batches, which polling does not need to catch up with
+WEBHOOK_SOURCE = 'webhook'
+
+class AdaptiveRefreshScheduler:
+    """
+    Decides when the next Planfix cache refresh should run.
+
+    After every refresh the number of task changes the polling syncs found
+    since the previous one is turned into a change rate per hour. Changes
+    applied from webhooks are already in the snapshot and are not counted,
+    so they do not make polling more frequent. The rate is smoothed overall and per hour of the week, so the
+    scheduler learns that weekday afternoons are busy and nights are quiet.
+    The next interval is the time expected to accumulate target_changes,
+    clamped to [min_interval, max_interval].
+    """
+
+    def __init__(self, state_file=REFRESH_SCHEDULE_FILE, config: Optional[Dict[str, Any]] = None):
+        """Initialize the scheduler"""
+        self.state_file = state_file
+        self.config = dict(ADAPTIVE_REFRESH, **(config or {}))
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the schedule state from disk"""
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading refresh schedule: {e}")
+            return {}
+
+    def _save(self, state: Dict[str, Any]):
+        """Atomically write the schedule state"""
+        tmp_file = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def _local_time(self, timestamp: float) -> datetime:
+        """Convert a timestamp to the project time zone"""
+        return timezone.localtime(datetime.fromtimestamp(timestamp, tz=dt_timezone.utc))
+
+    def _hour_bucket(self, timestamp: float) -> str:
+        """Get the hour-of-week bucket of a timestamp ('<weekday>-<hour>')"""
+        local = self._local_time(timestamp)
+        return f"{local.weekday()}-{local.hour}"
+
+    def is_due(self, now: Optional[float] = None) -> bool:
+        """Check whether a refresh should start now"""
+        now = now or time.time()
+        return now >= self._load().get('next_refresh_at', 0)
+
+    def mark_dispatched(self, now: Optional[float] = None):
+        """Hold off further dispatches while a refresh is running"""
+        now = now or time.time()
+        state = self._load()
+        state['next_refresh_at'] = now + self.config['min_interval']
+        self._save(state)
+
+    def record_refresh(self, now: Optional[float] = None) -> float:
+        """
+        Record a finished refresh and schedule the next one
+
+        Returns:
+            The interval until the next refresh, in seconds
+        """
+        now = now or time.time()
+        state = self._load()
+        generation = task_change_log.get_current_generation()
+
+        last_refresh_at = state.get('last_refresh_at')
+        last_generation = state.get('last_generation')
+        changes = None
+        if last_refresh_at is not None and last_generation is not None and now > last_refresh_at:
+            changes = sum(
+                len(entry['added']) + len(entry['changed']) + len(entry['removed'])
+                for entry in task_change_log.get_entries()
+                if entry['generation'] > last_generation and entry.get('source') != WEBHOOK_SOURCE
+            )
+            rate = changes / ((now - last_refresh_at) / 3600)
+            smoothing = self.config['smoothing']
+
+            previous_rate = state.get('change_rate')
+            state['change_rate'] = rate if previous_rate is None else (
+                smoothing * rate + (1 - smoothing) * previous_rate
+            )
+
+            hourly = state.setdefault('hourly_activity', {})
+            bucket = self._hour_bucket(now)
+            hourly[bucket] = rate if bucket not in hourly else smoothing * rate + (1 - smoothing) * hourly[bucket]
+
+        interval = self.compute_interval(now, state)
+        state.update({
+            'last_refresh_at': now,
+            'last_generation': generation,
+            'interval': interval,
+            'next_refresh_at': now + interval
+        })
+        history = state.setdefault('history', [])
+        history.append({'at': now, 'changes': changes, 'interval': interval})
+        state['history'] = history[-MAX_HISTORY:]
+        self._save(state)
+
+        logger.info(f"Planfix refresh recorded ({changes} changes), next in {interval:.0f}s")
+        return interval
+
+    def compute_interval(self, now: Optional[float] = None, state: Optional[Dict[str, Any]] = None) -> float:
+        """
+        Get the refresh interval for the given moment
+
+        The expected change rate blends the recent rate with the learned
+        activity of the coming hour of the week; without observations for
+        that hour, configured working hours get working_interval and the
+        rest of the week max_interval.
+        """
+        now = now or time.time()
+        state = state if state is not None else self._load()
+        config = self.config
+
+        hour_rate = state.get('hourly_activity', {}).get(self._hour_bucket(now))
+        recent_rate = state.get('change_rate')
+
+        if hour_rate is None:
+            local = self._local_time(now)
+            start, end = config['working_hours']
+            if local.weekday() < 5 and start <= local.hour < end:
+                prior = config['working_interval']
+            else:
+                prior = config['max_interval']
+            if recent_rate is None:
+                return float(prior)
+            # Recent activity can only shorten the prior interval
+            rate_interval = config['target_changes'] / recent_rate * 3600 if recent_rate > 0 else prior
+            return float(max(config['min_interval'], min(prior, rate_interval)))
+
+        rate = hour_rate if recent_rate is None else (hour_rate + recent_rate) / 2
+        if rate <= 0:
+            return float(config['max_interval'])
+        interval = config['target_changes'] / rate * 3600
+        return float(max(config['min_interval'], min(config['max_interval'], interval)))
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the schedule state without the per-hour table"""
+        state = self._load()
+        return {
+            'last_refresh_at': state.get('last_refresh_at'),
+            'next_refresh_at': state.get('next_refresh_at'),
+            'interval': state.get('interval'),
+            'change_rate': state.get('change_rate'),
+            'learned_hours': len(state.get('hourly_activity', {})),
+            'history': state.get('history', [])[-10:]
+        }
+
+# Singleton instance
+refresh_scheduler = AdaptiveRefreshScheduler()
@@ -5,14 +5,24 @@ import os
 from pathlib import Path
 from django.conf import settings
 from typing import List, Dict, Any
-from .planfix_api import get_projects, get_tasks_page, get_task_detail
+from .planfix_api import get_projects, get_tasks_page, get_task_detail, PlanfixAPIError
+from .planfix_config import SNAPSHOT_SHRINK_GUARD, SYNC_CHECKPOINT, TASKS_REQUEST, TIERED_SYNC
+from .planfix_cache_service import planfix_cache, snapshot_write_lock, CACHE_DIR
+from .planfix_detail_cache import task_detail_cache
+from .planfix_changes import task_change_log
+from .planfix_codec import dump_tasks_file
+from .planfix_history import task_history
+from .planfix_projects import project_catalogue
+from .planfix_sync_staging import sync_staging
+from .planfix_telemetry import refresh_run, track_stage
+from .planfix_ratelimit import PRIORITY_BACKGROUND
+from .planfix_sync_tiers import sync_tiers, merge_hot_tier, find_departed, TIER_HOT, TIER_COLD
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
-# Путь к директории для кэш-файлов
+# Путь к директории для кэш-файлов (общий с planfix_cache_service)
 BASE_DIR = Path(settings.BASE_DIR)
-CACHE_DIR = BASE_DIR / 'chat' / 'cache'
 TASKS_CACHE_FILE = CACHE_DIR / 'tasks_cache.json'
 LAST_UPDATE_FILE = CACHE_DIR / 'last_update.txt'
 
@@ -56,12 +66,23 @@ def init_cache():
 # Инициализируем кэш при загрузке модуля
 init_cache()
 
-def update_tasks_cache(force=False):
+def update_tasks_cache(force=False, allow_shrink=False, tier=None):
     """
-    Проверяет и обновляет кэш задач если прошло более часа
-    с последнего обновления или если force=True
+    Обновляет кэш задач при force=True или если кэша еще нет; иначе возвращает
+    опубликованный снимок. Устаревший (старше TIERED_SYNC['hot_interval']) снимок
+    на пути чтения не синхронизируется, а только ставит в очередь проверку
+    адаптивного расписания (schedule_planfix_refresh), чтобы его интервалы соблюдались
+    
+    Синхронизация многоуровневая: обычно загружаются только незавершенные задачи
+    (горячий уровень), а полный список - не чаще раза в TIERED_SYNC['cold_interval'].
+    
+    Если Planfix недоступен или вернул подозрительно мало задач, опубликованный
+    снимок не заменяется: при force=True выбрасывается исключение, иначе
+    возвращаются задачи из последнего удачного снимка.
     
     :param force: Принудительное обновление кэша
+    :param allow_shrink: Публиковать снимок, даже если он заметно меньше предыдущего
+    :param tier: 'hot' или 'cold'; по умолчанию выбирается уровень, срок которого подошел
     :return: Список всех задач
     """
     # Проверяем, существуют ли файлы кэша
@@ -75,87 +96,327 @@ def update_tasks_cache(force=False):
             last_update_str = f.read().strip()
             try:
                 last_update = float(last_update_str)
-                # Проверяем, прошел ли час с последнего обновления
-                need_update = (time.time() - last_update) > 3600  # 3600 секунд = 1 час
+                # Проверяем, прошел ли интервал горячего уровня с последнего обновления
+                need_update = (time.time() - last_update) > TIERED_SYNC['hot_interval']
             except ValueError:
                 need_update = True
     
-    # Если нужно обновить кэш или файлы кэша не существуют
-    if need_update or not cache_exists or force:
-        logger.info(f"Обновление кэша задач Planfix")
-        all_tasks = []
-        page = 0
-        more_pages = True
-        
-        # Загружаем все страницы задач
-        while more_pages:
-            result = get_tasks_page(page)
-            tasks = result.get('tasks', [])
-            
-            if not tasks:
-                more_pages = False
-            else:
-                all_tasks.extend(tasks)
-                page += 1
+    # Путь чтения не запускает синхронизацию: решение принимает расписание
+    if cache_exists and not force:
+        if need_update:
+            _request_scheduled_refresh()
+        return planfix_cache.get_all_tasks()
+    
+    # Принудительное обновление или первая загрузка
+    if not cache_exists:
+        tier = TIER_COLD
+    tier = tier or sync_tiers.get_due_tier()
+    
+    if tier == TIER_HOT:
+        with refresh_run('hot_sync'):
+            return _sync_hot_tier(force, allow_shrink)
+    with refresh_run('full_sync'):
+        return _sync_tasks_from_planfix(force, cache_exists, allow_shrink)
+
+# Время последней постановки проверки расписания в очередь в этом процессе
+_refresh_requested_at = 0.0
+
+def _request_scheduled_refresh():
+    """
+    Ставит в очередь проверку адаптивного расписания (не чаще раза в минуту на процесс).
+    Обновление запустится, только если расписание считает его своевременным
+    """
+    global _refresh_requested_at
+    from .planfix_scheduler import refresh_scheduler
+    
+    now = time.time()
+    if now - _refresh_requested_at < 60 or not refresh_scheduler.is_due(now):
+        return
+    _refresh_requested_at = now
+    
+    try:
+        from .tasks import schedule_planfix_refresh
+        # Без повторных попыток подключения к брокеру: запрос пользователя не должен ждать
+        schedule_planfix_refresh.apply_async(retry=False)
+    except Exception as e:
+        logger.warning(f"Не удалось поставить обновление кэша в очередь: {e}")
+
+def _sync_tasks_from_planfix(force, cache_exists, allow_shrink):
+    """
+    Загружает все задачи из Planfix и публикует новый снимок.
+    Каждый этап измеряется телеметрией обновления.
+    
+    :return: Список всех задач
+    """
+    # Одновременные полные синхронизации (по расписанию и принудительная) в любых
+    # процессах выполняются по очереди: иначе они сбрасывают и смешивают страницы друг друга
+    with sync_staging.run_lock():
+        return _run_staged_sync(force, cache_exists, allow_shrink)
+
+def _run_staged_sync(force, cache_exists, allow_shrink):
+    """
+    Полная синхронизация через промежуточную область (вызывается под sync_staging.run_lock)
+    
+    :return: Список всех задач
+    """
+    logger.info(f"Обновление кэша задач Planfix")
+    more_pages = True
+    
+    # Каждая страница сохраняется в промежуточную область: прерванная
+    # синхронизация продолжится с первой недостающей страницы
+    page = sync_staging.begin(TASKS_REQUEST['pageSize'], SYNC_CHECKPOINT['resume_window'])
+    if page:
+        logger.info(f"Продолжаем прерванную синхронизацию со страницы {page}")
+    
+    # Загружаем все страницы задач
+    try:
+        with track_stage('fetch_pages') as stage:
+            while more_pages:
+                result = get_tasks_page(page)
+                tasks = result.get('tasks', [])
                 
-                # Проверяем, есть ли еще задачи по размеру страницы
-                if len(tasks) < 100:  # 100 - максимальное количество задач на странице
+                if not tasks:
                     more_pages = False
+                else:
+                    sync_staging.save_page(page, tasks)
+                    stage['items'] += len(tasks)
+                    page += 1
+                    
+                    # Проверяем, есть ли еще задачи по размеру страницы
+                    if len(tasks) < 100:  # 100 - максимальное количество задач на странице
+                        more_pages = False
         
-        # Отладочный вывод
-        logger.info(f"Загружено всего задач: {len(all_tasks)}")
-        if all_tasks:
-            task_sample = all_tasks[0]
-            logger.info(f"Пример задачи: {json.dumps(task_sample, ensure_ascii=False)}")
-            if 'project' in task_sample:
-                logger.info(f"Информация о проекте: {json.dumps(task_sample['project'], ensure_ascii=False)}")
-
         # Получаем актуальный список проектов
-        all_projects = get_projects()
-        logger.info(f"Получено проектов: {len(all_projects)}")
-        
-        # Создаем карту проектов для быстрого доступа по ID
-        project_map = {}
-        for project in all_projects:
-            if 'id' in project and 'name' in project and project['name']:
-                project_map[str(project['id'])] = project['name']
-        
-        logger.info(f"Создана карта проектов с {len(project_map)} элементами")
-        
-        # Проверяем, что данные проектов корректны
-        projects_fixed = 0
-        for task in all_tasks:
-            if 'project' in task and task['project'] is not None:
-                project = task['project']
-                
-                # Если у проекта нет имени или имя в формате "Проект ID", исправляем его
-                if 'name' not in project or project['name'] is None or project['name'].startswith('Проект '):
-                    # Если ID проекта есть в карте, устанавливаем правильное имя
-                    if 'id' in project and str(project['id']) in project_map:
-                        project['name'] = project_map[str(project['id'])]
-                        projects_fixed += 1
-                        logger.debug(f"Исправлен проект {project['id']}: {project['name']}")
-                    # Иначе используем ID как часть имени
-                    elif 'id' in project:
-                        project['name'] = f"Проект {project['id']}"
-                        logger.debug(f"Создано имя для проекта {project['id']}")
-        
-        logger.info(f"Исправлено проектов: {projects_fixed}")
+        with track_stage('fetch_projects') as stage:
+            all_projects = get_projects()
+            stage['items'] = len(all_projects)
+    except PlanfixAPIError as e:
+        # Неполный список задач не должен заменить кэш
+        logger.error(f"Синхронизация задач прервана на странице {page}: {e}")
+        if force or not cache_exists:
+            raise
+        return planfix_cache.get_all_tasks()
+    
+    with track_stage('load_staged_pages') as stage:
+        all_tasks = sync_staging.load_tasks()
+        stage['items'] = len(all_tasks)
+    
+    # Отладочный вывод
+    logger.info(f"Загружено всего задач: {len(all_tasks)}")
+    
+    # Неполная синхронизация не должна заменить хорошие данные
+    if not allow_shrink:
+        previous_count = len(planfix_cache.get_task_index())
+        try:
+            check_snapshot_shrink(previous_count, len(all_tasks))
+        except SnapshotRejectedError as e:
+            logger.error(str(e))
+            # Подозрительные страницы не должны попасть в следующую попытку
+            sync_staging.clear()
+            if force:
+                raise
+            return planfix_cache.get_all_tasks()
+    
+    if all_tasks:
+        task_sample = all_tasks[0]
+        logger.info(f"Пример задачи: {json.dumps(task_sample, ensure_ascii=False)}")
+        if 'project' in task_sample:
+            logger.info(f"Информация о проекте: {json.dumps(task_sample['project'], ensure_ascii=False)}")
+
+    logger.info(f"Получено проектов: {len(all_projects)}")
+    
+    with track_stage('normalize') as stage:
+        _normalize_project_names(all_tasks, all_projects)
+        stage['items'] = len(all_tasks)
+    
+    # Сохраняем задачи в кэш
+    with track_stage('publish', cache_name='tasks') as stage:
+        with snapshot_write_lock():
+            save_tasks_cache(all_tasks)
+        stage['items'] = len(all_tasks)
+        stage['bytes'] = TASKS_CACHE_FILE.stat().st_size
+    sync_staging.clear()
+    sync_tiers.mark_synced(TIER_COLD, len(all_tasks))
+    
+    # Каталог проектов обновляется вместе с полной синхронизацией; пустой список - признак ошибки загрузки
+    if all_projects:
+        project_catalogue.save(all_projects)
+    
+    return all_tasks
+
+def _sync_hot_tier(force, allow_shrink):
+    """
+    Загружает из Planfix только незавершенные задачи и сливает их с опубликованным снимком.
+    
+    Завершенные задачи берутся из снимка (их обновляет холодный уровень). Задачи, которые
+    были активными, но пропали из горячего уровня (завершены или удалены), запрашиваются
+    по одной; если таких задач слишком много, выполняется полная синхронизация.
+    
+    :return: Список всех задач
+    """
+    logger.info("Обновление горячего уровня кэша задач Planfix (незавершенные задачи)")
+    hot_tasks = []
+    page = 0
+    
+    try:
+        with track_stage('fetch_hot_pages') as stage:
+            while True:
+                tasks = get_tasks_page(page, filters=TIERED_SYNC['hot_filters']).get('tasks', [])
+                hot_tasks.extend(tasks)
+                stage['items'] += len(tasks)
+                page += 1
+                if len(tasks) < TASKS_REQUEST['pageSize']:
+                    break
         
-        # Сохраняем задачи в кэш
-        with open(TASKS_CACHE_FILE, 'w', encoding='utf-8') as f:
-            json.dump(all_tasks, f, ensure_ascii=False, indent=2)
+        # Пропавшие из горячего уровня задачи: завершенные получаем заново, удаленные убираем
+        index = planfix_cache.get_task_index()
+        active_ids = [str(task.get('id')) for task in index.tasks if not planfix_cache._is_task_completed(task)]
+        departed = find_departed(active_ids, hot_tasks)
+        if len(departed) > TIERED_SYNC['max_departed']:
+            logger.warning(
+                f"Из горячего уровня пропало {len(departed)} задач, выполняем полную синхронизацию"
+            )
+            return _sync_tasks_from_planfix(force, True, allow_shrink)
         
-        # Обновляем время последнего обновления
-        with open(LAST_UPDATE_FILE, 'w') as f:
-            f.write(str(time.time()))
+        with track_stage('fetch_departed') as stage:
+            resolved = {}
+            for task_id in departed:
+                # Удаленной считается только задача, на которую Planfix ответил 404;
+                # любая другая ошибка (401, 403, 5xx) прерывает синхронизацию горячего уровня
+                task = get_task_detail(task_id, priority=PRIORITY_BACKGROUND)
+                resolved[task_id] = task or None
+            stage['items'] = len(resolved)
+    except PlanfixAPIError as e:
+        logger.error(f"Синхронизация горячего уровня прервана: {e}")
+        if force:
+            raise
+        return planfix_cache.get_all_tasks()
+    
+    with track_stage('normalize') as stage:
+        _normalize_project_names(hot_tasks, project_catalogue.get_projects() or planfix_cache.get_projects())
+        stage['items'] = len(hot_tasks)
+    
+    with track_stage('publish', cache_name='tasks') as stage:
+        with snapshot_write_lock():
+            # Сливаем с актуальным снимком: вебхуки могли изменить его во время загрузки
+            previous_tasks = planfix_cache.get_task_index().tasks
+            all_tasks = merge_hot_tier(previous_tasks, hot_tasks, resolved)
+            
+            if not allow_shrink:
+                try:
+                    check_snapshot_shrink(len(previous_tasks), len(all_tasks))
+                except SnapshotRejectedError as e:
+                    logger.error(str(e))
+                    if force:
+                        raise
+                    return list(previous_tasks)
             
-        return all_tasks
+            save_tasks_cache(all_tasks, source='hot_sync')
+        stage['items'] = len(all_tasks)
+        stage['bytes'] = TASKS_CACHE_FILE.stat().st_size
+    sync_tiers.mark_synced(TIER_HOT, len(hot_tasks))
+    
+    logger.info(
+        f"Горячий уровень обновлен: {len(hot_tasks)} незавершенных задач, "
+        f"{len(departed)} пропавших, всего в снимке {len(all_tasks)}"
+    )
+    return all_tasks
+
+def _normalize_project_names(all_tasks, all_projects):
+    """
+    Исправляет названия проектов в задачах по списку проектов Planfix
+    
+    :param all_tasks: Задачи, изменяются на месте
+    :param all_projects: Проекты с полями id и name
+    :return: Количество исправленных проектов
+    """
+    # Создаем карту проектов для быстрого доступа по ID
+    project_map = {}
+    for project in all_projects:
+        if 'id' in project and 'name' in project and project['name']:
+            project_map[str(project['id'])] = project['name']
+    
+    logger.info(f"Создана карта проектов с {len(project_map)} элементами")
+    
+    # Проверяем, что данные проектов корректны
+    projects_fixed = 0
+    for task in all_tasks:
+        if 'project' in task and task['project'] is not None:
+            project = task['project']
+            
+            # Если у проекта нет имени или имя в формате "Проект ID", исправляем его
+            if 'name' not in project or project['name'] is None or project['name'].startswith('Проект '):
+                # Если ID проекта есть в карте, устанавливаем правильное имя
+                if 'id' in project and str(project['id']) in project_map:
+                    project['name'] = project_map[str(project['id'])]
+                    projects_fixed += 1
+                    logger.debug(f"Исправлен проект {project['id']}: {project['name']}")
+                # Иначе используем ID как часть имени
+                elif 'id' in project:
+                    project['name'] = f"Проект {project['id']}"
+                    logger.debug(f"Создано имя для проекта {project['id']}")
+    
+    logger.info(f"Исправлено проектов: {projects_fixed}")
+    return projects_fixed
+
+class SnapshotRejectedError(Exception):
+    """Снимок задач отклонен как подозрительно неполный"""
+
+def check_snapshot_shrink(previous_count, new_count):
+    """
+    Проверяет, что новый снимок не стал подозрительно меньше последнего опубликованного
+    
+    :param previous_count: Количество задач в опубликованном снимке
+    :param new_count: Количество задач в новом снимке
+    :raises SnapshotRejectedError: Если снимок уменьшился больше допустимого
+    """
+    if previous_count < SNAPSHOT_SHRINK_GUARD['min_previous_tasks']:
+        return
+    
+    shrink = (previous_count - new_count) / previous_count
+    if shrink > SNAPSHOT_SHRINK_GUARD['max_shrink_ratio']:
+        raise SnapshotRejectedError(
+            f"Снимок задач отклонен: {new_count} задач вместо {previous_count} "
+            f"(уменьшение на {shrink:.0%}), оставлен последний удачный снимок"
+        )
+
+def save_tasks_cache(all_tasks, source='full_sync', changes=None):
+    """
+    Атомарно сохраняет снимок задач, обновляет время последнего обновления
+    и записывает новое поколение в журнал изменений.
+    Читатели никогда не видят наполовину записанный файл.
+    Вызывающий код должен держать snapshot_write_lock().
+    
+    :param all_tasks: Полный список задач
+    :param source: Источник изменений (full_sync, webhook, ...)
+    :param changes: Кортеж (added, changed, removed) с ID задач; если не указан,
+                    изменения вычисляются сравнением с предыдущим снимком
+    :return: Номер нового поколения
+    """
+    previous_tasks = planfix_cache.get_task_index().tasks
+
+    tmp_file = TASKS_CACHE_FILE.with_name(f"{TASKS_CACHE_FILE.name}.{os.getpid()}.tmp")
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        dump_tasks_file(all_tasks, f, indent=2)
+    os.replace(tmp_file, TASKS_CACHE_FILE)
+    
+    # Обновляем время последнего обновления
+    with open(LAST_UPDATE_FILE, 'w') as f:
+        f.write(str(time.time()))
+    
+    if changes is None:
+        generation = task_change_log.record_snapshot_diff(previous_tasks, all_tasks, source)
     else:
-        # Загружаем задачи из кэша
-        with open(TASKS_CACHE_FILE, 'r', encoding='utf-8') as f:
-            all_tasks = json.load(f)
-        return all_tasks
+        added, changed, removed = changes
+        generation = task_change_log.record(added, changed, removed, source)
+
+    # Ошибка записи истории снимков не должна ломать публикацию
+    try:
+        task_history.record(generation, previous_tasks, all_tasks)
+    except Exception as e:
+        logger.error(f"Ошибка при записи истории снимков: {str(e)}", exc_info=True)
+
+    return generation
 
 def get_active_tasks():
     """
@@ -200,7 +461,8 @@ def is_task_completed(task):
 
 def get_task_by_id(task_id):
     """
-    Получение задачи по ID из кэша или API
+    Получение задачи по ID: свежие данные из Planfix через read-through кэш,
+    с откатом на копию из общего кэша, если Planfix отвечает медленно
     
     :param task_id: ID задачи
     :return: Задача или None, если не найдена
@@ -211,29 +473,20 @@ def get_task_by_id(task_id):
     # Логирование запроса
     logger.info(f"Запрос задачи с ID {task_id_str}")
     
-    # Сначала пытаемся найти в кэше
-    all_tasks = get_all_tasks()
-    logger.debug(f"Поиск задачи {task_id_str} в кэше, всего задач: {len(all_tasks)}")
-    
-    for task in all_tasks:
-        if str(task.get('id')) == task_id_str:
-            logger.info(f"Задача {task_id_str} найдена в кэше")
-            return task
-    
-    # Если в кэше нет, запрашиваем напрямую через API
     try:
-        logger.info(f"Задача {task_id_str} не найдена в кэше, запрашиваем из API")
-        task = get_task_detail(task_id)
+        # Копия из общего кэша (по индексу, без полного обновления кэша)
+        snapshot_task = planfix_cache.get_task_by_id(task_id_str)
+        
+        task = task_detail_cache.get(task_id_str, fallback=snapshot_task)
         
         if task:
-            logger.info(f"Задача {task_id_str} успешно получена из API")
             return task
-        else:
-            logger.warning(f"API вернул пустой результат для задачи {task_id_str}")
-            return None
+        
+        logger.warning(f"Задача {task_id_str} не найдена ни в кэше, ни в API")
+        return None
             
     except Exception as e:
-        logger.error(f"Ошибка при получении задачи {task_id_str} через API: {str(e)}", exc_info=True)
+        logger.error(f"Ошибка при получении задачи {task_id_str}: {str(e)}", exc_info=True)
         return None
 
 def format_task_for_claude(task):
@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import shutil
+import time
+from typing import Dict, List, Any, Optional
+
+from .planfix_cache_service import file_lock, CACHE_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Pages of an unfinished full sync
+SYNC_STAGING_DIR = CACHE_DIR / 'sync_staging'
+
+class SyncStaging:
+    """
+    Per-page checkpoints of a full Planfix sync.
+
+    Every fetched page is written to the staging directory before the next
+    one is requested. If the sync is interrupted, the next run within
+    resume_window seconds continues from the first missing page instead of
+    offset 0. The published snapshot is only replaced once all pages are
+    staged, and the staging area is cleared after publishing.
+
+    A whole staged run holds run_lock, so overlapping syncs in any process
+    (scheduled and forced) cannot reset or mix each other's pages.
+
+    Pages are fetched by offset, so tasks created or deleted between an
+    interruption and the resume can shift by a page boundary: duplicates
+    are dropped when pages are merged, and a missed task is picked up by
+    webhooks or the next full sync.
+    """
+
+    def __init__(self, staging_dir=SYNC_STAGING_DIR):
+        """Initialize the staging area"""
+        self.staging_dir = staging_dir
+        self.manifest_file = staging_dir / 'manifest.json'
+        # Outside the staging directory, which clear() removes
+        self.lock_file = staging_dir.with_name(f'.{staging_dir.name}.lock')
+
+    def run_lock(self):
+        """Lock to hold from begin() until the staged pages are published or dropped"""
+        return file_lock(self.lock_file)
+
+    def _load_manifest(self) -> Optional[Dict[str, Any]]:
+        """Load the staging manifest"""
+        if not self.manifest_file.exists():
+            return None
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading sync staging manifest: {e}")
+            return None
+
+    def _save_manifest(self, manifest: Dict[str, Any]):
+        """Atomically write the staging manifest"""
+        tmp_file = self.manifest_file.with_name(f"{self.manifest_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_file, self.manifest_file)
+
+    def _page_file(self, page: int):
+        """Get the file of a staged page"""
+        return self.staging_dir / f"page_{page:05d}.json"
+
+    def begin(self, page_size: int, resume_window: float) -> int:
+        """
+        Start or resume a sync
+
+        Args:
+            page_size: Page size of the sync (a different size invalidates staged pages)
+            resume_window: Maximum age in seconds of the last checkpoint to resume from
+
+        Returns:
+            The first page to fetch
+        """
+        manifest = self._load_manifest()
+        now = time.time()
+
+        if (manifest and manifest.get('page_size') == page_size
+                and now - manifest.get('updated_at', 0) <= resume_window
+                and all(self._page_file(page).exists() for page in range(manifest['pages_done']))):
+            logger.info(
+                f"Resuming interrupted sync from page {manifest['pages_done']} "
+                f"(started {int(now - manifest['started_at'])}s ago)"
+            )
+            return manifest['pages_done']
+
+        self.clear()
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self._save_manifest({'started_at': now, 'updated_at': now, 'page_size': page_size, 'pages_done': 0})
+        return 0
+
+    def save_page(self, page: int, tasks: List[Dict[str, Any]]):
+        """Checkpoint a fetched page"""
+        page_file = self._page_file(page)
+        tmp_file = page_file.with_name(f"{page_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(tasks, f, ensure_ascii=False)
+        os.replace(tmp_file, page_file)
+
+        manifest = self._load_manifest() or {'started_at': time.time(), 'page_size': len(tasks)}
+        manifest['pages_done'] = page + 1
+        manifest['updated_at'] = time.time()
+        self._save_manifest(manifest)
+
+    def load_tasks(self) -> List[Dict[str, Any]]:
+        """Merge staged pages in order, dropping tasks repeated across pages"""
+        manifest = self._load_manifest() or {'pages_done': 0}
+        tasks_by_id = {}
+        for page in range(manifest['pages_done']):
+            with open(self._page_file(page), 'r', encoding='utf-8') as f:
+                for task in json.load(f):
+                    tasks_by_id.setdefault(str(task.get('id')), task)
+        return list(tasks_by_id.values())
+
+    def get_status(self) -> Optional[Dict[str, Any]]:
+        """Get the checkpoint of an unfinished sync, if any"""
+        return self._load_manifest()
+
+    def clear(self):
+        """Drop all staged pages"""
+        if self.staging_dir.exists():
+            shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+# Singleton instance
+sync_staging = SyncStaging()
@@ -0,0 +1,113 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Any, Optional, Iterable
+
+from .planfix_cache_service import CACHE_DIR
+from .planfix_config import TIERED_SYNC
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+SYNC_TIERS_FILE = CACHE_DIR / 'sync_tiers.json'
+
+TIER_HOT = 'hot'
+TIER_COLD = 'cold'
+
+class SyncTierState:
+    """
+    When each sync tier last ran.
+
+    The hot tier re-downloads only tasks that are not completed, the cold
+    tier is the full account listing. A cold sync also counts as a hot
+    one, since it covers every task.
+    """
+
+    def __init__(self, state_file=SYNC_TIERS_FILE, hot_interval: float = TIERED_SYNC['hot_interval'],
+                 cold_interval: float = TIERED_SYNC['cold_interval']):
+        """Initialize the tier state"""
+        self.state_file = state_file
+        self.hot_interval = hot_interval
+        self.cold_interval = cold_interval
+
+    def _load(self) -> Dict[str, Any]:
+        """Load the state from disk"""
+        if not self.state_file.exists():
+            return {}
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading sync tier state: {e}")
+            return {}
+
+    def mark_synced(self, tier: str, task_count: int):
+        """Record a finished sync of a tier"""
+        state = self._load()
+        now = time.time()
+        state[f'{tier}_synced_at'] = now
+        state[f'{tier}_task_count'] = task_count
+        if tier == TIER_COLD:
+            state['hot_synced_at'] = now
+
+        tmp_file = self.state_file.with_name(f"{self.state_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_file, self.state_file)
+
+    def get_due_tier(self) -> str:
+        """Get the tier the next sync should run: cold once it is older than cold_interval"""
+        cold_synced_at = self._load().get('cold_synced_at')
+        if cold_synced_at is None or time.time() - cold_synced_at > self.cold_interval:
+            return TIER_COLD
+        return TIER_HOT
+
+    def get_status(self) -> Dict[str, Any]:
+        """Get the last sync times and the next due tier"""
+        return dict(self._load(), next_tier=self.get_due_tier(),
+                    hot_interval=self.hot_interval, cold_interval=self.cold_interval)
+
+def merge_hot_tier(snapshot: List[Dict[str, Any]], hot_tasks: List[Dict[str, Any]],
+                   resolved: Dict[str, Optional[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Merge a hot tier download into the published snapshot
+
+    Args:
+        snapshot: Tasks of the published snapshot
+        hot_tasks: Every task that is currently not completed
+        resolved: Tasks that were active in the snapshot but missing from the hot
+            tier, re-fetched one by one; None for tasks deleted in Planfix
+
+    Returns:
+        The merged task list, keeping the snapshot order for existing tasks
+    """
+    replacements = {str(task_id): task for task_id, task in resolved.items()}
+    for task in hot_tasks:
+        replacements[str(task.get('id'))] = task
+
+    merged = []
+    seen = set()
+    for task in snapshot:
+        task_id = str(task.get('id'))
+        if task_id in replacements:
+            task = replacements[task_id]
+            if task is None:
+                continue
+        merged.append(task)
+        seen.add(task_id)
+
+    for task_id, task in replacements.items():
+        if task is not None and task_id not in seen:
+            merged.append(task)
+            seen.add(task_id)
+
+    return merged
+
+def find_departed(active_ids: Iterable[str], hot_tasks: List[Dict[str, Any]]) -> List[str]:
+    """Get IDs of snapshot tasks that were active but are missing from the hot tier"""
+    hot_ids = {str(task.get('id')) for task in hot_tasks}
+    return [task_id for task_id in active_ids if task_id not in hot_ids]
+
+# Singleton instance
+sync_tiers = SyncTierState()
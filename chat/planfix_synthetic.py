@@ -0,0 +1,134 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+from typing import Dict, List, Any, Iterator, Optional
+
+# Statuses with their share of tasks in a typical account
+STATUSES = [
+    ({'id': 3, 'name': 'Завершенная', 'isActive': False}, 0.43),
+    ({'id': 2, 'name': 'В работе', 'isActive': True}, 0.24),
+    ({'id': 0, 'name': 'Черновик', 'isActive': False}, 0.16),
+    ({'id': 1, 'name': 'Новая', 'isActive': True}, 0.12),
+    ({'id': 6, 'name': 'Выполненная', 'isActive': True}, 0.03),
+    ({'id': 7, 'name': 'Отмененная', 'isActive': False}, 0.01),
+    ({'id': 5, 'name': 'Completed', 'isActive': False}, 0.01)
+]
+
+FIRST_NAMES_RU = ['Александр', 'Мария', 'Дмитрий', 'Анна', 'Сергей', 'Елена', 'Андрей', 'Ольга',
+                  'Алексей', 'Наталья', 'Иван', 'Татьяна', 'Михаил', 'Ирина', 'Константин', 'Вячеслав']
+LAST_NAMES_RU = ['Иванов', 'Смирнова', 'Кузнецов', 'Попова', 'Васильев', 'Петрова', 'Соколов',
+                 'Михайлова', 'Новиков', 'Федорова', 'Морозов', 'Волкова', 'Осипов', 'Фоменко']
+FIRST_NAMES_EN = ['John', 'Emily', 'Michael', 'Sarah', 'David', 'Laura', 'James', 'Anna', 'Robert', 'Kate']
+LAST_NAMES_EN = ['Smith', 'Johnson', 'Brown', 'Taylor', 'Miller', 'Wilson', 'Clark', 'Walker']
+
+PROJECT_WORDS_RU = ['Маркетинг', 'Продажи', 'Разработка', 'Поддержка', 'Финансы', 'Логистика',
+                    'Закупки', 'HR', 'Обучение', 'Внедрение', 'Сайт', 'Склад']
+PROJECT_WORDS_EN = ['Marketing', 'Sales', 'Platform', 'Support', 'Finance', 'Mobile App',
+                    'Onboarding', 'Infrastructure', 'Website', 'Analytics']
+
+TASK_TEMPLATES_RU = ['Подготовить отчет по {topic}', 'Согласовать договор с {topic}', 'Проверить {topic}',
+                     'Позвонить клиенту по {topic}', 'Обновить документацию {topic}',
+                     'Исправить ошибку в {topic}', 'Провести встречу по {topic}', 'Оплатить счет {topic}']
+TASK_TEMPLATES_EN = ['Prepare report on {topic}', 'Review {topic}', 'Fix bug in {topic}',
+                     'Update {topic} documentation', 'Call customer about {topic}', 'Deploy {topic}']
+TOPICS_RU = ['поставщику', 'бюджету', 'CRM', 'рекламной кампании', 'складу', 'сайту', 'интеграции', 'отчетности']
+TOPICS_EN = ['billing', 'checkout', 'CRM sync', 'landing page', 'payroll', 'API', 'warehouse', 'dashboard']
+
+DESCRIPTION_PARTS = [
+    'Нужно сделать до конца недели.', 'Подробности в переписке с клиентом.',
+    '<p>Чек-лист:</p><ul><li>проверить данные</li><li>согласовать с руководителем</li></ul>',
+    'See the attached spec for details.', 'Blocked until the contract is signed.', ''
+]
+
+def _zipf_cum_weights(count: int, exponent: float) -> List[float]:
+    """Cumulative Zipf weights: a few items get most of the tasks"""
+    return list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(count)))
+
+def _person(rng: random.Random, person_id: int) -> Dict[str, Any]:
+    """Generate a Planfix user reference with a Russian or English name"""
+    if rng.random() < 0.75:
+        name = f"{rng.choice(FIRST_NAMES_RU)} {rng.choice(LAST_NAMES_RU)}"
+    else:
+        name = f"{rng.choice(FIRST_NAMES_EN)} {rng.choice(LAST_NAMES_EN)}"
+    return {'id': f"user:{person_id}", 'name': name}
+
+def _format_end_date(rng: random.Random, due: datetime) -> Any:
+    """Render a due date in one of the endDateTime variants seen in Planfix payloads"""
+    variant = rng.random()
+    if variant < 0.6:
+        return {'date': due.strftime('%d-%m-%Y'), 'time': '00:00', 'datetime': due.strftime('%Y-%m-%dT%H:%MZ')}
+    if variant < 0.85:
+        return {'dateTo': due.date().isoformat()}
+    return due.date().isoformat()
+
+def generate_tasks(count: int, seed: int = 42, start_id: int = 1,
+                   today: Optional[datetime] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Generate Planfix-shaped task payloads
+
+    Projects and assignees follow Zipf distributions, assignees come both as
+    a plain list and as {'users': [...], 'groups': []}, and due dates use all
+    endDateTime variants (or are missing). Output is deterministic for a seed.
+
+    Args:
+        count: Number of tasks
+        seed: Random seed
+        start_id: ID of the first task
+        today: Reference date for due dates (defaults to now)
+
+    Yields:
+        Task dicts
+    """
+    rng = random.Random(seed)
+    today = today or datetime.now()
+
+    project_count = min(2000, max(10, count // 200))
+    user_count = min(5000, max(20, count // 500))
+
+    projects = []
+    for project_id in range(1, project_count + 1):
+        words = PROJECT_WORDS_RU if rng.random() < 0.7 else PROJECT_WORDS_EN
+        projects.append({'id': project_id, 'name': f"{rng.choice(words)} {project_id}"})
+    users = [_person(rng, user_id) for user_id in range(1, user_count + 1)]
+
+    project_weights = _zipf_cum_weights(project_count, 1.1)
+    user_weights = _zipf_cum_weights(user_count, 1.0)
+    status_weights = list(accumulate(share for _, share in STATUSES))
+
+    for task_id in range(start_id, start_id + count):
+        if rng.random() < 0.75:
+            template = rng.choice(TASK_TEMPLATES_RU).format(topic=rng.choice(TOPICS_RU))
+        else:
+            template = rng.choice(TASK_TEMPLATES_EN).format(topic=rng.choice(TOPICS_EN))
+
+        status = rng.choices(STATUSES, cum_weights=status_weights)[0][0]
+        task = {
+            'id': task_id,
+            'name': f"{template} #{task_id}",
+            'description': ' '.join(rng.sample(DESCRIPTION_PARTS, rng.randint(0, 3))),
+            'status': dict(status),
+            'assigner': rng.choices(users, cum_weights=user_weights)[0]
+        }
+
+        if rng.random() < 0.9:
+            task['project'] = dict(rng.choices(projects, cum_weights=project_weights)[0])
+
+        assignee_roll = rng.random()
+        if assignee_roll < 0.9:
+            assignees = []
+            for person in rng.choices(users, cum_weights=user_weights, k=rng.choice((1, 1, 1, 2, 3))):
+                if person not in assignees:
+                    assignees.append(person)
+            task['assignees'] = {'users': assignees, 'groups': []} if assignee_roll < 0.7 else assignees
+
+        start = today - timedelta(days=rng.randint(0, 720))
+        if rng.random() < 0.5:
+            task['startDateTime'] = {'date': start.strftime('%d-%m-%Y'), 'datetime': start.strftime('%Y-%m-%dT%H:%MZ')}
+        if rng.random() < 0.6:
+            task['endDateTime'] = _format_end_date(rng, start + timedelta(days=rng.randint(1, 120)))
+
+        yield task
+
+def generate_dataset(count: int, seed: int = 42) -> List[Dict[str, Any]]:
+    """Generate a full synthetic snapshot"""
+    return list(generate_tasks(count, seed=seed))
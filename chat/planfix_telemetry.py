@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, List, Any, Optional
+
+from django.conf import settings
+
+from . import planfix_api
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Per-stage peak memory needs tracemalloc, which slows down every allocation of the
+# process while a refresh runs (including web workers), so it is opt-in
+TRACE_MEMORY = getattr(settings, 'PLANFIX_TELEMETRY_TRACE_MEMORY', False)
+
+_local = threading.local()
+
+# Refresh runs traced at the moment, and whether tracing was started by them
+_tracing_lock = threading.Lock()
+_tracing = {'runs': 0, 'started': False}
+
+def _start_tracing():
+    """Start tracemalloc for a run unless it is already tracing"""
+    with _tracing_lock:
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing['started'] = True
+        _tracing['runs'] += 1
+
+def _stop_tracing():
+    """Stop tracemalloc after the last traced run, if runs started it"""
+    with _tracing_lock:
+        _tracing['runs'] -= 1
+        if _tracing['runs'] == 0 and _tracing['started']:
+            tracemalloc.stop()
+            _tracing['started'] = False
+
+class RefreshRun:
+    """
+    Telemetry of one cache refresh: wall time, item count, bytes and peak
+    memory of every stage. Stages are measured one after another and must
+    not be nested, since each stage resets the tracemalloc peak.
+    """
+
+    def __init__(self, kind: str):
+        """Initialize the run"""
+        self.refresh_id = str(uuid.uuid4())
+        self.kind = kind
+        self.started_at = time.time()
+        self.stages: List[Dict[str, Any]] = []
+        self.success = True
+
+    @contextmanager
+    def stage(self, name: str, cache_name: Optional[str] = None):
+        """
+        Measure a stage; the caller fills record['items'] and, if known, record['bytes']
+
+        Args:
+            name: Stage name (fetch_pages, normalize, derived:users, publish, ...)
+            cache_name: PlanfixCache row updated with the stage results
+        """
+        record = {
+            'stage': name,
+            'cache_name': cache_name,
+            'started_at': time.time(),
+            'items': 0,
+            'bytes': None,
+            'peak_memory': 0,
+            'success': True
+        }
+        transfer_before = planfix_api.transfer_stats['bytes']
+        memory_before = 0
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+
+        try:
+            yield record
+        except Exception:
+            record['success'] = False
+            raise
+        finally:
+            record['duration'] = time.perf_counter() - started
+            if tracemalloc.is_tracing():
+                record['peak_memory'] = max(0, tracemalloc.get_traced_memory()[1] - memory_before)
+            if record['bytes'] is None:
+                # Stages that talk to Planfix report the downloaded bytes
+                record['bytes'] = planfix_api.transfer_stats['bytes'] - transfer_before
+            self.stages.append(record)
+
+    def save(self):
+        """Persist the run into PlanfixRefreshStage and the per-cache PlanfixCache rows"""
+        from .models import PlanfixCache, PlanfixRefreshStage
+
+        try:
+            PlanfixRefreshStage.objects.bulk_create([
+                PlanfixRefreshStage(
+                    refresh_id=self.refresh_id,
+                    refresh_kind=self.kind,
+                    stage=record['stage'],
+                    started_at=datetime.fromtimestamp(record['started_at'], tz=dt_timezone.utc),
+                    duration=record['duration'],
+                    items_count=record['items'],
+                    bytes_count=record['bytes'],
+                    peak_memory=record['peak_memory'],
+                    success=record['success']
+                )
+                for record in self.stages
+            ])
+
+            for record in self.stages:
+                if record['cache_name']:
+                    PlanfixCache.objects.update_or_create(
+                        cache_name=record['cache_name'],
+                        defaults={
+                            'entries_count': record['items'],
+                            'update_duration': record['duration'],
+                            'is_valid': record['success']
+                        }
+                    )
+        except Exception as e:
+            logger.error(f"Error saving refresh telemetry: {e}", exc_info=True)
+
+        summary = ', '.join(f"{record['stage']}={record['duration']:.2f}s" for record in self.stages)
+        logger.info(f"Planfix {self.kind} {'finished' if self.success else 'failed'} in "
+                    f"{time.time() - self.started_at:.2f}s: {summary}")
+
+@contextmanager
+def refresh_run(kind: str):
+    """
+    Collect stage telemetry for a refresh on the current thread
+
+    Nested calls join the outer run, so a full refresh that triggers a
+    sync is stored as one run.
+    """
+    run = getattr(_local, 'run', None)
+    if run is not None:
+        yield run
+        return
+
+    traced = TRACE_MEMORY
+    if traced:
+        _start_tracing()
+
+    run = RefreshRun(kind)
+    _local.run = run
+    try:
+        yield run
+    except Exception:
+        run.success = False
+        raise
+    finally:
+        _local.run = None
+        if traced:
+            _stop_tracing()
+        run.save()
+
+@contextmanager
+def track_stage(name: str, cache_name: Optional[str] = None):
+    """Measure a stage of the current refresh run (no-op outside a run)"""
+    run = getattr(_local, 'run', None)
+    if run is None:
+        yield {'items': 0, 'bytes': None}
+        return
+
+    with run.stage(name, cache_name) as record:
+        yield record
+
+def get_recent_runs(limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Get the latest refresh runs with their stages, newest first
+
+    Returns:
+        List of {'refresh_id', 'kind', 'started_at', 'duration', 'success', 'stages'} dicts
+    """
+    from .models import PlanfixRefreshStage
+
+    # A run has a dozen stages; de-duplicate in Python to keep the newest-first order
+    refresh_ids = PlanfixRefreshStage.objects.values_list('refresh_id', flat=True).order_by('-started_at')[:limit * 20]
+    seen = []
+    for refresh_id in refresh_ids:
+        if refresh_id not in seen:
+            seen.append(refresh_id)
+        if len(seen) == limit:
+            break
+
+    runs = {}
+    for stage in PlanfixRefreshStage.objects.filter(refresh_id__in=seen).order_by('started_at'):
+        run = runs.setdefault(stage.refresh_id, {
+            'refresh_id': stage.refresh_id,
+            'kind': stage.refresh_kind,
+            'started_at': stage.started_at,
+            'duration': 0.0,
+            'success': True,
+            'stages': []
+        })
+        run['duration'] += stage.duration
+        run['success'] = run['success'] and stage.success
+        run['stages'].append(stage)
+
+    return [runs[refresh_id] for refresh_id in seen if refresh_id in runs]
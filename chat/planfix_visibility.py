@@ -0,0 +1,207 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError, wait
+from typing import Dict, List, Any, Optional, FrozenSet, Union
+
+from .planfix_api import get_task_ids
+from .planfix_cache_service import CACHE_DIR
+from .planfix_config import API_TOKEN, PLANFIX_ACCOUNT, TASK_VISIBILITY
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# One file of visible task IDs per distinct user token
+VISIBILITY_DIR = CACHE_DIR / 'visibility'
+
+def token_key(token: str) -> str:
+    """Get the file key of a token; tokens themselves are never written to disk"""
+    return hashlib.sha256(f"{PLANFIX_ACCOUNT}:{token}".encode('utf-8')).hexdigest()[:24]
+
+class TaskVisibility:
+    """
+    Per-user task visibility for users with their own Planfix API token.
+
+    Task data is synced once for the account with the shared token, and a
+    user's token is only used to list the IDs of the tasks it can see
+    (task/list with fields=id). IDs are kept as one set per distinct token,
+    so users sharing a token share the set and its download, and concurrent
+    downloads for one token in a process share the in-flight one. Users
+    without a token of their own see every task of the account; anonymous
+    users and calls without a user see none.
+    """
+
+    def __init__(self, ttl: float = 900, wait_timeout: float = 5.0, refresh_timeout: float = 300,
+                 max_workers: int = 2, visibility_dir=VISIBILITY_DIR):
+        """Initialize the visibility sets"""
+        self.ttl = ttl
+        self.wait_timeout = wait_timeout
+        self.refresh_timeout = refresh_timeout
+        self.visibility_dir = visibility_dir
+        self._sets: Dict[str, tuple] = {}
+        self._inflight: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='planfix-visibility')
+
+    def _get_token(self, user) -> Optional[str]:
+        """Get the user's own token, or None when the user uses the shared one"""
+        token = getattr(user, 'planfix_api_token', None)
+        if not token or token == API_TOKEN:
+            return None
+        return token
+
+    def _get_file(self, key: str):
+        """Get the ID set file of a token key"""
+        return self.visibility_dir / f'{key}.json'
+
+    def _load(self, key: str) -> Optional[tuple]:
+        """Get (synced_at, task IDs) of a token key, reloading the file when it changes"""
+        visibility_file = self._get_file(key)
+        try:
+            stat = visibility_file.stat()
+        except OSError:
+            return None
+        version = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            cached = self._sets.get(key)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+        try:
+            with open(visibility_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (json.JSONDecodeError, IOError) as e:
+            logger.error(f"Error reading task visibility {key}: {e}")
+            return None
+
+        entry = (data['synced_at'], frozenset(data['task_ids']))
+        with self._lock:
+            self._sets[key] = (version, entry)
+        return entry
+
+    def _save(self, key: str, task_ids: List[str]):
+        """Store the task IDs of a token key"""
+        self.visibility_dir.mkdir(parents=True, exist_ok=True)
+        visibility_file = self._get_file(key)
+        tmp_file = visibility_file.with_name(f"{visibility_file.name}.{os.getpid()}.tmp")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'synced_at': time.time(), 'task_ids': sorted(set(task_ids))}, f)
+        os.replace(tmp_file, visibility_file)
+
+    def refresh_token(self, token: str, wait: Optional[float] = None) -> bool:
+        """
+        Download the IDs of the tasks visible with a token
+
+        Args:
+            token: User's Planfix API token
+            wait: Seconds to wait for the result (None: wait_timeout, 0: run in the background)
+
+        Returns:
+            Whether the download finished successfully within the wait
+        """
+        future = self._submit(token_key(token), token)
+        wait = self.wait_timeout if wait is None else wait
+        if wait <= 0:
+            return False
+        try:
+            return future.result(timeout=wait)
+        except FutureTimeoutError:
+            return False
+
+    def _submit(self, key: str, token: str):
+        """Start a download of a token's IDs, or join the one in flight"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is None:
+                future = self._executor.submit(self._run, key, token)
+                self._inflight[key] = future
+            return future
+
+    def _run(self, key: str, token: str) -> bool:
+        """Run a download and release the in-flight slot"""
+        try:
+            self._save(key, get_task_ids(token))
+            return True
+        except Exception as e:
+            logger.error(f"Error loading task visibility {key}: {e}")
+            return False
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def get_visible_ids(self, user) -> Optional[FrozenSet[str]]:
+        """
+        Get the IDs of the tasks a user can see
+
+        A missing set is downloaded (waiting up to wait_timeout), a stale one
+        is refreshed in the background while the current one is used.
+
+        Returns:
+            Set of task IDs (empty until the first download succeeds, for
+            anonymous users and for user=None), or None when the user sees every task
+        """
+        if user is None or not getattr(user, 'is_authenticated', False):
+            return frozenset()
+        token = self._get_token(user)
+        if token is None:
+            return None
+
+        key = token_key(token)
+        entry = self._load(key)
+        if entry is None:
+            self.refresh_token(token)
+            entry = self._load(key)
+            if entry is None:
+                return frozenset()
+        elif time.time() - entry[0] > self.ttl:
+            self.refresh_token(token, wait=0)
+        return entry[1]
+
+    def filter_tasks(self, user, tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Keep the tasks a user can see"""
+        visible_ids = self.get_visible_ids(user)
+        if visible_ids is None:
+            return tasks
+        return [task for task in tasks if str(task.get('id')) in visible_ids]
+
+    def is_visible(self, user, task_id: Union[str, int]) -> bool:
+        """Check whether a user can see a task"""
+        visible_ids = self.get_visible_ids(user)
+        return visible_ids is None or str(task_id) in visible_ids
+
+    def refresh_all(self) -> Dict[str, int]:
+        """
+        Refresh the sets of every distinct user token and drop the sets of unused tokens
+
+        Returns:
+            Numbers of users with their own token, distinct tokens and failed downloads
+        """
+        from django.contrib.auth import get_user_model
+
+        tokens = [
+            token for token in get_user_model().objects.exclude(planfix_api_token__isnull=True)
+            .exclude(planfix_api_token='').values_list('planfix_api_token', flat=True)
+            if token != API_TOKEN
+        ]
+        distinct_tokens = {token_key(token): token for token in tokens}
+
+        futures = [self._submit(key, token) for key, token in distinct_tokens.items()]
+        # Downloads still running after refresh_timeout count as failed and finish in the background
+        done, not_done = wait(futures, timeout=self.refresh_timeout)
+        failed = len(not_done) + sum(1 for future in done if not future.result())
+
+        if self.visibility_dir.exists():
+            for visibility_file in self.visibility_dir.glob('*.json'):
+                if visibility_file.stem not in distinct_tokens:
+                    visibility_file.unlink(missing_ok=True)
+                    with self._lock:
+                        self._sets.pop(visibility_file.stem, None)
+
+        return {'users': len(tokens), 'tokens': len(distinct_tokens), 'failed': failed}
+
+# Singleton instance
+task_visibility = TaskVisibility(**TASK_VISIBILITY)
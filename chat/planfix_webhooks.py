@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Dict, List, Any
+
+from .planfix_api import get_task_detail, PlanfixRequestError
+from .planfix_cache_service import planfix_cache, file_lock, CACHE_DIR
+from .planfix_detail_cache import task_detail_cache
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+# Append-only queue of received events; each line is one JSON event
+WEBHOOK_QUEUE_FILE = CACHE_DIR / 'webhook_queue.jsonl'
+
+# Lock file held by the worker draining the queue
+WEBHOOK_DRAIN_LOCK_FILE = CACHE_DIR / '.webhook_drain.lock'
+
+# Event types
+EVENT_CREATE = 'create'
+EVENT_UPDATE = 'update'
+EVENT_DELETE = 'delete'
+
+def parse_webhook_payload(payload: Any) -> List[Dict[str, Any]]:
+    """
+    Normalize a Planfix webhook payload into a list of task events.
+
+    Accepted shapes (the body is configured in the Planfix automation):
+        {"event": "task.update", "task": {"id": 123, ...}}
+        {"event": "task.delete", "task_id": 123}
+        {"events": [...]} or a plain list of events
+
+    Returns:
+        List of {'type', 'task_id', 'task', 'received_at'} dicts
+    """
+    if isinstance(payload, dict) and isinstance(payload.get('events'), list):
+        raw_events = payload['events']
+    elif isinstance(payload, list):
+        raw_events = payload
+    else:
+        raw_events = [payload]
+
+    events = []
+    for raw in raw_events:
+        if not isinstance(raw, dict):
+            raise ValueError("Webhook event must be a JSON object")
+
+        event_name = str(raw.get('event') or raw.get('action') or raw.get('type') or '').lower()
+        if 'delete' in event_name or 'remove' in event_name:
+            event_type = EVENT_DELETE
+        elif 'create' in event_name or 'add' in event_name:
+            event_type = EVENT_CREATE
+        elif 'update' in event_name or 'change' in event_name or 'edit' in event_name:
+            event_type = EVENT_UPDATE
+        else:
+            raise ValueError(f"Unknown webhook event: {event_name or '<empty>'}")
+
+        task = raw.get('task') if isinstance(raw.get('task'), dict) else None
+        task_id = (task or {}).get('id') or raw.get('task_id') or raw.get('id')
+        if task_id in (None, ''):
+            raise ValueError("Webhook event has no task id")
+
+        events.append({
+            'type': event_type,
+            'task_id': str(task_id),
+            # Payloads with just an id are completed from the Planfix API when applied
+            'task': task if task and task.get('name') is not None else None,
+            'received_at': time.time()
+        })
+
+    return events
+
+class PlanfixWebhookQueue:
+    """
+    File-backed queue of Planfix task events shared by web and Celery workers.
+
+    Producers append JSON lines (small O_APPEND writes are atomic on Linux).
+    A consumer claims the whole queue by renaming it, so producers keep
+    appending to a fresh file, and a claimed file is only deleted after its
+    events have been applied.
+    """
+
+    def __init__(self, queue_file=WEBHOOK_QUEUE_FILE):
+        """Initialize the queue"""
+        self.queue_file = queue_file
+
+    def enqueue(self, events: List[Dict[str, Any]]):
+        """Append events to the queue"""
+        if not events:
+            return
+
+        lines = ''.join(json.dumps(event, ensure_ascii=False) + '\n' for event in events)
+        with open(self.queue_file, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def pending_count(self) -> int:
+        """Get the number of queued events (including claimed but unapplied ones)"""
+        count = 0
+        for path in [self.queue_file] + self._claimed_files():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    count += sum(1 for line in f if line.strip())
+            except IOError:
+                pass
+        return count
+
+    def _claimed_files(self) -> List[Any]:
+        """Get claimed queue files left over from previous drains"""
+        return sorted(self.queue_file.parent.glob(f"{self.queue_file.name}.*.claimed"))
+
+    def claim(self) -> List[Any]:
+        """Atomically take ownership of all queued events"""
+        if self.queue_file.exists():
+            claimed = self.queue_file.with_name(f"{self.queue_file.name}.{uuid.uuid4().hex}.claimed")
+            try:
+                os.replace(self.queue_file, claimed)
+            except FileNotFoundError:
+                pass  # Another worker claimed it first
+        return self._claimed_files()
+
+    def read(self, claimed_file) -> List[Dict[str, Any]]:
+        """Read events from a claimed file, skipping corrupt lines"""
+        events = []
+        with open(claimed_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"Skipping corrupt webhook queue line: {line[:100]}")
+        return events
+
+def apply_pending_events() -> Dict[str, Any]:
+    """
+    Apply all queued webhook events to the cache in one batch.
+
+    Events are coalesced per task (the last event wins), so a burst of
+    updates to one task costs a single snapshot write.
+
+    Returns:
+        Summary of the applied batch
+    """
+    queue = webhook_queue
+
+    # Draining under a lock of its own keeps concurrent workers from applying the same batch
+    # without holding the snapshot lock while missing task details are loaded from Planfix
+    with file_lock(WEBHOOK_DRAIN_LOCK_FILE):
+        claimed_files = queue.claim()
+        if not claimed_files:
+            return {'events': 0, 'added': 0, 'updated': 0, 'removed': 0, 'skipped': 0}
+
+        started = time.time()
+        events = []
+        for claimed_file in claimed_files:
+            events.extend(queue.read(claimed_file))
+
+        latest = {}
+        for event in sorted(events, key=lambda e: e.get('received_at', 0)):
+            latest[event['task_id']] = event
+
+        upserted = []
+        deleted = []
+        skipped = 0
+        for task_id, event in latest.items():
+            task_detail_cache.invalidate(task_id)
+
+            if event['type'] == EVENT_DELETE:
+                deleted.append(task_id)
+                continue
+
+            try:
+                task = event.get('task') or get_task_detail(task_id)
+            except PlanfixRequestError as e:
+                # Rejected request (e.g. revoked token): neither deleted nor worth blocking the batch on
+                logger.error(f"Planfix rejected loading task {task_id} for webhook event: {e}")
+                task = None
+            if task:
+                upserted.append(task)
+            else:
+                skipped += 1
+                logger.warning(f"Could not load task {task_id} for webhook event, leaving it to the next full sync")
+
+        # Takes the snapshot lock for the patch only
+        summary = planfix_cache.apply_task_changes(upserted, deleted)
+
+        for claimed_file in claimed_files:
+            try:
+                os.remove(claimed_file)
+            except OSError:
+                pass
+
+        summary.update({
+            'events': len(events),
+            'skipped': skipped,
+            'lag_seconds': round(started - min(e.get('received_at', started) for e in events), 2) if events else 0
+        })
+        logger.info(f"Applied webhook batch: {summary}")
+        return summary
+
+# Singleton instance
+webhook_queue = PlanfixWebhookQueue()
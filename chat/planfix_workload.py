@@ -0,0 +1,377 @@
+import json
+import logging
+import math
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Any, Optional, Tuple, FrozenSet
+
+from .planfix_cache_service import planfix_cache, CACHE_DIR
+
+# Configure logging
+logger = logging.getLogger(__name__)
+
+EMPLOYEE_WORKLOAD_CACHE = CACHE_DIR / 'employee_workload.json'
+
+# Task ID lists kept per employee, for assigned and for created tasks
+TASK_STATES = ('active', 'completed', 'overdue')
+CREATED_TASK_STATES = tuple(f'created_{state}' for state in TASK_STATES)
+
+# Version of the record layout; files in another layout are rebuilt from the snapshot
+WORKLOAD_FORMAT = 2
+
+# Upcoming deadlines kept per employee
+NEAREST_DEADLINES = 5
+
+MAX_PAGE_SIZE = 500
+
+def _sortable_date(value: str) -> str:
+    """Turn a Planfix date (DD-MM-YYYY or ISO) into a string that sorts chronologically"""
+    value = value[:10]
+    if len(value) == 10 and value[2] == '-' and value[5] == '-':
+        return f"{value[6:]}-{value[3:5]}-{value[:2]}"
+    return value
+
+def paginate(items: List[Any], page: int, page_size: int) -> Tuple[List[Any], Dict[str, int]]:
+    """
+    Slice a list into a page
+
+    Returns:
+        The page items and {'page', 'page_size', 'total', 'pages'}
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    total = len(items)
+    pages = max(1, math.ceil(total / page_size))
+    page = max(1, min(page, pages))
+    start = (page - 1) * page_size
+    return items[start:start + page_size], {'page': page, 'page_size': page_size, 'total': total, 'pages': pages}
+
+class EmployeeWorkload:
+    """
+    Per-employee workload records precomputed from the tasks snapshot.
+
+    Every assignee and task creator gets a record with the IDs of the
+    active, completed and overdue tasks assigned to and created by them,
+    counts, a per-project breakdown of their assigned tasks and their
+    nearest upcoming deadlines. Records are built at refresh time and
+    patched for webhook changes, so an employee page or a user's own
+    "my tasks" view only resolves one page of task IDs through the task index.
+    """
+
+    def __init__(self, cache_file=EMPLOYEE_WORKLOAD_CACHE):
+        """Initialize the store"""
+        self.cache_file = cache_file
+        self._records = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _get_file_version(self) -> Optional[tuple]:
+        """Get a cheap version marker of the workload file"""
+        try:
+            stat = self.cache_file.stat()
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def get_all(self) -> Dict[str, Dict[str, Any]]:
+        """Get all workload records keyed by employee ID, building them if needed"""
+        version = self._get_file_version()
+        if version is None:
+            return self.generate()
+
+        with self._lock:
+            if self._records is None or self._version != version:
+                try:
+                    with open(self.cache_file, 'r', encoding='utf-8') as f:
+                        data = json.load(f)
+                    if data.get('format') == WORKLOAD_FORMAT:
+                        self._records = data['employees']
+                        self._version = version
+                    else:
+                        logger.info("Employee workload cache has an old layout, rebuilding it")
+                        self._records = None
+                except (json.JSONDecodeError, IOError, KeyError) as e:
+                    logger.error(f"Error reading employee workload cache: {e}")
+                    self._records = None
+            records = self._records
+
+        return records if records is not None else self.generate()
+
+    def get(self, employee_id: str) -> Optional[Dict[str, Any]]:
+        """Get the workload record of one employee"""
+        return self.get_all().get(str(employee_id))
+
+    def get_employee_id(self, planfix_user_id: Optional[str]) -> Optional[str]:
+        """Get the record key of a User.planfix_user_id, stored with or without the 'user:' prefix"""
+        if not planfix_user_id:
+            return None
+        records = self.get_all()
+        planfix_user_id = str(planfix_user_id).strip()
+        for employee_id in (planfix_user_id, f'user:{planfix_user_id}'):
+            if employee_id in records:
+                return employee_id
+        return None
+
+    def get_for_user(self, user) -> Optional[Dict[str, Any]]:
+        """Get the record of a site user linked to Planfix through planfix_user_id"""
+        employee_id = self.get_employee_id(getattr(user, 'planfix_user_id', None))
+        return self.get(employee_id) if employee_id is not None else None
+
+    def generate(self) -> Dict[str, Dict[str, Any]]:
+        """Build workload records from the whole snapshot and persist them"""
+        index = planfix_cache.get_task_index()
+        today = datetime.now().date().isoformat()
+
+        records = {}
+        for task in index.tasks:
+            self._add_task(records, task, 1)
+        for record in records.values():
+            self._finalize(record, index, today)
+
+        self._save(records)
+        logger.info(f"Generated employee workload for {len(records)} employees")
+        return records
+
+    def apply_changes(self, changes: List[tuple]):
+        """
+        Patch workload records with (old, new) task pairs
+
+        Only the employees touched by the changes are re-finalized.
+        """
+        if self._get_file_version() is None:
+            return  # Will be generated from the snapshot on next read
+
+        records = {employee_id: dict(record) for employee_id, record in self.get_all().items()}
+        touched = set()
+        for old_task, new_task in changes:
+            if old_task is not None:
+                touched.update(self._add_task(records, old_task, -1))
+            if new_task is not None:
+                touched.update(self._add_task(records, new_task, 1))
+
+        index = planfix_cache.get_task_index()
+        today = datetime.now().date().isoformat()
+        for employee_id in touched:
+            record = records.get(employee_id)
+            if record is None:
+                continue
+            if not any(record[f'{state}_task_ids'] for state in ('active', 'completed', 'created_active', 'created_completed')):
+                del records[employee_id]
+            else:
+                self._finalize(record, index, today)
+
+        self._save(records)
+
+    def _add_task(self, records: Dict[str, Dict[str, Any]], task: Dict[str, Any], sign: int) -> List[str]:
+        """
+        Add (sign=1) or remove (sign=-1) a task from the records of its people
+
+        Returns:
+            IDs of the touched employees
+        """
+        task_id = str(task.get('id'))
+        state_key = 'completed_task_ids' if planfix_cache._is_task_completed(task) else 'active_task_ids'
+        touched = []
+
+        def update_ids(record, key):
+            if sign > 0:
+                record[key] = record[key] + [task_id]
+            else:
+                record[key] = [other_id for other_id in record[key] if other_id != task_id]
+
+        def get_record(person):
+            employee_id = str(person['id'])
+            if employee_id not in records:
+                if sign < 0:
+                    return None
+                records[employee_id] = {
+                    'id': person['id'],
+                    'name': person.get('name', f"User {employee_id}"),
+                    'email': person.get('email', ''),
+                    'active_task_ids': [],
+                    'completed_task_ids': [],
+                    'overdue_task_ids': [],
+                    'created_active_task_ids': [],
+                    'created_completed_task_ids': [],
+                    'created_overdue_task_ids': [],
+                    'created_tasks': 0
+                }
+            record = records[employee_id]
+            if sign > 0 and person.get('name'):
+                record['name'] = person['name']
+            touched.append(employee_id)
+            return record
+
+        seen = set()
+        for assignee in planfix_cache._get_task_assignees(task):
+            if not assignee.get('id') or str(assignee['id']) in seen:
+                continue
+            seen.add(str(assignee['id']))
+            record = get_record(assignee)
+            if record is not None:
+                update_ids(record, state_key)
+
+        if task.get('assigner') and task['assigner'].get('id'):
+            record = get_record(task['assigner'])
+            if record is not None:
+                update_ids(record, f'created_{state_key}')
+
+        return touched
+
+    def _finalize(self, record: Dict[str, Any], index, today: str):
+        """Recompute overdue IDs, counts, projects and nearest deadlines of a record"""
+        overdue_ids = []
+        upcoming = []
+        breakdown: Dict[str, Dict[str, Any]] = {}
+
+        def count_project(task, state):
+            if task.get('project') and task['project'].get('id'):
+                project_id = str(task['project']['id'])
+                if project_id not in breakdown:
+                    breakdown[project_id] = {'id': task['project']['id'], 'name': task['project'].get('name', ''),
+                                             'active': 0, 'overdue': 0, 'completed': 0}
+                breakdown[project_id][state] += 1
+
+        for task in index.get_many(record['active_task_ids']):
+            end_date = planfix_cache._get_task_end_date(task)
+            count_project(task, 'active')
+            if planfix_cache._is_task_overdue(task, today):
+                overdue_ids.append(str(task['id']))
+                count_project(task, 'overdue')
+            elif end_date:
+                upcoming.append((_sortable_date(end_date), task, end_date))
+
+        for task in index.get_many(record['completed_task_ids']):
+            count_project(task, 'completed')
+
+        created_overdue_ids = [
+            str(task['id']) for task in index.get_many(record['created_active_task_ids'])
+            if planfix_cache._is_task_overdue(task, today)
+        ]
+
+        upcoming.sort(key=lambda item: item[0])
+        record.update({
+            'overdue_task_ids': overdue_ids,
+            'created_overdue_task_ids': created_overdue_ids,
+            'active_count': len(record['active_task_ids']),
+            'completed_count': len(record['completed_task_ids']),
+            'overdue_count': len(overdue_ids),
+            'total_count': len(record['active_task_ids']) + len(record['completed_task_ids']),
+            'created_tasks': len(record['created_active_task_ids']) + len(record['created_completed_task_ids']),
+            'created_active_count': len(record['created_active_task_ids']),
+            'created_completed_count': len(record['created_completed_task_ids']),
+            'created_overdue_count': len(created_overdue_ids),
+            'projects': sorted(breakdown),
+            'project_count': len(breakdown),
+            # Assigned tasks per project, projects with most active tasks first
+            'project_breakdown': sorted(breakdown.values(), key=lambda item: (-item['active'], item['name'])),
+            'nearest_deadlines': [
+                {'id': task['id'], 'name': task.get('name', ''), 'date': end_date}
+                for _, task, end_date in upcoming[:NEAREST_DEADLINES]
+            ]
+        })
+
+    def _save(self, records: Dict[str, Dict[str, Any]]):
+        """Atomically write the workload file and keep the records in memory"""
+        tmp_file = self.cache_file.with_name(f"{self.cache_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'format': WORKLOAD_FORMAT, 'generated_at': datetime.now().isoformat(), 'employees': records},
+                          f, ensure_ascii=False)
+            os.replace(tmp_file, self.cache_file)
+        except IOError as e:
+            logger.error(f"Error writing employee workload cache: {e}")
+            return
+
+        with self._lock:
+            self._records = records
+            self._version = self._get_file_version()
+
+    def _scope_ids(self, record: Dict[str, Any], visible_ids: FrozenSet[str]) -> Dict[str, Any]:
+        """Get a copy of a record with only the visible task IDs and the counts used for sorting"""
+        scoped = {key: [task_id for task_id in value if task_id in visible_ids] if key.endswith('_task_ids') else value
+                  for key, value in record.items()}
+        scoped['active_count'] = len(scoped['active_task_ids'])
+        scoped['overdue_count'] = len(scoped['overdue_task_ids'])
+        scoped['total_count'] = scoped['active_count'] + len(scoped['completed_task_ids'])
+        return scoped
+
+    def scope(self, record: Dict[str, Any], visible_ids: Optional[FrozenSet[str]]) -> Dict[str, Any]:
+        """Get a copy of a record recomputed from the visible tasks only (the record itself for None)"""
+        if visible_ids is None:
+            return record
+        scoped = self._scope_ids(record, visible_ids)
+        self._finalize(scoped, planfix_cache.get_task_index(), datetime.now().date().isoformat())
+        return scoped
+
+    def get_summary(self, record: Dict[str, Any], visible_ids: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+        """
+        Get a record without its task ID lists
+
+        Args:
+            visible_ids: IDs of the tasks the reader can see; counts, projects and
+                deadlines are recomputed from them. None for every task
+        """
+        record = self.scope(record, visible_ids)
+        return {key: value for key, value in record.items() if not key.endswith('_task_ids')}
+
+    def get_employees_page(self, page: int = 1, page_size: int = 50, sort: str = 'name',
+                           query: Optional[str] = None,
+                           visible_ids: Optional[FrozenSet[str]] = None) -> Dict[str, Any]:
+        """
+        Get a page of employee workload summaries
+
+        Args:
+            page: Page number, starting at 1
+            page_size: Employees per page
+            sort: 'name', 'active', 'overdue' or 'total'
+            query: Optional substring of the employee name
+            visible_ids: IDs of the tasks the reader can see; employees are counted over
+                them and the ones without visible tasks are left out. None for every task
+        """
+        records = list(self.get_all().values())
+        if query:
+            query = query.lower()
+            records = [record for record in records if query in record['name'].lower()]
+        if visible_ids is not None:
+            records = [self._scope_ids(record, visible_ids) for record in records]
+            records = [record for record in records
+                       if record['total_count'] or record['created_active_task_ids'] or record['created_completed_task_ids']]
+
+        if sort == 'name':
+            records.sort(key=lambda record: record['name'].lower())
+        else:
+            records.sort(key=lambda record: record.get(f'{sort}_count', 0), reverse=True)
+
+        items, pagination = paginate(records, page, page_size)
+        if visible_ids is not None:
+            index = planfix_cache.get_task_index()
+            today = datetime.now().date().isoformat()
+            for record in items:
+                self._finalize(record, index, today)
+        return dict(pagination, employees=[self.get_summary(record) for record in items])
+
+    def get_tasks_page(self, employee_id: str, state: str = 'active', page: int = 1,
+                       page_size: int = 100, visible_ids: Optional[FrozenSet[str]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a page of an employee's tasks in one state
+
+        Args:
+            state: One of TASK_STATES for assigned tasks or CREATED_TASK_STATES for created ones
+            visible_ids: IDs of the tasks the reader can see, applied before paging. None for every task
+
+        Returns:
+            Page of tasks with pagination fields, or None for an unknown employee
+        """
+        record = self.get(employee_id)
+        if record is None:
+            return None
+
+        task_ids = record[f'{state}_task_ids']
+        if visible_ids is not None:
+            task_ids = [task_id for task_id in task_ids if task_id in visible_ids]
+        task_ids, pagination = paginate(task_ids, page, page_size)
+        return dict(pagination, tasks=planfix_cache.get_task_index().get_many(task_ids))
+
+# Singleton instance
+employee_workload = EmployeeWorkload()
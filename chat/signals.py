@@ -1,10 +1,19 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.conf import settings
-from .models import UserSettings
+from .models import UserSettings, Conversation
 
 @receiver(post_save, sender=settings.AUTH_USER_MODEL)
 def create_user_settings(sender, instance, created, **kwargs):
     """Создает настройки пользователя при его регистрации"""
     if created:
-        UserSettings.objects.create(user=instance)
\ No newline at end of file
+        UserSettings.objects.create(user=instance)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+@receiver(post_save, sender=Conversation)
+@receiver(post_delete, sender=Conversation)
+def invalidate_dashboard_snapshot(sender, **kwargs):
+    """Сбрасывает снимок главной страницы агента при изменении пользователей и бесед"""
+    from .planfix_dashboard import dashboard_snapshot
+    dashboard_snapshot.invalidate()
@@ -33,6 +33,10 @@ def refresh_planfix_cache():
         # Обновляем кэш
         success = cache_service.refresh_all_caches()
         
+        # Следующее обновление планируется по числу изменений с прошлого обновления
+        from .planfix_scheduler import refresh_scheduler
+        refresh_scheduler.record_refresh()
+        
         if success:
             logger.info("Кэш Planfix успешно обновлен")
             AnalyticsService.log_cache_refresh(success=True)
@@ -50,6 +54,46 @@ def refresh_planfix_cache():
         # Сбрасываем флаг обновления
         cache_service.is_updating = False
 
+@shared_task
+def schedule_planfix_refresh():
+    """
+    Задача-планировщик: запускает обновление кэша Planfix, когда подошел
+    интервал, подобранный адаптивным расписанием
+    """
+    from .planfix_scheduler import refresh_scheduler
+    
+    if not refresh_scheduler.is_due():
+        return False
+    
+    # Пока обновление выполняется, повторно его не запускаем
+    refresh_scheduler.mark_dispatched()
+    refresh_planfix_cache.delay()
+    return True
+
+@shared_task
+def apply_planfix_webhook_events():
+    """
+    Задача для пакетного применения событий вебхуков Planfix к кэшу
+    """
+    from .planfix_webhooks import apply_pending_events
+    
+    try:
+        return apply_pending_events()
+    except Exception as e:
+        logger.error(f"Ошибка при применении событий вебхуков Planfix: {e}", exc_info=True)
+        raise
+
+@shared_task
+def compact_planfix_history():
+    """
+    Задача для сжатия истории снимков задач Planfix
+    """
+    from .planfix_cache_service import snapshot_write_lock
+    from .planfix_history import task_history
+    
+    with snapshot_write_lock():
+        return task_history.compact()
+
 @shared_task
 def cleanup_old_data():
     """
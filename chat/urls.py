@@ -16,10 +16,20 @@ urlpatterns = [
     # API для работы с задачами Planfix
     path('api/tasks/', api_views.tasks_api, name='tasks_api'),
     path('api/tasks/update/', api_views.update_tasks_cache_api, name='update_tasks_cache_api'),
+    path('api/tasks/changes/', api_views.tasks_changes_api, name='tasks_changes_api'),
+    path('api/tasks/query/', api_views.tasks_query_api, name='tasks_query_api'),
+    path('api/tasks/batch/', api_views.tasks_batch_api, name='tasks_batch_api'),
+    path('api/search/', api_views.search_api, name='search_api'),
+    path('api/autocomplete/', api_views.autocomplete_api, name='autocomplete_api'),
     path('api/projects/', api_views.projects_api, name='projects_api'),
+    path('api/projects/<str:project_id>/refresh/', api_views.project_refresh_api, name='project_refresh_api'),
+    path('api/employees/', api_views.employees_api, name='employees_api'),
+    path('api/employees/<str:employee_id>/', api_views.employee_workload_api, name='employee_workload_api'),
+    path('api/my-tasks/', api_views.my_tasks_api, name='my_tasks_api'),
     path('api/message/', api.message_api, name='message_api'),
     path('api/conversations/', api.conversations_api, name='conversations_api'),
     path('api/task/<int:task_id>/', api_views.task_api, name='task_api'),
+    path('api/planfix/webhook/', api_views.planfix_webhook_api, name='planfix_webhook_api'),
     
     # NEW: Agent API endpoints for Planfix-Claude integration
     path('api/agent/message/', agent_api.agent_message_api, name='agent_message_api'),
@@ -28,6 +38,7 @@ urlpatterns = [
     
     # Представления для работы с задачами Planfix (Apple стиль)
     path('planfix/tasks/', views_planfix.planfix_tasks_apple, name='planfix_tasks'),
+    path('planfix/my-tasks/', views_planfix.planfix_my_tasks_apple, name='planfix_my_tasks'),
     path('planfix/task/<int:task_id>/', views_planfix.planfix_task_detail_apple, name='planfix_task_detail'),
     path('planfix/task/<int:task_id>/integrate/', views_planfix.planfix_task_integrate, name='planfix_task_integrate'),
     
@@ -55,6 +66,7 @@ urlpatterns = [
     path('analytics/conversations/', views_admin.conversation_analytics, name='conversation_analytics'),
     path('analytics/models/', views_admin.model_analytics, name='model_analytics'),
     path('analytics/tasks/', views_admin.task_analytics, name='task_analytics'),
+    path('analytics/task-trends/', views_admin.task_trends, name='task_trends'),
     
     # Настройки ИИ-моделей
     path('ai-settings/', views_admin.ai_settings, name='ai_settings'),
@@ -79,6 +91,8 @@ urlpatterns = [
     path('api/analytics/conversation/<int:conversation_id>/', analytics_api.conversation_stats_api, name='conversation_stats_api'),
     path('api/analytics/message/<int:message_id>/feedback/', analytics_api.add_message_feedback_api, name='add_message_feedback_api'),
     path('api/analytics/conversation/<int:conversation_id>/tag/', analytics_api.add_conversation_tag_api, name='add_conversation_tag_api'),
+    path('api/analytics/task-trends/', analytics_api.task_trends_api, name='task_trends_api'),
+    path('api/analytics/planfix-memory/', analytics_api.planfix_memory_api, name='planfix_memory_api'),
 
     # Views for analytics
     path('analytics/user/', analytics_views.user_analytics_view, name='user_analytics'),
@@ -9,13 +9,14 @@ import json
 from django.contrib import messages
 from django.utils.translation import gettext_lazy as _
 from django.http import JsonResponse
-import os
 
 from .models import (
     User, Conversation, Message, AIModel,
     AnalyticsEvent, UserMetrics, AIModelMetrics
 )
 from .analytics_service import AnalyticsService
+from .planfix_telemetry import get_recent_runs
+from .decorators import api_login_required
 
 @staff_member_required
 def analytics_dashboard(request):
@@ -101,6 +102,15 @@ def analytics_dashboard(request):
         )
     ).order_by('-requests')[:10]
     
+    # Телеметрия обновлений кэша Planfix (последние запуски, старые слева)
+    refresh_runs = get_recent_runs(limit=20)
+    refresh_stage_names = []
+    for run in refresh_runs:
+        for stage in run['stages']:
+            if stage.stage not in refresh_stage_names:
+                refresh_stage_names.append(stage.stage)
+    refresh_chart_runs = list(reversed(refresh_runs))
+    
     context = {
         'days': days,
         'total_users': total_users,
@@ -153,6 +163,19 @@ def analytics_dashboard(request):
             'labels': [item['day'] for item in analytics_summary.get('usage_history', [])],
             'requests': [item['requests'] for item in analytics_summary.get('usage_history', [])],
             'responseTime': [item['response_time'] for item in analytics_summary.get('usage_history', [])]
+        }),
+        
+        # Телеметрия обновлений кэша Planfix
+        'last_refresh': refresh_runs[0] if refresh_runs else None,
+        'refresh_data': json.dumps({
+            'labels': [run['started_at'].strftime('%d.%m %H:%M') for run in refresh_chart_runs],
+            'stages': {
+                stage_name: [
+                    round(sum(stage.duration for stage in run['stages'] if stage.stage == stage_name), 3)
+                    for run in refresh_chart_runs
+                ]
+                for stage_name in refresh_stage_names
+            }
         })
     }
     
@@ -424,28 +447,72 @@ def employees_view(request):
     
     return render(request, 'admin/employees.html', context)
 
-def employee_active_tasks(request, employee_id):
-    """
-    Возвращает список активных задач для сотрудника по его Planfix id (user:4 и т.д.)
-    """
-    cache_path = os.path.join(os.path.dirname(__file__), 'cache', 'active_tasks.json')
+def _employee_tasks_response(request, employee_id, state):
+    """Страница задач сотрудника из предрассчитанной загрузки (?page=, ?page_size=)"""
+    from .planfix_visibility import task_visibility
+    from .planfix_workload import employee_workload
+
     try:
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            tasks = json.load(f)
-        filtered = [task for task in tasks if task.get('assignees') and task['assignees'].get('users') and any(u['id'] == employee_id for u in task['assignees']['users'])]
-        return JsonResponse({'tasks': filtered})
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 100))
+    except ValueError:
+        return JsonResponse({'error': 'page и page_size должны быть целыми числами'}, status=400)
+
+    try:
+        result = employee_workload.get_tasks_page(
+            employee_id, state, page, page_size, task_visibility.get_visible_ids(request.user)
+        )
+        if result is None:
+            # Сотрудник без задач
+            result = {'tasks': [], 'page': 1, 'page_size': page_size, 'total': 0, 'pages': 1}
+        return JsonResponse(result)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+@api_login_required
+def employee_active_tasks(request, employee_id):
+    """
+    Возвращает страницу активных задач сотрудника по его Planfix id (user:4 и т.д.)
+    """
+    return _employee_tasks_response(request, employee_id, 'active')
+
+@api_login_required
 def employee_completed_tasks(request, employee_id):
     """
-    Возвращает список завершённых задач для сотрудника по его Planfix id (user:4 и т.д.)
+    Возвращает страницу завершённых задач сотрудника по его Planfix id (user:4 и т.д.)
     """
-    cache_path = os.path.join(os.path.dirname(__file__), 'cache', 'completed_tasks.json')
+    return _employee_tasks_response(request, employee_id, 'completed')
+
+@staff_member_required
+def task_trends(request):
+    """
+    Представление динамики задач Planfix по дням (открытые, просроченные, завершенные)
+    """
+    from .planfix_history import task_history, MAX_TREND_DAYS
+
     try:
-        with open(cache_path, 'r', encoding='utf-8') as f:
-            tasks = json.load(f)
-        filtered = [task for task in tasks if task.get('assignees') and task['assignees'].get('users') and any(u['id'] == employee_id for u in task['assignees']['users'])]
-        return JsonResponse({'tasks': filtered})
-    except Exception as e:
-        return JsonResponse({'error': str(e)}, status=500)
+        days = max(1, min(int(request.GET.get('days', 30)), MAX_TREND_DAYS))
+    except ValueError:
+        days = 30
+    group_by = request.GET.get('group_by') or None
+    if group_by not in (None, 'project', 'assignee'):
+        group_by = None
+
+    trends = task_history.get_trends(days, group_by=group_by)
+
+    # Для группировок показываем только самые загруженные группы
+    series = sorted(
+        trends['series'].items(),
+        key=lambda item: max([value for value in item[1]['open'] if value is not None] or [0]),
+        reverse=True
+    )[:8]
+
+    context = {
+        'days': days,
+        'group_by': group_by or '',
+        'trend_days': json.dumps(trends['days']),
+        'trend_series': json.dumps([dict(series_data, key=key) for key, series_data in series], ensure_ascii=False),
+        'history_status': task_history.get_status()
+    }
+
+    return render(request, 'admin/analytics/task_trends.html', context)
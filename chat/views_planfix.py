@@ -15,11 +15,14 @@ from .planfix_service import (
 )
 from .services import ClaudeService
 from .views import should_use_apple_style
+from .decorators import api_login_required, login_required_with_redirect
+from .planfix_visibility import task_visibility
 from django.utils import timezone
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
 
+@login_required_with_redirect
 def planfix_tasks(request):
     """Отображение списка задач из Planfix с постраничной навигацией"""
     # Проверка, использовать ли Apple-стиль
@@ -34,13 +37,14 @@ def planfix_tasks(request):
         # Получаем задачи в зависимости от фильтра статуса
         if status_filter == 'active':
             tasks = get_active_tasks()
-            total_count = len(tasks)
         elif status_filter == 'completed':
             tasks = get_completed_tasks()
-            total_count = len(tasks)
         else:  # 'all' по умолчанию
             tasks = get_all_tasks()
-            total_count = len(tasks)
+        
+        # Только задачи, видимые пользователю
+        tasks = task_visibility.filter_tasks(request.user, tasks)
+        total_count = len(tasks)
         
         # Вычисляем общее количество страниц
         page_size = 25
@@ -68,6 +72,7 @@ def planfix_tasks(request):
             'total_pages': 1
         })
 
+@login_required_with_redirect
 def planfix_tasks_apple(request):
     """Отображение списка задач из Planfix с Apple дизайном"""
     try:
@@ -78,13 +83,14 @@ def planfix_tasks_apple(request):
         # Получаем задачи в зависимости от фильтра статуса
         if status_filter == 'active':
             tasks = get_active_tasks()
-            total_count = len(tasks)
         elif status_filter == 'completed':
             tasks = get_completed_tasks()
-            total_count = len(tasks)
         else:  # 'all' по умолчанию
             tasks = get_all_tasks()
-            total_count = len(tasks)
+        
+        # Только задачи, видимые пользователю
+        tasks = task_visibility.filter_tasks(request.user, tasks)
+        total_count = len(tasks)
         
         # Вычисляем общее количество страниц
         page_size = 25
@@ -112,6 +118,34 @@ def planfix_tasks_apple(request):
             'total_pages': 1
         })
 
+@login_required_with_redirect
+def planfix_my_tasks_apple(request):
+    """Задачи текущего пользователя из предрассчитанной загрузки по его planfix_user_id"""
+    from .planfix_cache_service import planfix_cache
+    from .planfix_workload import employee_workload
+
+    # Количество задач в списках просроченных и созданных
+    list_size = 20
+
+    context = {'linked': bool(getattr(request.user, 'planfix_user_id', None)), 'summary': None}
+    try:
+        record = employee_workload.get_for_user(request.user)
+        if record is not None:
+            # Сводка и списки - только по видимым пользователю задачам
+            record = employee_workload.scope(record, task_visibility.get_visible_ids(request.user))
+            index = planfix_cache.get_task_index()
+            context.update({
+                'summary': employee_workload.get_summary(record),
+                'overdue_tasks': index.get_many(record['overdue_task_ids'][:list_size]),
+                'created_overdue_tasks': index.get_many(record['created_overdue_task_ids'][:list_size])
+            })
+    except Exception as e:
+        logger.error(f"Ошибка при получении задач пользователя {request.user}: {str(e)}", exc_info=True)
+        context['error'] = str(e)
+
+    return render(request, 'chat/planfix_my_tasks_apple.html', context)
+
+@login_required_with_redirect
 def planfix_task_detail(request, task_id):
     """Отображение детальной информации о задаче"""
     # Проверка, использовать ли Apple-стиль
@@ -119,8 +153,8 @@ def planfix_task_detail(request, task_id):
         return planfix_task_detail_apple(request, task_id)
         
     try:
-        # Получаем задачу из Planfix по ID
-        task = get_task_by_id(task_id)
+        # Получаем задачу из Planfix по ID, если она видна пользователю
+        task = get_task_by_id(task_id) if task_visibility.is_visible(request.user, task_id) else None
         
         # Добавляем логирование для отладки
         logger.info(f"Получена задача с ID {task_id}: {task}")
@@ -145,11 +179,12 @@ def planfix_task_detail(request, task_id):
         # Переходим на страницу со списком задач без сообщения об ошибке
         return redirect('chat:planfix_tasks')
 
+@login_required_with_redirect
 def planfix_task_detail_apple(request, task_id):
     """Отображение детальной информации о задаче в стиле Apple"""
     try:
-        # Получаем задачу из Planfix по ID
-        task = get_task_by_id(task_id)
+        # Получаем задачу из Planfix по ID, если она видна пользователю
+        task = get_task_by_id(task_id) if task_visibility.is_visible(request.user, task_id) else None
         
         # Добавляем логирование для отладки
         logger.info(f"Получена задача с ID {task_id} (Apple-стиль): {task}")
@@ -174,14 +209,15 @@ def planfix_task_detail_apple(request, task_id):
         return redirect('chat:planfix_tasks_apple')
 
 @csrf_exempt
+@api_login_required
 def planfix_task_integrate(request, task_id):
     """API endpoint для интеграции задачи с Claude"""
     if request.method == 'POST':
         try:
             logger.info(f"Запрос на интеграцию задачи {task_id} с Claude")
             
-            # Получаем задачу из Planfix
-            task = get_task_by_id(task_id)
+            # Получаем задачу из Planfix, если она видна пользователю
+            task = get_task_by_id(task_id) if task_visibility.is_visible(request.user, task_id) else None
             
             if not task:
                 return JsonResponse({
@@ -30,9 +30,24 @@ app.conf.beat_schedule = {
         'options': {'expires': 3600 * 25},
     },
     'refresh-planfix-cache': {
-        'task': 'chat.tasks.refresh_planfix_cache',
-        'schedule': 3600.0,  # Запуск каждый час
+        'task': 'chat.tasks.schedule_planfix_refresh',
+        # Проверка раз в минуту; само обновление запускается с интервалом, который
+        # подбирается по частоте изменений задач (ADAPTIVE_REFRESH в planfix_config).
+        # Каждое обновление загружает незавершенные задачи, полный список - раз в сутки
+        'schedule': 60.0,  # Проверка каждую минуту
         'args': (),
-        'options': {'expires': 3600 * 2},  # Истекает через 2 часа
+        'options': {'expires': 50},
+    },
+    'apply-planfix-webhook-events': {
+        'task': 'chat.tasks.apply_planfix_webhook_events',
+        'schedule': 5.0,  # Запуск каждые 5 секунд
+        'args': (),
+        'options': {'expires': 30},
+    },
+    'compact-planfix-history': {
+        'task': 'chat.tasks.compact_planfix_history',
+        'schedule': 3600.0 * 24,  # Запуск каждые 24 часа
+        'args': (),
+        'options': {'expires': 3600 * 25},
     },
 }
\ No newline at end of file
@@ -91,6 +91,10 @@ CLAUDE_API_URL = os.environ.get('CLAUDE_API_URL', 'https://api.anthropic.com/v1/
 PLANFIX_API_KEY = os.environ.get('PLANFIX_API_TOKEN', '')
 PLANFIX_ACCOUNT_ID = os.environ.get('PLANFIX_ACCOUNT_ID', 'deventky')
 PLANFIX_USER_ID = os.environ.get('PLANFIX_USER_ID', '')
+# Секрет для входящих вебхуков Planfix (заголовок X-Planfix-Webhook-Token)
+PLANFIX_WEBHOOK_SECRET = os.environ.get('PLANFIX_WEBHOOK_SECRET', '')
+# Директория файлового кэша Planfix (по умолчанию chat/cache)
+PLANFIX_CACHE_DIR = os.environ.get('PLANFIX_CACHE_DIR', '')
 
 # Настройки логирования
 LOGGING = {
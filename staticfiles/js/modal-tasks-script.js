@@ -5,6 +5,10 @@ document.addEventListener('DOMContentLoaded', function() {
     // Set up modal functionality
     setupTaskModal();
     
+    // Prefetch details of the visible tasks
+    prefetchVisibleTasks();
+    document.addEventListener('scroll', schedulePrefetchVisibleTasks, true);
+    
     // Add theme toggle button
     addThemeToggle();
     
@@ -119,14 +123,8 @@ function openTaskModal(taskId) {
         taskModal.classList.add('show');
     }, 10);
     
-    // Fetch task data
-    fetch(`/api/task/${taskId}/`)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error('Ошибка при загрузке задачи');
-            }
-            return response.json();
-        })
+    // Fetch task data, prefetched with the visible tasks when possible
+    getTaskDetails(taskId)
         .then(task => {
             console.log('Task data loaded:', task);
             
@@ -226,6 +224,104 @@ function openTaskModal(taskId) {
         });
 }
 
+// Предзагруженные данные задач: ID задачи -> {promise, fetchedAt}
+window.taskDetailsCache = window.taskDetailsCache || {};
+
+// Срок жизни предзагруженных данных, как TASK_DETAIL_CACHE['ttl_seconds'] на сервере
+window.taskDetailsTtlMs = 60 * 1000;
+
+// Function to get a prefetched task promise that has not expired yet
+function getCachedTaskDetails(taskId) {
+    const entry = window.taskDetailsCache[taskId];
+    if (!entry) return null;
+    if (Date.now() - entry.fetchedAt > window.taskDetailsTtlMs) {
+        delete window.taskDetailsCache[taskId];
+        return null;
+    }
+    return entry.promise;
+}
+
+// Function to prefetch details of the tasks on screen (and one screen below) in batched requests
+function prefetchVisibleTasks() {
+    const taskIds = [];
+    document.querySelectorAll('.tasks-table tbody tr').forEach(row => {
+        if (row.style.display === 'none') return;
+        const rect = row.getBoundingClientRect();
+        if (rect.bottom < 0 || rect.top > window.innerHeight * 2) return;
+        const link = row.querySelector('[data-task-id]');
+        const taskId = link ? link.getAttribute('data-task-id') : null;
+        if (taskId && !getCachedTaskDetails(taskId) && !taskIds.includes(taskId)) {
+            taskIds.push(taskId);
+        }
+    });
+    
+    // Не более TASKS_BATCH_LIMIT задач за запрос
+    const batchSize = 200;
+    for (let start = 0; start < taskIds.length; start += batchSize) {
+        const batchIds = taskIds.slice(start, start + batchSize);
+        const fetchedAt = Date.now();
+        const batch = fetch(`/api/tasks/batch/?ids=${batchIds.join(',')}`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error('Ошибка при загрузке задач');
+                }
+                return response.json();
+            })
+            .then(data => {
+                const tasksById = {};
+                data.tasks.forEach(task => {
+                    tasksById[String(task.id)] = task;
+                });
+                return tasksById;
+            });
+        
+        batchIds.forEach(taskId => {
+            const entry = {
+                promise: batch.then(tasksById => {
+                    if (!tasksById[taskId]) {
+                        throw new Error('Задача не найдена');
+                    }
+                    return tasksById[taskId];
+                }),
+                fetchedAt: fetchedAt
+            };
+            window.taskDetailsCache[taskId] = entry;
+            // Не удалось предзагрузить - при открытии задача загрузится отдельно
+            entry.promise.catch(() => {
+                if (window.taskDetailsCache[taskId] === entry) {
+                    delete window.taskDetailsCache[taskId];
+                }
+            });
+        });
+    }
+}
+
+// Function to prefetch the tasks on screen once scrolling or filtering settles
+function schedulePrefetchVisibleTasks() {
+    clearTimeout(window.taskPrefetchTimer);
+    window.taskPrefetchTimer = setTimeout(prefetchVisibleTasks, 200);
+}
+
+// Function to get task details, prefetched or loaded on demand
+function getTaskDetails(taskId) {
+    const prefetched = getCachedTaskDetails(taskId);
+    if (prefetched) {
+        return prefetched.catch(() => fetchTaskDetails(taskId));
+    }
+    return fetchTaskDetails(taskId);
+}
+
+// Function to load one task
+function fetchTaskDetails(taskId) {
+    return fetch(`/api/task/${taskId}/`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Ошибка при загрузке задачи');
+            }
+            return response.json();
+        });
+}
+
 // Function to close task modal
 function closeTaskModal() {
     const taskModal = document.getElementById('taskModal');